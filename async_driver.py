@@ -0,0 +1,588 @@
+"""
+Module represents asyncio WebDriver client driving many browser sessions from one event loop
+
+Every session talks to its own geckodriver over one keep-alive HTTP/1.1 connection, commands of different
+sessions run concurrently instead of blocking a thread each. AsyncBasicPage mirrors BasicPage helpers
+and shares locators and parsing helpers with the page classes.
+
+    async def buy(url):
+        driver = await AsyncWebDriver.launch(LaunchProfile.from_settings())
+        try:
+            page = AsyncBasicPage(driver)
+            await driver.get(url)
+            await page._add_single_product_to_cart('1')
+        finally:
+            await driver.quit()
+
+    async def main(url):
+        await asyncio.gather(*(buy(url) for _ in range(20)))
+"""
+import asyncio
+import inspect
+import json
+import os
+import socket
+import time
+from urllib.parse import urlsplit
+
+from selenium.common.exceptions import (ElementClickInterceptedException, ElementNotInteractableException,
+                                        InvalidSessionIdException, NoSuchElementException,
+                                        StaleElementReferenceException, TimeoutException, WebDriverException)
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+
+import pages
+import waits
+from browser_profile import LaunchProfile
+from locators import ElementCache, as_locator
+
+ELEMENT_KEY = 'element-6066-11e4-a52e-4f735466cecf'
+
+# requests sent again when a reused connection breaks before the response
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'DELETE'])
+
+ERRORS = {
+    'no such element': NoSuchElementException,
+    'stale element reference': StaleElementReferenceException,
+    'element click intercepted': ElementClickInterceptedException,
+    'element not interactable': ElementNotInteractableException,
+    'invalid session id': InvalidSessionIdException,
+    'timeout': TimeoutException,
+    'script timeout': TimeoutException,
+}
+
+
+class KeepAliveConnection:
+    """
+    One persistent HTTP/1.1 connection, requests are sent one at a time.
+    """
+
+    def __init__(self, host, port, timeout=60):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._reader = None
+        self._writer = None
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_url(cls, url, timeout=60):
+        parts = urlsplit(url)
+        return cls(parts.hostname, parts.port or 80, timeout)
+
+    async def request(self, method, path, payload=None):
+        """
+        :return: type: tuple (status, decoded JSON body)
+        """
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        head = ('{} {} HTTP/1.1\r\nHost: {}:{}\r\nConnection: keep-alive\r\nAccept: application/json\r\n'
+                'Content-Type: application/json; charset=utf-8\r\nContent-Length: {}\r\n\r\n'
+                .format(method, path, self.host, self.port, len(body))).encode('latin-1')
+        async with self._lock:
+            try:
+                if self._writer is not None and (self._reader.at_eof() or self._writer.is_closing()):
+                    # server already closed the idle connection
+                    await self.close()
+                for attempt in range(2):
+                    reused = self._writer is not None
+                    if not reused:
+                        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+                    try:
+                        self._writer.write(head + body)
+                        await self._writer.drain()
+                        status_line = await asyncio.wait_for(self._reader.readline(), self.timeout)
+                    except ConnectionError:
+                        status_line = b''
+                    if status_line:
+                        break
+                    await self.close()
+                    # server may have closed the idle connection before reading the request, but it may as well
+                    # have run it, so only a request running twice without harm is sent again, eg. not a click
+                    if attempt or not reused or method not in IDEMPOTENT_METHODS:
+                        raise ConnectionError('{}:{} closed connection'.format(self.host, self.port))
+                status, response = await asyncio.wait_for(self._read_response(status_line), self.timeout)
+            except BaseException:
+                # eg. timeout or cancellation, rest of the response may still arrive on this connection
+                # and would be read as the response to the next request, so the next one reconnects
+                await self.close()
+                raise
+        return status, json.loads(response.decode('utf-8')) if response else None
+
+    async def _read_response(self, status_line):
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self._reader.readline()).split(b';')[0], 16)
+                chunk = await self._reader.readexactly(size + 2)
+                if not size:
+                    break
+                chunks.append(chunk[:-2])
+            body = b''.join(chunks)
+        else:
+            body = await self._reader.readexactly(int(headers.get('content-length', 0)))
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, body
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self._reader = None
+
+
+class GeckodriverService:
+    def __init__(self, path='geckodriver', log_path=None):
+        self.path = path
+        self.log_path = log_path
+        self.port = None
+        self.process = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self.port)
+
+    async def start(self, timeout=30):
+        with socket.socket() as free_port:
+            free_port.bind(('127.0.0.1', 0))
+            self.port = free_port.getsockname()[1]
+        log = open(self.log_path or os.devnull, 'ab')
+        try:
+            self.process = await asyncio.create_subprocess_exec(self.path, '--port', str(self.port),
+                                                                stdout=log, stderr=log)
+        finally:
+            log.close()
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                _, writer = await asyncio.open_connection('127.0.0.1', self.port)
+            except OSError:
+                if time.monotonic() > deadline or self.process.returncode is not None:
+                    await self.stop()
+                    raise WebDriverException('geckodriver did not start on port {}'.format(self.port))
+                await asyncio.sleep(0.05)
+            else:
+                writer.close()
+                return
+
+    async def stop(self):
+        if self.process is not None and self.process.returncode is None:
+            self.process.terminate()
+            await self.process.wait()
+
+
+class AsyncWebDriver:
+    def __init__(self, connection, session_id, service=None):
+        self.connection = connection
+        self.session_id = session_id
+        self.service = service
+
+    @classmethod
+    async def create(cls, executor_url, capabilities, service=None):
+        """
+        Start new session on a running WebDriver server.
+        """
+        connection = KeepAliveConnection.from_url(executor_url)
+        status, response = await connection.request('POST', '/session',
+                                                     {'capabilities': {'alwaysMatch': capabilities}})
+        _raise_for_error(status, response)
+        return cls(connection, response['value']['sessionId'], service)
+
+    @classmethod
+    async def launch(cls, profile=None, geckodriver='geckodriver'):
+        """
+        Start own geckodriver and a browser session on it.
+        :param profile: type: LaunchProfile, settings are used by default
+        """
+        profile = profile or LaunchProfile.from_settings()
+        service = GeckodriverService(geckodriver, profile.log_path)
+        await service.start()
+        try:
+            return await cls.create(service.url, profile.capabilities(), service)
+        except Exception:
+            await service.stop()
+            raise
+
+    async def command(self, method, path, payload=None):
+        status, response = await self.connection.request(
+            method, '/session/{}{}'.format(self.session_id, path), payload)
+        _raise_for_error(status, response)
+        return self._unwrap(response['value'])
+
+    def _wrap(self, value):
+        if isinstance(value, AsyncElement):
+            return {ELEMENT_KEY: value.id}
+        if isinstance(value, (list, tuple)):
+            return [self._wrap(item) for item in value]
+        if isinstance(value, dict):
+            return {key: self._wrap(item) for key, item in value.items()}
+        return value
+
+    def _unwrap(self, value):
+        if isinstance(value, dict):
+            if ELEMENT_KEY in value:
+                return AsyncElement(self, value[ELEMENT_KEY])
+            return {key: self._unwrap(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._unwrap(item) for item in value]
+        return value
+
+    async def get(self, url):
+        await self.command('POST', '/url', {'url': url})
+
+    async def current_url(self):
+        return await self.command('GET', '/url')
+
+    async def refresh(self):
+        await self.command('POST', '/refresh', {})
+
+    async def find_element(self, by, value):
+        return await self.command('POST', '/element', _w3c_locator(by, value))
+
+    async def find_elements(self, by, value):
+        return await self.command('POST', '/elements', _w3c_locator(by, value))
+
+    async def execute_script(self, script, *args):
+        return await self.command('POST', '/execute/sync', {'script': script, 'args': self._wrap(list(args))})
+
+    async def get_cookies(self):
+        return await self.command('GET', '/cookie')
+
+    async def add_cookie(self, cookie):
+        await self.command('POST', '/cookie', {'cookie': cookie})
+
+    async def delete_cookie(self, name):
+        await self.command('DELETE', '/cookie/{}'.format(name))
+
+    async def delete_all_cookies(self):
+        await self.command('DELETE', '/cookie')
+
+    async def quit(self):
+        try:
+            status, response = await self.connection.request('DELETE', '/session/{}'.format(self.session_id))
+            _raise_for_error(status, response)
+        finally:
+            await self.connection.close()
+            if self.service is not None:
+                await self.service.stop()
+
+
+class AsyncElement:
+    def __init__(self, driver, element_id):
+        self.driver = driver
+        self.id = element_id
+
+    def _command(self, method, path, payload=None):
+        return self.driver.command(method, '/element/{}{}'.format(self.id, path), payload)
+
+    async def click(self):
+        await self._command('POST', '/click', {})
+
+    async def clear(self):
+        await self._command('POST', '/clear', {})
+
+    async def send_keys(self, *value):
+        await self._command('POST', '/value', {'text': ''.join(str(item) for item in value)})
+
+    async def get_text(self):
+        return await self._command('GET', '/text')
+
+    async def get_attribute(self, name):
+        return await self._command('GET', '/attribute/{}'.format(name))
+
+    async def get_property(self, name):
+        return await self._command('GET', '/property/{}'.format(name))
+
+    async def is_displayed(self):
+        return await self._command('GET', '/displayed')
+
+    async def is_enabled(self):
+        return await self._command('GET', '/enabled')
+
+    async def is_selected(self):
+        return await self._command('GET', '/selected')
+
+    async def find_element(self, by, value):
+        return await self._command('POST', '/element', _w3c_locator(by, value))
+
+
+def _w3c_locator(by, value):
+    """
+    W3C WebDriver knows only css, xpath and link text strategies, others are expressed as css like Selenium does.
+    """
+    if by == By.ID:
+        return {'using': By.CSS_SELECTOR, 'value': '[id="{}"]'.format(value)}
+    if by == By.NAME:
+        return {'using': By.CSS_SELECTOR, 'value': '[name="{}"]'.format(value)}
+    if by == By.CLASS_NAME:
+        return {'using': By.CSS_SELECTOR, 'value': '.{}'.format(value)}
+    if by == By.TAG_NAME:
+        return {'using': By.CSS_SELECTOR, 'value': value}
+    return {'using': by, 'value': value}
+
+
+def _raise_for_error(status, response):
+    if status < 400:
+        return
+    value = (response or {}).get('value') or {}
+    error = value.get('error', 'unknown error')
+    raise ERRORS.get(error, WebDriverException)('{}: {}'.format(error, value.get('message', '')))
+
+
+# wait conditions, async counterparts of waits and selenium expected_conditions
+
+def presence_of_element_located(locator):
+    async def condition(driver):
+        return await driver.find_element(*locator)
+    return condition
+
+
+def element_to_be_clickable(locator):
+    async def condition(driver):
+        element = await driver.find_element(*locator)
+        return element if await element.is_displayed() and await element.is_enabled() else False
+    return condition
+
+
+def no_pending_ajax():
+    async def condition(driver):
+        return await driver.execute_script(waits._NO_PENDING_AJAX_JS)
+    return condition
+
+
+def dom_is_stable(quiet_period=0.3):
+    async def condition(driver):
+        return await driver.execute_script(waits._DOM_QUIET_FOR_MS_JS) >= quiet_period * 1000
+    return condition
+
+
+def text_to_change(locator, old_text):
+    async def condition(driver):
+        text = await (await driver.find_element(*locator)).get_text()
+        return text if text != old_text else False
+    return condition
+
+
+def text_is_stable(locator, quiet_period=0.3):
+    state = {'text': None, 'since': None}
+
+    async def condition(driver):
+        text = await (await driver.find_element(*locator)).get_text()
+        now = time.monotonic()
+        if text != state['text']:
+            state['text'], state['since'] = text, now
+            return False
+        return text if text and now - state['since'] >= quiet_period else False
+    return condition
+
+
+def all_elements_read(locators, attributes=()):
+    locators = {name: list(locator) for name, locator in locators.items()}
+
+    async def condition(driver):
+        return await driver.execute_script(waits._READ_ELEMENTS_JS, locators, list(attributes)) or False
+    return condition
+
+
+async def wait_until(driver, condition, timeout=10, poll_frequency=0.1):
+    """
+    Poll async condition until it returns truthy value, like WebDriverWait.until.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            value = await condition(driver)
+            if value:
+                return value
+        except (NoSuchElementException, StaleElementReferenceException):
+            pass
+        if time.monotonic() > deadline:
+            raise TimeoutException('condition not met within {}s'.format(timeout))
+        await asyncio.sleep(poll_frequency)
+
+
+class AsyncBasicPage:
+    """
+    Async counterpart of BasicPage, HomePage, DetailsPage and ShoppingCartPage helpers. Locators and static
+    parsing helpers are looked up on the page classes.
+    """
+    PAGE_CLASSES = (pages.HomePage, pages.DetailsPage, pages.ShoppingCartPage)
+    POLL_FREQUENCY = pages.BasicPage.POLL_FREQUENCY
+
+    def __init__(self, driver):
+        self.driver = driver
+        self._elements = ElementCache()
+
+    def __getattr__(self, name):
+        for cls in self.PAGE_CLASSES:
+            if name.isupper() and hasattr(cls, name) or \
+               isinstance(inspect.getattr_static(cls, name, None), staticmethod):
+                return getattr(cls, name)
+        raise AttributeError(name)
+
+    async def _wait_until(self, condition, timeout=10):
+        return await wait_until(self.driver, condition, timeout, self.POLL_FREQUENCY)
+
+    async def _wait_for_page_to_settle(self, timeout=10):
+        await self._wait_until(no_pending_ajax(), timeout)
+        await self._wait_until(dom_is_stable(), timeout)
+
+    async def _wait_for_text_to_settle(self, xpath, timeout=10):
+        return await self._wait_until(text_is_stable(as_locator(xpath)), timeout)
+
+    async def _find_element(self, xpath, clickable=False, timeout=10):
+        locator = as_locator(xpath)
+        element = self._elements.get(locator)
+        if element is not None:
+            try:
+                # one round trip proves the handle still belongs to the current page
+                enabled = await element.is_enabled()
+                if not clickable or enabled and await element.is_displayed():
+                    return element
+            except StaleElementReferenceException:
+                self._elements.discard(locator)
+        condition = element_to_be_clickable if clickable else presence_of_element_located
+        element = await self._wait_until(condition(locator), timeout)
+        self._elements.put(locator, element)
+        return element
+
+    async def _on_element(self, xpath, action, clickable=False, timeout=10):
+        """
+        :param action: type: coroutine function taking AsyncElement
+        """
+        try:
+            return await action(await self._find_element(xpath, clickable, timeout))
+        except StaleElementReferenceException:
+            self._elements.discard(as_locator(xpath))
+            return await action(await self._find_element(xpath, clickable, timeout))
+
+    async def _refresh(self):
+        self._elements.clear()
+        await self.driver.refresh()
+
+    async def _wait_for_element(self, xpath, timeout=10):
+        return await self._find_element(xpath, timeout=timeout)
+
+    async def _wait_for_element_to_be_clickable(self, xpath, timeout=10):
+        return await self._find_element(xpath, clickable=True, timeout=timeout)
+
+    async def _click_enabled_element(self, xpath, timeout=10):
+        await self._on_element(xpath, lambda elem: elem.click(), clickable=True, timeout=timeout)
+
+    async def _insert_text_to_enabled_element(self, xpath, text, timeout=10):
+        async def insert_text(elem):
+            await elem.send_keys(Keys.CONTROL + 'a')
+            await elem.send_keys(Keys.DELETE)
+            await elem.send_keys(text)
+        await self._on_element(xpath, insert_text, timeout=timeout)
+
+    async def _get_text_from_enabled_element(self, xpath, timeout=10):
+        return await self._on_element(xpath, lambda elem: elem.get_text(), timeout=timeout)
+
+    async def _get_element_from_enabled_element(self, xpath, timeout=10):
+        return await self._find_element(xpath, timeout=timeout)
+
+    async def _read_elements(self, xpaths, attributes=(), timeout=10):
+        locators = {name: as_locator(xpath) for name, xpath in xpaths.items()}
+        return await self._wait_until(all_elements_read(locators, attributes), timeout)
+
+    async def _select_by_value(self, xpath, value, timeout=10):
+        """
+        Choose option of <select> element like selenium Select.select_by_value.
+        """
+        select = await self._find_element(xpath, timeout=timeout)
+        option = await select.find_element(By.CSS_SELECTOR, 'option[value="{}"]'.format(value))
+        if not await option.is_selected():
+            await option.click()
+
+    async def _get_cart_state(self, refresh=False):
+        if refresh:
+            await self._refresh()
+        return self._parse_cart_total(await self._get_text_from_enabled_element(self.CART_XPATH))
+
+    async def _click_and_wait_for_cart_update(self, xpath, timeout=10):
+        old_cart_string = await self._get_text_from_enabled_element(self.CART_XPATH)
+        await self._click_enabled_element(xpath, timeout)
+        await self._wait_until(text_to_change(self.CART_XPATH, old_cart_string), timeout)
+
+    async def _click_cart_button(self):
+        await self._click_enabled_element(self.CART_XPATH)
+
+    async def _clean_cart(self):
+        """
+        Empty the cart by starting a new guest session, see BasicPage._clean_cart cookie mode.
+        """
+        await self.driver.delete_cookie(self.SESSION_COOKIE)
+        await self._refresh()
+
+    async def _go_to_home_page(self):
+        await self._click_enabled_element(self.HOME_PAGE_XPATH)
+
+    async def _go_to_product_details_page(self, product_number):
+        await self._click_enabled_element(self.PRODUCT_DETAILS_XPATHS[product_number])
+
+    async def _go_to_shopping_cart_page(self):
+        await self._click_enabled_element(self.SHOPPING_CART_PAGE_XPATH)
+
+    async def _add_single_product_to_cart(self, product_number):
+        await self._click_and_wait_for_cart_update(self.PRODUCT_IDS_XPATHS[product_number])
+
+    async def _add_to_cart(self):
+        await self._click_and_wait_for_cart_update(self.ADD_TO_CART_XPATH)
+
+    async def _register_user(self):
+        """
+        :return: type: dict, credentials {'email': ..., 'password': ...}
+        """
+        credentials = {'email': self._email_generator(), 'password': '1qazZAQ!'}
+        await self._click_enabled_element(self.MY_ACCOUNT_BUTTON_XPATH)
+        await (await self.driver.find_element(*self.REGISTER_BUTTON_CSS)).click()
+        await (await self._get_element_from_enabled_element(self.FIRST_NAME_REGISTRY_XPATH)).send_keys('Jan')
+        await self._wait_for_page_to_settle()
+        for xpath, text in ((self.LAST_NAME_REGISTRY_XPATH, 'Kowalski'),
+                            (self.EMAIL_REGISTRY_XPATH, credentials['email']), (self.TEL_REGISTRY_XPATH, '46652033'),
+                            (self.PASSWORD_REGISTRY_XPATH, credentials['password']),
+                            (self.PASSWORD_CONFIRM_REGISTRY_XPATH, credentials['password'])):
+            await (await self._get_element_from_enabled_element(xpath)).send_keys(text)
+        await (await self._get_element_from_enabled_element(self.PRIVACY_POLICY_BUTTON_REGISTRY_XPATH)).click()
+        await (await self._get_element_from_enabled_element(self.CONTINUE_BUTTON_REGISTRY_XPATH)).click()
+        await self._click_enabled_element(self.FINISH_ORDER_BUTTON_XPATH)
+        await self._click_enabled_element(self.HOME_PAGE_XPATH)
+        return credentials
+
+    async def _select_region_from_taxes_form(self, region='2632'):
+        await self._select_by_value(self.REGION_FROM_TAXES_FORM_XPATH, region)
+
+    async def _fill_checkout_form(self):
+        await (await self._get_element_from_enabled_element(self.FIRST_NAME_INPUT_XPATH)).send_keys('Jan')
+        await self._wait_for_page_to_settle()
+        for xpath, text in ((self.LAST_NAME_INPUT_XPATH, 'Kowalski'), (self.ADDRESS1_INPUT_XPATH, 'Sloneczna 1'),
+                            (self.CITY_INPUT_XPATH, 'Wroclaw')):
+            await (await self._get_element_from_enabled_element(xpath)).send_keys(text)
+        await self._select_by_value(self.REGION_INPUT_XPATH, '2631')
+        for xpath in (self.CONTINUE_BILLING_DETAILS_BUTTON_XPATH, self.SHOPPING_BUTTON_XPATH,
+                      self.SHOPPING_METHOD_BUTTON_XPATH, self.TERM_AND_CONDITIONS_BUTTON_XPATH,
+                      self.PAYMENT_BUTTON_XPATH, self.CONFIRM_ORDER_XPATH):
+            await self._click_enabled_element(xpath)
+
+
+async def launch_many(count, profile=None):
+    """
+    Start `count` browser sessions concurrently.
+    :return: type: list of AsyncWebDriver
+    """
+    results = await asyncio.gather(*(AsyncWebDriver.launch(profile) for _ in range(count)), return_exceptions=True)
+    drivers = [result for result in results if isinstance(result, AsyncWebDriver)]
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        await asyncio.gather(*(driver.quit() for driver in drivers), return_exceptions=True)
+        raise errors[0]
+    return drivers
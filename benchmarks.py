@@ -0,0 +1,173 @@
+"""
+Module benchmarks page-object flows against a fixed shop
+
+Every flow runs many times in a fresh guest session, only the flow itself is timed.
+Results are compared with a stored baseline, flows which got slower or send more WebDriver commands are flagged.
+
+Usage: SHOP_URL=local python benchmarks.py -n 20 --baseline benchmark_baseline.json
+       SHOP_URL=local python benchmarks.py -n 20 --baseline benchmark_baseline.json --update-baseline
+"""
+import argparse
+import json
+import sys
+from collections import OrderedDict
+
+import driver_pool
+import local_shop
+import settings
+from instrumentation import Recorder, percentile
+from pages import HomePage, DetailsPage, ShoppingCartPage
+
+
+class Flow:
+    def __init__(self, name, run, setup=None):
+        """
+        :param run: type: callable taking driver, the timed part
+        :param setup: type: callable taking driver, untimed preparation run before every iteration
+        """
+        self.name = name
+        self.run = run
+        self.setup = setup
+
+
+def _add_product(driver):
+    HomePage(driver)._add_single_product_to_cart('2')
+
+
+def _go_to_checkout(driver):
+    ShoppingCartPage(driver)._register_user()
+    HomePage(driver)._click_enabled_element(HomePage.PRODUCT_DETAILS_XPATHS['2'])
+    DetailsPage(driver)._add_to_cart()
+    DetailsPage(driver)._go_to_shopping_cart_page()
+    ShoppingCartPage(driver)._click_enabled_element(ShoppingCartPage.CHECKOUT_BUTTON_XPATH)
+
+
+FLOWS = OrderedDict((flow.name, flow) for flow in [
+    Flow('add_single_product_to_cart', _add_product),
+    Flow('clean_cart', lambda driver: HomePage(driver)._clean_cart(), setup=_add_product),
+    Flow('register_user', lambda driver: ShoppingCartPage(driver)._register_user()),
+    Flow('fill_checkout_form', lambda driver: ShoppingCartPage(driver)._fill_checkout_form(), setup=_go_to_checkout),
+])
+
+
+def summarize(samples):
+    """
+    :param samples: type: list of (ms, commands, polls)
+    :return: type: dict with latency percentiles and round trip counts
+    """
+    durations = sorted(sample[0] for sample in samples)
+    commands = [sample[1] for sample in samples]
+    return {'runs': len(samples),
+            'p50_ms': round(percentile(durations, 50), 1),
+            'p95_ms': round(percentile(durations, 95), 1),
+            'p99_ms': round(percentile(durations, 99), 1),
+            'commands': round(sum(commands) / float(len(commands)), 1),
+            'max_commands': max(commands),
+            'polls': round(sum(sample[2] for sample in samples) / float(len(samples)), 1)}
+
+
+class Benchmark:
+    def __init__(self, driver, app_url, recorder=None):
+        self.driver = driver
+        self.app_url = app_url
+        self.recorder = recorder or Recorder()
+        self.recorder.attach(driver)
+        self.recorder.install()
+
+    def _reset(self):
+        self.driver.delete_all_cookies()
+        self.driver.get(self.app_url)
+
+    def run_once(self, flow):
+        """
+        :return: type: tuple (ms, commands, polls) of the timed part
+        """
+        self._reset()
+        self.recorder.start_test(flow.name)
+        try:
+            if flow.setup:
+                flow.setup(self.driver)
+            with self.recorder.step(flow.name) as step:
+                flow.run(self.driver)
+        finally:
+            self.recorder.stop_test()
+        return step.duration * 1000, step.commands, step.polls
+
+    def run(self, flow, iterations, warmup=1):
+        for _ in range(warmup):
+            self.run_once(flow)
+        return summarize([self.run_once(flow) for _ in range(iterations)])
+
+
+def find_regressions(results, baseline, tolerance=0.2, command_tolerance=0):
+    """
+    :param tolerance: type: float, allowed relative p95 slowdown
+    :param command_tolerance: type: float, allowed increase of mean WebDriver commands
+    :return: type: list of str descriptions
+    """
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        if result['p95_ms'] > old['p95_ms'] * (1 + tolerance):
+            regressions.append('{}: p95 {}ms -> {}ms'.format(name, old['p95_ms'], result['p95_ms']))
+        if result['commands'] > old['commands'] + command_tolerance:
+            regressions.append('{}: commands {} -> {}'.format(name, old['commands'], result['commands']))
+    return regressions
+
+
+def print_results(results, baseline):
+    print('{:<30} {:>5} {:>9} {:>9} {:>9} {:>9} {:>7}'.format('flow', 'runs', 'p50 ms', 'p95 ms', 'p99 ms',
+                                                           'commands', 'polls'))
+    for name, result in results.items():
+        old = baseline.get(name, {})
+        print('{:<30} {runs:>5} {p50_ms:>9} {p95_ms:>9} {p99_ms:>9} {commands:>9} {polls:>7}'.format(name, **result))
+        if old:
+            print('{:<30} {:>5} {p50_ms:>9} {p95_ms:>9} {p99_ms:>9} {commands:>9} {polls:>7}'.format(
+                '  baseline', '', **old))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark page-object flows')
+    parser.add_argument('flows', nargs='*', default=list(FLOWS), help='any of: ' + ', '.join(FLOWS))
+    parser.add_argument('-n', '--iterations', type=int, default=10)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--baseline', default='benchmark_baseline.json')
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative p95 slowdown')
+    args = parser.parse_args(argv)
+    unknown = set(args.flows) - set(FLOWS)
+    if unknown:
+        parser.error('unknown flows: ' + ', '.join(sorted(unknown)))
+
+    try:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    except FileNotFoundError:
+        baseline = {}
+
+    pool = driver_pool.get_pool()
+    driver = pool.lease()
+    try:
+        benchmark = Benchmark(driver, local_shop.resolve_app_url(settings.APP_URL))
+        results = OrderedDict((name, benchmark.run(FLOWS[name], args.iterations, args.warmup))
+                              for name in args.flows)
+    finally:
+        pool.release(driver)
+
+    print_results(results, baseline)
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+        print('Baseline written to {}'.format(args.baseline))
+        return 0
+    regressions = find_regressions(results, baseline, args.tolerance)
+    for regression in regressions:
+        print('REGRESSION ' + regression)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,261 @@
+"""
+Module represents long-lived daemon keeping warm browser sessions for many test runs
+
+The daemon starts browsers with the launch profile configured in settings and hands their sessions out
+over a local socket, so test runs attach to a running browser instead of starting one. Requests and
+replies are JSON lines:
+    {"op": "lease", "timeout": 60}  ->  {"executor_url": ..., "session_id": ..., "capabilities": ...}
+    {"op": "release", "session_id": ...}  ->  {"ok": true}
+    {"op": "status"}  ->  {"size": ..., "leased": ...}
+    {"op": "stop"}  ->  {"ok": true}
+On release the cart is emptied and storage and cookies are cleared. Sessions still leased when a client
+disconnects, eg. a crashed run, are released the same way.
+
+Usage: python browser_daemon.py serve --size 4 &
+       BROWSER_DAEMON=127.0.0.1:4455 python -m unittest test_order_product
+"""
+import argparse
+import json
+import socket
+import socketserver
+import sys
+import threading
+
+import requests
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+
+import settings
+from browser_profile import LaunchProfile
+from driver_pool import DriverPool
+from shop_api import ShopClient
+
+DEFAULT_ADDRESS = '127.0.0.1:4455'
+CLEAR_STORAGE_JS = 'window.localStorage.clear(); window.sessionStorage.clear();'
+
+
+def parse_address(address):
+    """
+    :param address: type: str, eg. 127.0.0.1:4455
+    :return: type: tuple (host, port)
+    """
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+class BrowserDaemon:
+    def __init__(self, size, factory=None):
+        """
+        :param size: type: int, browser sessions kept warm
+        :param factory: type: callable starting a browser, LaunchProfile.launch of settings by default
+        """
+        self.pool = DriverPool(size, factory or LaunchProfile.from_settings().launch)
+        self.server = None
+        self._leased = {}
+        self._lock = threading.Lock()
+
+    def lease(self, timeout=None):
+        """
+        :return: type: dict, executor url, session id and capabilities of an idle and responsive session
+        """
+        while True:
+            driver = self.pool.lease(timeout)
+            try:
+                driver.current_url
+                break
+            except WebDriverException:
+                # browser crashed or was closed while idle, start a new one instead
+                self.pool.discard(driver)
+        with self._lock:
+            self._leased[driver.session_id] = driver
+        return {'executor_url': driver.command_executor._url, 'session_id': driver.session_id,
+                'capabilities': driver.capabilities}
+
+    def release(self, session_id):
+        with self._lock:
+            driver = self._leased.pop(session_id, None)
+        if driver is None:
+            return
+        try:
+            self.reset(driver)
+        except WebDriverException:
+            self.pool.discard(driver)
+            return
+        self.pool.release(driver)
+
+    @staticmethod
+    def reset(driver):
+        """
+        Empty the cart and clear storage of the shop page the session was left on, DriverPool.release
+        drops the cookies afterwards.
+        """
+        if not driver.current_url.startswith('http'):
+            return
+        try:
+            # a logged-in customer's cart is kept by the shop, dropping the cookies is not enough
+            ShopClient.from_driver(driver).clear_cart()
+        except requests.RequestException:
+            pass
+        driver.execute_script(CLEAR_STORAGE_JS)
+
+    def status(self):
+        with self._lock:
+            return {'size': self.pool.size, 'leased': len(self._leased)}
+
+    def handle(self, request, leased):
+        """
+        :param request: type: dict, one request line
+        :param leased: type: set, session ids leased over the connection of the request
+        :return: type: dict, reply line
+        """
+        op = request.get('op')
+        if op == 'lease':
+            reply = self.lease(request.get('timeout'))
+            leased.add(reply['session_id'])
+            return reply
+        if op == 'release':
+            leased.discard(request['session_id'])
+            self.release(request['session_id'])
+            return {'ok': True}
+        if op == 'status':
+            return self.status()
+        if op == 'stop':
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return {'ok': True}
+        raise ValueError('Unknown op {!r}'.format(op))
+
+    def serve(self, address=DEFAULT_ADDRESS, warm_up=True):
+        """
+        Serve until stop request, then quit all browsers.
+        """
+        if warm_up:
+            self.pool.warm_up()
+        self.server = self.make_server(address)
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            self.pool.close()
+
+    def make_server(self, address=DEFAULT_ADDRESS):
+        daemon = self
+
+        class RequestHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                leased = set()
+                try:
+                    for line in self.rfile:
+                        if not line.strip():
+                            continue
+                        try:
+                            reply = daemon.handle(json.loads(line.decode()), leased)
+                        except Exception as error:
+                            reply = {'error': str(error), 'type': type(error).__name__}
+                        self.wfile.write(json.dumps(reply).encode() + b'\n')
+                except ConnectionError:
+                    pass
+                finally:
+                    for session_id in leased:
+                        daemon.release(session_id)
+
+        server = socketserver.ThreadingTCPServer(parse_address(address), RequestHandler, bind_and_activate=False)
+        server.allow_reuse_address = True
+        server.daemon_threads = True
+        server.server_bind()
+        server.server_activate()
+        return server
+
+
+class DaemonClient:
+    """
+    Connection of a test run to the daemon, sessions leased over it are released when it is closed.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, connect_timeout=5):
+        self.address = address
+        self._socket = socket.create_connection(parse_address(address), timeout=connect_timeout)
+        self._socket.settimeout(None)
+        self._file = self._socket.makefile('rwb')
+        self._lock = threading.Lock()
+
+    def _call(self, op, **params):
+        with self._lock:
+            self._file.write(json.dumps(dict(params, op=op)).encode() + b'\n')
+            self._file.flush()
+            line = self._file.readline()
+        if not line:
+            raise ConnectionError('Browser daemon at {} closed the connection'.format(self.address))
+        reply = json.loads(line.decode())
+        if 'error' in reply:
+            raise (TimeoutError if reply['type'] == 'TimeoutError' else RuntimeError)(reply['error'])
+        return reply
+
+    def lease(self, timeout=None):
+        """
+        :param timeout: type: float, seconds to wait for a free session
+        :return: type: DaemonDriver attached to a warm session
+        """
+        return DaemonDriver(self, self._call('lease', timeout=timeout))
+
+    def release(self, session_id):
+        self._call('release', session_id=session_id)
+
+    def status(self):
+        return self._call('status')
+
+    def stop(self):
+        return self._call('stop')
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+
+class DaemonDriver(webdriver.Remote):
+    """
+    Remote driver attached to a session of the daemon instead of starting one, quit gives it back.
+    """
+
+    def __init__(self, client, lease):
+        """
+        :param lease: type: dict, reply to lease request
+        """
+        self._client = client
+        self._lease = lease
+        super(DaemonDriver, self).__init__(command_executor=lease['executor_url'],
+                                           desired_capabilities=lease['capabilities'])
+
+    def start_session(self, capabilities, browser_profile=None):
+        self.session_id = self._lease['session_id']
+        self.capabilities = self._lease['capabilities']
+        self.w3c = True
+        self.command_executor.w3c = True
+
+    def quit(self):
+        try:
+            self._client.release(self.session_id)
+        finally:
+            self.stop_client()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Keep warm browser sessions for test runs')
+    parser.add_argument('command', choices=['serve', 'status', 'stop'])
+    parser.add_argument('--address', default=settings.BROWSER_DAEMON or DEFAULT_ADDRESS, help='host:port')
+    parser.add_argument('--size', type=int, default=settings.DRIVER_POOL_SIZE, help='browser sessions kept warm')
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        sys.stderr.write('Serving {} browser sessions on {}\n'.format(args.size, args.address))
+        BrowserDaemon(args.size).serve(args.address)
+        return 0
+    client = DaemonClient(args.address)
+    try:
+        print(json.dumps(client.status() if args.command == 'status' else client.stop()))
+    finally:
+        client.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+Module represents configurable Firefox launch profile
+"""
+import atexit
+import os
+import shutil
+import tempfile
+import weakref
+
+from selenium import webdriver
+
+import settings
+
+# files of a running browser, a copy of the profile must not inherit them
+PROFILE_LOCK_FILES = ('lock', '.parentlock', 'parent.lock')
+
+# page console output goes to the geckodriver log, failure artifacts pick it up from there
+CONSOLE_TO_LOG_PREFERENCES = {
+    'devtools.console.stdout.content': True,
+}
+
+NO_IMAGES_PREFERENCES = {
+    'permissions.default.image': 2,
+    'gfx.downloadable_fonts.enabled': False,
+}
+
+NO_EXTENSIONS_PREFERENCES = {
+    'extensions.screenshots.disabled': True,
+    'extensions.pocket.enabled': False,
+    'extensions.formautofill.available': 'off',
+    'extensions.systemAddon.update.enabled': False,
+    'extensions.update.enabled': False,
+    'extensions.getAddons.cache.enabled': False,
+}
+
+NO_BACKGROUND_SERVICES_PREFERENCES = {
+    'toolkit.telemetry.enabled': False,
+    'toolkit.telemetry.unified': False,
+    'toolkit.telemetry.archive.enabled': False,
+    'datareporting.healthreport.uploadEnabled': False,
+    'datareporting.policy.dataSubmissionEnabled': False,
+    'browser.ping-centre.telemetry': False,
+    'app.normandy.enabled': False,
+    'app.update.auto': False,
+    'app.update.enabled': False,
+    'extensions.blocklist.enabled': False,
+    'services.settings.poll_interval': 86400 * 365,
+    'browser.safebrowsing.malware.enabled': False,
+    'browser.safebrowsing.phishing.enabled': False,
+    'browser.safebrowsing.downloads.enabled': False,
+    'browser.safebrowsing.provider.mozilla.updateURL': '',
+    'network.captive-portal-service.enabled': False,
+    'network.connectivity-service.enabled': False,
+    'browser.newtabpage.activity-stream.feeds.snippets': False,
+    'browser.newtabpage.activity-stream.feeds.telemetry': False,
+    'browser.shell.checkDefaultBrowser': False,
+    'browser.startup.homepage_override.mstone': 'ignore',
+}
+
+
+class LaunchProfile:
+    def __init__(self, headless=False, load_images=True, disable_extensions=True, disable_background_services=True,
+                 profile_dir=None, log_path='geckodriver.log'):
+        """
+        :param load_images: type: bool, False disables images and downloadable fonts
+        :param disable_extensions: type: bool, disable built-in system add-ons, eg. screenshots
+        :param disable_background_services: type: bool, disable telemetry, updates and remote-settings polling
+        :param profile_dir: type: str, pre-warmed profile reused between runs, every session gets own copy of it
+        :param log_path: type: str, geckodriver log file, os.devnull disables logging
+        """
+        self.headless = headless
+        self.load_images = load_images
+        self.disable_extensions = disable_extensions
+        self.disable_background_services = disable_background_services
+        self.profile_dir = profile_dir
+        self.log_path = log_path
+
+    @classmethod
+    def from_settings(cls):
+        return cls(headless=settings.HEADLESS,
+                   load_images=settings.LOAD_IMAGES,
+                   disable_extensions=settings.DISABLE_EXTENSIONS,
+                   disable_background_services=settings.DISABLE_BACKGROUND_SERVICES,
+                   profile_dir=settings.BROWSER_PROFILE_DIR,
+                   log_path=settings.GECKODRIVER_LOG)
+
+    def preferences(self):
+        preferences = {}
+        if self.log_path != os.devnull:
+            preferences.update(CONSOLE_TO_LOG_PREFERENCES)
+        if not self.load_images:
+            preferences.update(NO_IMAGES_PREFERENCES)
+        if self.disable_extensions:
+            preferences.update(NO_EXTENSIONS_PREFERENCES)
+        if self.disable_background_services:
+            preferences.update(NO_BACKGROUND_SERVICES_PREFERENCES)
+        return preferences
+
+    def options(self):
+        options = webdriver.FirefoxOptions()
+        options.headless = self.headless
+        for name, value in self.preferences().items():
+            options.set_preference(name, value)
+        return options
+
+    def session_options(self):
+        """
+        Options of one session. Session started from pre-warmed profile gets its own copy of the directory,
+        so sessions never share cookies, and the browser opens the copy in place with -profile instead of
+        receiving the profile zipped and base64-encoded through geckodriver.
+        :return: type: tuple (FirefoxOptions, str profile copy or None)
+        """
+        options = self.options()
+        if not self.profile_dir:
+            return options, None
+        self.prewarm()
+        directory = tempfile.mkdtemp(prefix='firefox-profile-')
+        shutil.copytree(self.profile_dir, directory, dirs_exist_ok=True,
+                        ignore=shutil.ignore_patterns(*PROFILE_LOCK_FILES))
+        options.add_argument('-profile')
+        options.add_argument(directory)
+        return options, directory
+
+    def capabilities(self):
+        """
+        W3C capabilities of a session with this profile, for clients creating sessions without Selenium.
+        """
+        options, directory = self.session_options()
+        if directory:
+            atexit.register(shutil.rmtree, directory, True)
+        capabilities = options.to_capabilities()
+        # legacy flag of Selenium's own handshake, not a W3C capability
+        capabilities.pop('marionette', None)
+        return capabilities
+
+    def launch(self):
+        """
+        Start new browser session, copy of pre-warmed profile is removed with the driver.
+        """
+        options, directory = self.session_options()
+        driver = webdriver.Firefox(options=options, service_log_path=self.log_path)
+        if directory:
+            weakref.finalize(driver, shutil.rmtree, directory, True)
+        return driver
+
+    def prewarm(self):
+        """
+        Create profile directory once by starting browser on it in place, so startup caches
+        are written to the directory and copied to every later session.
+        """
+        if os.path.isdir(self.profile_dir) and os.listdir(self.profile_dir):
+            return
+        os.makedirs(self.profile_dir, exist_ok=True)
+        options = self.options()
+        options.add_argument('-profile')
+        options.add_argument(os.path.abspath(self.profile_dir))
+        driver = webdriver.Firefox(options=options, service_log_path=self.log_path)
+        try:
+            driver.get('about:blank')
+        finally:
+            driver.quit()
@@ -0,0 +1,109 @@
+"""
+Module represents scanner discovering products listed on home, category and search pages
+"""
+import re
+from collections import namedtuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from locators import Css
+
+Product = namedtuple('Product', ['id', 'name', 'price', 'add_to_cart'])
+
+_SCAN_PAGE_JS = """
+var cards = document.querySelectorAll(arguments[0]), products = [], next = null;
+for (var i = 0; i < cards.length; i++) {
+    var button = cards[i].querySelector('button[onclick^="cart.add"]');
+    var link = cards[i].querySelector('h4 a'), price = cards[i].querySelector('.price');
+    products.push([button ? button.getAttribute('onclick') : '', link ? link.textContent.trim() : '',
+                   price ? price.textContent.trim() : '']);
+}
+var pages = document.querySelectorAll(arguments[1]);
+for (var j = 0; j < pages.length; j++) {
+    if (pages[j].textContent.trim() === '>') {
+        next = pages[j].href;
+    }
+}
+return {products: products, next: next};
+"""
+
+_CATEGORY_URLS_JS = """
+return Array.prototype.map.call(document.querySelectorAll(arguments[0]), function (link) { return link.href; });
+"""
+
+
+class CatalogScanner:
+    """
+    Reads all product cards of a page with one script call and follows pagination lazily,
+    next page is loaded only when products of the previous one were consumed.
+    """
+    PRODUCT_CARD_CSS = '.product-thumb'
+    PAGINATION_LINKS_CSS = 'ul.pagination a'
+    CATEGORY_LINKS_CSS = '#menu a[href*="route=product/category"]'
+    PRODUCT_ID_PATTERN = re.compile(r"cart\.add\('(\d+)'")
+    PRICE_PATTERN = re.compile(r"\$([\d,]+\.\d+)")
+
+    def __init__(self, driver, page_size=None):
+        """
+        :param page_size: type: int, products per listing page requested with limit parameter
+        """
+        self.driver = driver
+        self.page_size = page_size
+
+    def _with_page_size(self, url):
+        if not self.page_size:
+            return url
+        parts = urlsplit(url)
+        query = dict(parse_qsl(parts.query), limit=str(self.page_size))
+        return urlunsplit(parts._replace(query=urlencode(query, safe='/')))
+
+    def _to_product(self, onclick, name, price_text):
+        product_id = self.PRODUCT_ID_PATTERN.search(onclick)
+        price = self.PRICE_PATTERN.search(price_text)
+        if not product_id or not price:
+            return None
+        product_id = product_id.group(1)
+        add_to_cart = Css('{} button[onclick^="cart.add(\'{}\'"]'.format(self.PRODUCT_CARD_CSS, product_id))
+        return Product(product_id, name, price.group(1), add_to_cart)
+
+    def scan_page(self):
+        """
+        Read products of current page.
+        :return: type: tuple (list of Product, url of next page or None)
+        """
+        page = self.driver.execute_script(_SCAN_PAGE_JS, self.PRODUCT_CARD_CSS, self.PAGINATION_LINKS_CSS)
+        products = [self._to_product(*card) for card in page['products']]
+        return [product for product in products if product], page['next']
+
+    def iter_products(self, url=None):
+        """
+        Yield products of listing starting at `url` (current page by default), following pagination.
+        """
+        if url:
+            self.driver.get(self._with_page_size(url))
+        while True:
+            products, next_url = self.scan_page()
+            yield from products
+            if not next_url:
+                return
+            self.driver.get(next_url)
+
+    def get_category_urls(self):
+        """
+        :return: type: list of str, category pages linked from menu of current page
+        """
+        urls = self.driver.execute_script(_CATEGORY_URLS_JS, self.CATEGORY_LINKS_CSS)
+        return list(dict.fromkeys(urls))
+
+    def iter_catalog(self, home_url=None):
+        """
+        Yield every product of home page and of all categories once.
+        """
+        if home_url:
+            self.driver.get(home_url)
+        category_urls = self.get_category_urls()
+        seen = set()
+        for url in [None] + category_urls:
+            for product in self.iter_products(url):
+                if product.id not in seen:
+                    seen.add(product.id)
+                    yield product
@@ -0,0 +1,100 @@
+"""
+Module represents pool of browser sessions leased by tests
+"""
+import atexit
+import queue
+import threading
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+
+import settings
+from browser_profile import LaunchProfile
+
+
+class DriverPool:
+    """
+    Keeps up to `size` browser sessions. Every session is started with its own profile,
+    so it has its own cookie jar and therefore its own cart.
+    """
+
+    def __init__(self, size, factory=webdriver.Firefox):
+        self.size = size
+        self._factory = factory
+        self._idle = queue.LifoQueue()
+        self._drivers = []
+        self._lock = threading.Lock()
+
+    def warm_up(self):
+        """
+        Start all sessions up front instead of on first lease.
+        """
+        with self._lock:
+            while len(self._drivers) < self.size:
+                driver = self._factory()
+                self._drivers.append(driver)
+                self._idle.put(driver)
+
+    def lease(self, timeout=None):
+        """
+        Return idle session, start a new one while pool is not full or wait for a release.
+        :param timeout: type: float, seconds to wait for a free session
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._drivers) < self.size:
+                driver = self._factory()
+                self._drivers.append(driver)
+                return driver
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError('No browser session released within {}s'.format(timeout))
+
+    def release(self, driver):
+        """
+        Give session back to the pool. Cookies are dropped, so next lessee starts with an empty cart.
+        """
+        driver.delete_all_cookies()
+        self._idle.put(driver)
+
+    def discard(self, driver):
+        """
+        Drop session which stopped responding, a new one is started on next lease.
+        """
+        with self._lock:
+            if driver in self._drivers:
+                self._drivers.remove(driver)
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+    def close(self):
+        with self._lock:
+            while self._drivers:
+                self._drivers.pop().quit()
+
+
+_pool = None
+
+
+def get_pool():
+    """
+    Return pool shared by tests of the current process, sized by settings.DRIVER_POOL_SIZE
+    and launching browsers with profile configured in settings. With settings.BROWSER_DAEMON set
+    sessions are leased from the daemon instead, closing the pool gives them back.
+    """
+    global _pool
+    if _pool is None:
+        if settings.BROWSER_DAEMON:
+            import browser_daemon
+            factory = browser_daemon.DaemonClient(settings.BROWSER_DAEMON).lease
+        else:
+            factory = LaunchProfile.from_settings().launch
+        _pool = DriverPool(settings.DRIVER_POOL_SIZE, factory)
+        atexit.register(_pool.close)
+    return _pool
@@ -0,0 +1,224 @@
+"""
+Module represents failure-only artifact capture
+
+FlightRecorder keeps the last WebDriver commands of the current test and a few cheap page summaries in bounded
+in-memory buffers. Nothing is written while tests pass. When a test fails the buffers are dumped to
+settings.ARTIFACTS_DIR together with a screenshot, the page source and the browser console lines
+the geckodriver log got during the test:
+
+    artifacts/test_order_product.TestOrderProduct.test_buying_process-20240101-120000/
+        events.json     commands, page summaries and console lines, oldest first
+        screenshot.png
+        page.html
+
+Test classes opt in with the capture_failures decorator and a flight_recorder attribute.
+"""
+import functools
+import json
+import os
+import re
+import time
+import unittest
+from collections import deque
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.remote.command import Command
+
+import settings
+
+# commands after which the page may look different, page is summarized after them
+SNAPSHOT_COMMANDS = frozenset([Command.GET, Command.CLICK_ELEMENT, Command.SUBMIT_ELEMENT, Command.REFRESH,
+                               Command.GO_BACK, Command.GO_FORWARD])
+CONSOLE_LINE_PREFIXES = ('console.', 'JavaScript error:', 'JavaScript warning:')
+# keys element references are sent under, W3C and legacy JSON wire protocol
+ELEMENT_KEYS = ('element-6066-11e4-a52e-4f735466cecf', 'ELEMENT')
+
+_SNAPSHOT_JS = """
+var alerts = document.querySelectorAll('.alert, .text-danger');
+return {url: location.href, title: document.title, ready: document.readyState,
+        alerts: Array.prototype.slice.call(alerts, 0, 20).map(function (alert) {
+            return alert.textContent.trim();
+        })};
+"""
+
+
+def capture_failures(cls):
+    """
+    Wrap test methods of TestCase class, so a failing one dumps the flight_recorder of the test case
+    before tearDown changes the page. Works with any runner, skips do not count as failures.
+    Apply below scenarios.expand, cells call the wrapped scenario method.
+    """
+    for name, method in list(vars(cls).items()):
+        if name.startswith('test') and callable(method):
+            setattr(cls, name, _capture_failure(method))
+    return cls
+
+
+def _capture_failure(method):
+    @functools.wraps(method)
+    def captured(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        except unittest.SkipTest:
+            raise
+        except Exception:
+            recorder = getattr(self, 'flight_recorder', None)
+            if recorder is not None:
+                recorder.dump(settings.ARTIFACTS_DIR)
+            raise
+    return captured
+
+
+def _summarize(params, limit=200):
+    summary = {}
+    for name, value in (params or {}).items():
+        if name == 'sessionId':
+            continue
+        element_key = next((key for key in ELEMENT_KEYS if key in value), None) if isinstance(value, dict) else None
+        if element_key is not None:
+            value = 'element ' + value[element_key]
+        elif not isinstance(value, (bool, int, float)) and value is not None:
+            value = str(value)
+            value = value if len(value) <= limit else value[:limit] + '...'
+        summary[name] = value
+    return summary
+
+
+class FlightRecorder:
+    def __init__(self, size=200, snapshots=5, snapshot_interval=2.0, log_path=None):
+        """
+        :param size: type: int, commands and console lines kept
+        :param snapshots: type: int, page summaries kept, url, title, ready state and alert texts
+        :param snapshot_interval: type: float, minimal seconds between two summaries
+        :param log_path: type: str, geckodriver log browser console output is read from
+        """
+        self.size = size
+        self.snapshot_interval = snapshot_interval
+        self.log_path = log_path
+        self.driver = None
+        self.test_id = None
+        self._commands = deque(maxlen=size)
+        self._snapshots = deque(maxlen=snapshots)
+        self._start = time.perf_counter()
+        self._last_snapshot = 0.0
+        self._log_offset = 0
+        self._paused = False
+
+    @classmethod
+    def from_settings(cls, driver):
+        """
+        :return: type: FlightRecorder attached to driver, None when settings.ARTIFACTS_DIR is empty
+        """
+        if not settings.ARTIFACTS_DIR:
+            return None
+        recorder = cls(settings.ARTIFACT_BUFFER_SIZE, log_path=settings.GECKODRIVER_LOG)
+        recorder.attach(driver)
+        return recorder
+
+    def attach(self, driver):
+        """
+        Record every WebDriver command sent by driver and its elements.
+        """
+        if getattr(driver.execute, 'flight_recorder', None) is self:
+            return
+        self.driver = driver
+        execute = driver.execute
+
+        @functools.wraps(execute)
+        def recorded_execute(driver_command, params=None):
+            if self._paused:
+                return execute(driver_command, params)
+            start = time.perf_counter()
+            try:
+                response = execute(driver_command, params)
+            except Exception as error:
+                # kept as raw tuples, formatting is left to dump so passing tests do not pay for it
+                self._commands.append((start, driver_command, params, time.perf_counter() - start, error))
+                raise
+            self._commands.append((start, driver_command, params, time.perf_counter() - start, None))
+            if driver_command in SNAPSHOT_COMMANDS and start - self._last_snapshot >= self.snapshot_interval:
+                self._snapshot(execute)
+            return response
+
+        recorded_execute.flight_recorder = self
+        driver.execute = recorded_execute
+
+    def _snapshot(self, execute):
+        self._last_snapshot = time.perf_counter()
+        command = Command.W3C_EXECUTE_SCRIPT if self.driver.w3c else Command.EXECUTE_SCRIPT
+        try:
+            snapshot = execute(command, {'script': _SNAPSHOT_JS, 'args': []})['value']
+        except WebDriverException:
+            return
+        self._snapshots.append((self._last_snapshot, snapshot))
+
+    def start_test(self, test_id):
+        """
+        Forget buffers of the previous test.
+        """
+        self.test_id = test_id
+        self._commands.clear()
+        self._snapshots.clear()
+        self._start = time.perf_counter()
+        self._last_snapshot = 0.0
+        try:
+            self._log_offset = os.path.getsize(self.log_path) if self.log_path else 0
+        except OSError:
+            self._log_offset = 0
+
+    def _ms(self, moment):
+        return round((moment - self._start) * 1000, 1)
+
+    def console_lines(self):
+        """
+        :return: type: list of str, last `size` console lines of the geckodriver log written since test start,
+            with parallel workers sharing the log they may come from other browsers too
+        """
+        lines = deque(maxlen=self.size)
+        if not self.log_path:
+            return []
+        try:
+            with open(self.log_path, encoding='utf-8', errors='replace') as log:
+                log.seek(self._log_offset)
+                for line in log:
+                    if line.startswith(CONSOLE_LINE_PREFIXES):
+                        lines.append(line.rstrip('\n'))
+        except OSError:
+            return []
+        return list(lines)
+
+    def events(self):
+        """
+        :return: type: dict, JSON serializable content of the buffers
+        """
+        return {'test': self.test_id,
+                'commands': [{'ms': self._ms(start), 'command': command, 'params': _summarize(params),
+                              'duration_ms': round(duration * 1000, 1),
+                              'error': '{}: {}'.format(type(error).__name__, str(error).strip()) if error else None}
+                             for start, command, params, duration, error in self._commands],
+                'snapshots': [dict(snapshot, ms=self._ms(moment)) for moment, snapshot in self._snapshots],
+                'console': self.console_lines()}
+
+    def dump(self, directory):
+        """
+        Write buffers, screenshot and page source of current test.
+        :return: type: str, directory the artifacts were written to
+        """
+        name = re.sub(r'[^\w.-]+', '_', self.test_id or 'unknown') + time.strftime('-%Y%m%d-%H%M%S')
+        path = os.path.join(directory, name)
+        os.makedirs(path, exist_ok=True)
+        events = self.events()
+        self._paused = True
+        try:
+            # browser may be gone already, buffers are still worth writing
+            events['url'] = self.driver.current_url
+            self.driver.get_screenshot_as_file(os.path.join(path, 'screenshot.png'))
+            with open(os.path.join(path, 'page.html'), 'w', encoding='utf-8') as page_file:
+                page_file.write(self.driver.page_source)
+        except WebDriverException as error:
+            events['capture_error'] = '{}: {}'.format(type(error).__name__, str(error).strip())
+        finally:
+            self._paused = False
+        with open(os.path.join(path, 'events.json'), 'w', encoding='utf-8') as events_file:
+            json.dump(events, events_file, indent=2)
+        return path
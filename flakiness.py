@@ -0,0 +1,218 @@
+"""
+Module represents defences against timing-sensitive flakiness
+
+LatencyHistory learns how long every locator takes to appear from _find_element steps of recent runs
+(the tail of settings.TIMINGS_LOG) and of the current one. Page objects wait for an element that was
+slow before longer than the default 10 seconds (p99 latency times a safety factor) and poll faster
+for locators which usually appear quickly. Timeouts never drop below the default, a fast history does not make
+a slower run fail.
+
+RetryBudget limits retries of intercepted or not interactable clicks: every action earns a fraction
+of a retry, so retries can not multiply the load when the page is broken rather than flaky. Looking up
+a stale element again after the page changed is not charged.
+
+Quarantine keeps track of tests which failed and passed on rerun. Tests flaking repeatedly are run
+by parallel_runner in a separate pass, their results do not fail the main run until they are stable again.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+
+import settings
+from instrumentation import percentile
+
+DEFAULT_TIMEOUT = 10
+
+
+def tail_lines(path, count, block_size=1 << 16):
+    """
+    Read only the end of a file, however long it grew.
+    :return: type: list of str, last `count` lines
+    """
+    chunks, newlines = [], 0
+    with open(path, 'rb') as tail_file:
+        position = tail_file.seek(0, os.SEEK_END)
+        while position > 0 and newlines <= count:
+            size = min(block_size, position)
+            position -= size
+            tail_file.seek(position)
+            chunks.append(tail_file.read(size))
+            newlines += chunks[-1].count(b'\n')
+    # first line may be cut, it is dropped unless the whole file has fewer lines
+    return b''.join(reversed(chunks)).decode('utf-8', errors='replace').splitlines()[-count:]
+
+
+class LatencyHistory:
+    def __init__(self, default_timeout=DEFAULT_TIMEOUT, default_poll=0.1, factor=3.0, max_timeout=30.0,
+                 min_poll=0.025, min_samples=5, size=200):
+        """
+        :param factor: type: float, learned timeout is p99 latency times factor, at least default timeout
+        :param min_samples: type: int, locators with fewer samples use default timeout and poll
+        :param size: type: int, recent samples kept per locator
+        """
+        self.default_timeout = default_timeout
+        self.default_poll = default_poll
+        self.factor = factor
+        self.max_timeout = max_timeout
+        self.min_poll = min_poll
+        self.min_samples = min_samples
+        self.size = size
+        self._samples = {}
+        self._cache = {}
+
+    def load(self, path, records=20000):
+        """
+        Learn from _find_element steps of an instrumentation timings log, missing log is ignored.
+        :param records: type: int, last records of the log read, older runs are forgotten
+        """
+        if not path or not os.path.exists(path):
+            return self
+        for line in tail_lines(path, records):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record['kind'] == 'step' and record['locator'] and record['name'].endswith('._find_element'):
+                self.observe(record['locator'], record['ms'] / 1000.0)
+        return self
+
+    def observe(self, locator, seconds):
+        """
+        :param locator: type: Locator or str
+        :param seconds: type: float, time it took to find the element
+        """
+        key = str(locator)
+        self._samples.setdefault(key, deque(maxlen=self.size)).append(seconds)
+        self._cache.pop(key, None)
+
+    def _learned(self, locator):
+        key = str(locator)
+        if key not in self._cache:
+            samples = sorted(self._samples.get(key, ()))
+            if len(samples) < self.min_samples:
+                self._cache[key] = (self.default_timeout, self.default_poll)
+            else:
+                timeout = min(max(percentile(samples, 99) * self.factor, self.default_timeout), self.max_timeout)
+                poll = min(max(percentile(samples, 50) / 4.0, self.min_poll), self.default_poll)
+                self._cache[key] = (timeout, poll)
+        return self._cache[key]
+
+    def wait_for(self, locator):
+        """
+        :return: type: tuple (timeout, poll frequency) in seconds, defaults when locator is None or not learned yet
+        """
+        return (self.default_timeout, self.default_poll) if locator is None else self._learned(locator)
+
+
+class RetryBudget:
+    def __init__(self, ratio=0.1, minimum=3, maximum=10):
+        """
+        :param ratio: type: float, retries earned by every action
+        :param minimum: type: int, retries available before any action earned them
+        :param maximum: type: int, retries which can be saved up
+        """
+        self.ratio = ratio
+        self.maximum = maximum
+        self.retries = 0
+        self.denied = 0
+        self._balance = float(minimum)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._balance = min(self._balance + self.ratio, self.maximum)
+
+    def withdraw(self):
+        """
+        :return: type: bool, False when budget is spent and the error has to be raised
+        """
+        with self._lock:
+            # tolerate rounding of the deposited fractions
+            if self._balance < 1 - 1e-9:
+                self.denied += 1
+                return False
+            self._balance -= 1
+            self.retries += 1
+            return True
+
+
+class Quarantine:
+    def __init__(self, path=None, threshold=2, window=10, release_after=3):
+        """
+        :param path: type: str, JSON file the outcomes are kept in between runs, None keeps them in memory
+        :param threshold: type: int, flaky outcomes within window quarantining a test
+        :param window: type: int, recent outcomes kept per test
+        :param release_after: type: int, consecutive passes in quarantine releasing a test
+        """
+        self.path = path
+        self.threshold = threshold
+        self.window = window
+        self.release_after = release_after
+        self._tests = self._load()
+
+    def _load(self):
+        if not self.path:
+            return {}
+        try:
+            with open(self.path) as quarantine_file:
+                return json.load(quarantine_file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.NamedTemporaryFile('w', dir=directory, delete=False, suffix='.tmp') as quarantine_file:
+            json.dump(self._tests, quarantine_file, indent=2, sort_keys=True)
+        os.replace(quarantine_file.name, self.path)
+
+    def is_quarantined(self, test_id):
+        return self._tests.get(test_id, {}).get('quarantined', False)
+
+    @property
+    def quarantined(self):
+        return sorted(test_id for test_id, test in self._tests.items() if test['quarantined'])
+
+    def record(self, test_id, outcome):
+        """
+        :param outcome: type: str, pass, fail or flaky (failed and passed on rerun)
+        """
+        test = self._tests.setdefault(test_id, {'quarantined': False, 'outcomes': [], 'since': None})
+        test['outcomes'] = (test['outcomes'] + [outcome])[-self.window:]
+        recent = test['outcomes'][-self.release_after:]
+        if not test['quarantined'] and test['outcomes'].count('flaky') >= self.threshold:
+            test.update(quarantined=True, outcomes=[], since=time.strftime('%Y-%m-%d %H:%M'))
+        elif test['quarantined'] and len(recent) == self.release_after and set(recent) == {'pass'}:
+            test.update(quarantined=False, outcomes=[], since=None)
+
+
+_history = None
+_budget = None
+
+
+def get_latency_history():
+    """
+    Return latency history of current process learned from settings.TIMINGS_LOG, it only gives default
+    timeouts when settings.ADAPTIVE_TIMEOUTS is off.
+    """
+    global _history
+    if _history is None:
+        if settings.ADAPTIVE_TIMEOUTS:
+            _history = LatencyHistory().load(settings.TIMINGS_LOG)
+        else:
+            _history = LatencyHistory(min_samples=float('inf'))
+    return _history
+
+
+def get_retry_budget():
+    """
+    Return retry budget shared by page objects of current process, settings.RETRY_BUDGET is the ratio
+    of retries to actions.
+    """
+    global _budget
+    if _budget is None:
+        _budget = RetryBudget(settings.RETRY_BUDGET)
+    return _budget
@@ -0,0 +1,320 @@
+"""
+Module represents test impact selection from page-object usage recorded by instrumentation
+
+The index maps every test to the page-object methods and locator constants it touched in an earlier run
+with settings.TIMINGS_LOG set. Locators are recorded as values, so they are mapped back to the names of
+constants holding them; constants a method or test reads without passing them to another helper are found
+in the source. A diff of pages.py is mapped to changed methods and constants by line ranges of the
+class members, only tests touching them are selected. Any change the index can not account for,
+eg. imports, module-level code or members no recorded test used, selects the whole suite.
+
+Usage: python impact.py index timings.jsonl
+       python impact.py select timings.jsonl --base HEAD test_order_product
+       python parallel_runner.py --impact-base HEAD test_order_product
+"""
+import argparse
+import ast
+import inspect
+import json
+import os
+import re
+import subprocess
+import sys
+import unittest
+
+import pages
+from instrumentation import read_records
+from locators import Locator
+
+PAGES_FILE = 'pages.py'
+HUNK_PATTERN = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+CONSTANT_PATTERN = re.compile(r'^[A-Z][A-Z0-9_]*$')
+
+
+def _locator_keys(locator):
+    """
+    Both forms a locator is recorded in: as page-object argument and as WebDriver command, where
+    id lookups are sent as CSS selectors.
+    """
+    keys = {str(locator)}
+    if locator.by == 'id':
+        keys.add('css selector=[id="{}"]'.format(locator.value))
+    return keys
+
+
+def locator_constants(module=pages):
+    """
+    :return: type: dict, recorded locator -> set of constants holding it, eg. 'ShoppingCartPage.CHECKOUT_BUTTON_XPATH'
+    """
+    constants = {}
+    for cls in _page_classes(module):
+        for name, value in vars(cls).items():
+            if not CONSTANT_PATTERN.match(name):
+                continue
+            values = value.values() if isinstance(value, dict) else [value]
+            for locator in values:
+                if isinstance(locator, Locator):
+                    for key in _locator_keys(locator):
+                        constants.setdefault(key, set()).add('{}.{}'.format(cls.__name__, name))
+    return constants
+
+
+def _page_classes(module):
+    return [value for value in vars(module).values()
+            if inspect.isclass(value) and value.__module__ == module.__name__]
+
+
+def build_index(records, module=pages):
+    """
+    :param records: type: iterable of instrumentation records
+    :return: type: dict, test id -> {'methods': [...], 'constants': [...]}
+    """
+    constants = locator_constants(module)
+    index = {}
+    for record in records:
+        if record['kind'] == 'test':
+            index.setdefault(record['test'], {'methods': set(), 'constants': set()})
+            continue
+        entry = index.setdefault(record['test'], {'methods': set(), 'constants': set()})
+        if record['kind'] == 'step':
+            entry['methods'].add(record['name'])
+        if record['locator']:
+            entry['constants'].update(constants.get(record['locator'], ()))
+    return {test: {'methods': sorted(entry['methods']), 'constants': sorted(entry['constants'])}
+            for test, entry in index.items()}
+
+
+def _members(tree):
+    """
+    :return: type: list of (first_line, last_line, name or None), name is 'Class.member' of methods and
+        constants, None for code the index can not account for
+    """
+    members = []
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            first = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+            body_start = node.body[0].lineno
+            members.append((first, body_start - 1, None))
+            for member in node.body:
+                members.append(_member_range(member, node.name))
+        elif isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) and node is tree.body[0]:
+            members.append((node.lineno, node.end_lineno, ''))
+        else:
+            members.append((node.lineno, node.end_lineno, None))
+    return members
+
+
+def _member_range(node, class_name):
+    first = min([node.lineno] + [decorator.lineno for decorator in getattr(node, 'decorator_list', [])])
+    name = None
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        name = '{}.{}'.format(class_name, node.name)
+    elif isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+        name = '{}.{}'.format(class_name, node.targets[0].id)
+    elif isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant):
+        # docstring
+        name = ''
+    return first, node.end_lineno, name
+
+
+def _symbols_at(source, lines):
+    """
+    :return: type: tuple (set of changed names, bool whether some change is not accounted for)
+    """
+    members = _members(ast.parse(source))
+    source_lines = source.splitlines()
+    symbols, unknown = set(), False
+    for line in lines:
+        names = [name for first, last, name in members if first <= line <= last]
+        if not names:
+            text = source_lines[line - 1].strip() if line <= len(source_lines) else ''
+            unknown = unknown or bool(text and not text.startswith('#'))
+        for name in names:
+            if name is None:
+                unknown = True
+            elif name:
+                symbols.add(name)
+    return symbols, unknown
+
+
+def changed_lines(diff):
+    """
+    :param diff: type: str, unified diff of one file
+    :return: type: tuple (old line numbers, new line numbers) touched by the diff
+    """
+    old, new = set(), set()
+    for line in diff.splitlines():
+        match = HUNK_PATTERN.match(line)
+        if match:
+            old_start, old_count, new_start, new_count = match.groups()
+            old_count = 1 if old_count is None else int(old_count)
+            new_count = 1 if new_count is None else int(new_count)
+            # lines of pure insertions are found in the new source, of pure deletions in the old one
+            old.update(range(int(old_start), int(old_start) + old_count))
+            new.update(range(int(new_start), int(new_start) + new_count))
+    return old, new
+
+
+def changed_symbols(old_source, new_source, diff):
+    """
+    :return: type: tuple (set of changed 'Class.member' names, bool whether the whole suite has to run)
+    """
+    old_lines, new_lines = changed_lines(diff)
+    old_symbols, old_unknown = _symbols_at(old_source, old_lines) if old_source else (set(), bool(old_lines))
+    new_symbols, new_unknown = _symbols_at(new_source, new_lines) if new_source else (set(), bool(new_lines))
+    return old_symbols | new_symbols, old_unknown or new_unknown
+
+
+def referenced_constants(source):
+    """
+    :return: type: dict, 'Class.method' -> set of constant names it reads, eg. {'CART_XPATH'}
+    """
+    references = {}
+    for node in ast.parse(source).body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+        for member in node.body:
+            if isinstance(member, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                references['{}.{}'.format(node.name, member.name)] = {
+                    child.attr for child in ast.walk(member)
+                    if isinstance(child, ast.Attribute) and CONSTANT_PATTERN.match(child.attr)}
+    return references
+
+
+def _test_constants(test_sources):
+    """
+    :return: type: tuple (dict test method name -> set of constants it reads, set of constants read by
+        setUp, tearDown and helpers, which may run in any test)
+    """
+    test_constants, shared_constants = {}, set()
+    for source in test_sources:
+        for method, names in referenced_constants(source).items():
+            name = method.split('.')[1]
+            if name.startswith('test'):
+                test_constants[name] = names
+            else:
+                shared_constants.update(names)
+    return test_constants, shared_constants
+
+
+def _split_symbols(symbols):
+    """
+    :return: type: tuple (set of constant names, set of 'Class.method' names)
+    """
+    constants = {symbol.split('.')[1] for symbol in symbols if CONSTANT_PATTERN.match(symbol.split('.')[1])}
+    methods = {symbol for symbol in symbols if not CONSTANT_PATTERN.match(symbol.split('.')[1])}
+    return constants, methods
+
+
+def untraced_symbols(index, symbols, page_source, test_sources=()):
+    """
+    Changed symbols no test of the index is known to use, eg. __init__, which instrumentation does not time,
+    methods added since the index was recorded or constants holding no locator.
+    :return: type: set of 'Class.member' names
+    """
+    recorded_methods = {method for entry in index.values() for method in entry['methods']}
+    recorded_constants = {constant.split('.')[1] for entry in index.values() for constant in entry['constants']}
+    test_constants, shared_constants = _test_constants(test_sources)
+    read_by_tests = shared_constants.union(*test_constants.values())
+    readers = referenced_constants(page_source)
+    untraced = set()
+    for symbol in symbols:
+        name = symbol.split('.')[1]
+        if not CONSTANT_PATTERN.match(name):
+            traced = symbol in recorded_methods
+        else:
+            traced = (name in recorded_constants or name in read_by_tests
+                      or any(name in names for method, names in readers.items() if method in recorded_methods))
+        if not traced:
+            untraced.add(symbol)
+    return untraced
+
+
+def affected_tests(index, test_ids, symbols, page_source, test_sources=()):
+    """
+    :param symbols: type: set of changed 'Class.member' names of pages.py
+    :param test_sources: type: iterable of source of test modules, constants their methods read are used as well
+    :return: type: list of test ids touching changed symbols or missing in the index, all of them when
+        some changed symbol is not traced in the index
+    """
+    test_sources = list(test_sources)
+    if untraced_symbols(index, symbols, page_source, test_sources):
+        return list(test_ids)
+    constants, methods = _split_symbols(symbols)
+    # methods reading a changed constant directly behave differently too
+    methods.update(method for method, names in referenced_constants(page_source).items() if names & constants)
+    test_constants, shared_constants = _test_constants(test_sources)
+
+    selected = []
+    for test_id in test_ids:
+        entry = index.get(test_id)
+        method_name = test_id.rsplit('.', 1)[-1].split('__')[0]
+        read = shared_constants | test_constants.get(method_name, set())
+        if (entry is None or methods & set(entry['methods'])
+                or constants & {constant.split('.')[1] for constant in entry['constants']} or constants & read):
+            selected.append(test_id)
+    return selected
+
+
+def git(*args):
+    return subprocess.run(('git',) + args, check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+
+
+def select(test_ids, timings, base='HEAD', test_modules=()):
+    """
+    Select tests affected by changes of the working tree since `base`.
+    :return: type: tuple (list of test ids, str reason)
+    """
+    changed_files = set(git('diff', '--name-only', base).split())
+    changed_files.update(git('ls-files', '--others', '--exclude-standard').split())
+    changed_python = {path for path in changed_files if path.endswith('.py')}
+    if not changed_python:
+        return [], 'no Python files changed since {}'.format(base)
+    if changed_python != {PAGES_FILE}:
+        return list(test_ids), 'changed beyond {}: {}'.format(PAGES_FILE, ', '.join(sorted(changed_python)))
+    if not timings or not os.path.exists(timings):
+        return list(test_ids), 'no timings log to build the index from'
+    index = build_index(read_records(timings))
+    try:
+        old_source = git('show', '{}:{}'.format(base, PAGES_FILE))
+    except subprocess.CalledProcessError:
+        old_source = ''
+    with open(PAGES_FILE) as page_file:
+        new_source = page_file.read()
+    symbols, unknown = changed_symbols(old_source, new_source, git('diff', '-U0', base, '--', PAGES_FILE))
+    if unknown:
+        return list(test_ids), '{} changed outside page-object methods and constants'.format(PAGES_FILE)
+    test_sources = [inspect.getsource(module) for module in test_modules]
+    untraced = untraced_symbols(index, symbols, new_source, test_sources)
+    if untraced:
+        return list(test_ids), 'no recorded test uses {}'.format(', '.join(sorted(untraced)))
+    selected = affected_tests(index, test_ids, symbols, new_source, test_sources)
+    return selected, 'changed: {}'.format(', '.join(sorted(symbols)) or 'nothing')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Select tests affected by page-object changes')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    index_parser = subparsers.add_parser('index', help='print test dependency index')
+    index_parser.add_argument('timings')
+    select_parser = subparsers.add_parser('select', help='print ids of tests affected by changes since base')
+    select_parser.add_argument('timings')
+    select_parser.add_argument('--base', default='HEAD')
+    select_parser.add_argument('names', nargs='*', default=['test_order_product'])
+    args = parser.parse_args(argv)
+
+    if args.command == 'index':
+        print(json.dumps(build_index(read_records(args.timings)), indent=2, sort_keys=True))
+        return 0
+    from parallel_runner import iter_test_ids
+    suite = unittest.defaultTestLoader.loadTestsFromNames(args.names)
+    modules = [sys.modules[name.split('.')[0]] for name in args.names]
+    selected, reason = select(list(iter_test_ids(suite)), args.timings, args.base, modules)
+    sys.stderr.write(reason + '\n')
+    for test_id in selected:
+        print(test_id)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""
+Module represents timing layer recording page-object steps and WebDriver commands
+
+Steps of every test are appended as JSON lines to settings.TIMINGS_LOG:
+    {"kind": "test", "test": ..., "path": ..., "start_ms": ..., "ms": ..., "commands": ..., "polls": ...}
+    {"kind": "step" or "command", "test": ..., "path": "test;BasicPage._click_enabled_element;clickElement",
+     "name": ..., "locator": ..., "start_ms": ..., "ms": ..., "commands": ..., "polls": ...}
+
+Usage: python instrumentation.py flame timings.jsonl
+       python instrumentation.py compare old_timings.jsonl new_timings.jsonl
+"""
+import argparse
+import contextlib
+import functools
+import json
+import math
+import sys
+import time
+from collections import defaultdict
+
+from selenium.webdriver.support.wait import WebDriverWait
+
+import settings
+from locators import Locator
+
+
+class Step:
+    __slots__ = ('kind', 'name', 'locator', 'start', 'duration', 'commands', 'polls', 'children')
+
+    def __init__(self, kind, name, locator=None):
+        self.kind = kind
+        self.name = name
+        self.locator = locator
+        self.start = time.time()
+        self.duration = 0.0
+        self.commands = 0
+        self.polls = 0
+        self.children = []
+
+
+class Recorder:
+    def __init__(self, path=None):
+        """
+        :param path: type: str, JSON lines file steps are appended to, None keeps them only in memory
+        """
+        self.path = path
+        self.last_test = None
+        self._stack = []
+        self._test_start = None
+
+    @contextlib.contextmanager
+    def step(self, name, locator=None, kind='step'):
+        step = Step(kind, name, locator)
+        parent = self._stack[-1] if self._stack else None
+        self._stack.append(step)
+        start = time.perf_counter()
+        try:
+            yield step
+        finally:
+            step.duration = time.perf_counter() - start
+            self._stack.pop()
+            if parent is not None:
+                parent.children.append(step)
+                parent.commands += step.commands + (1 if kind == 'command' else 0)
+                parent.polls += step.polls
+
+    def record_poll(self):
+        if self._stack:
+            self._stack[-1].polls += 1
+
+    def start_test(self, test_id):
+        self._stack = [Step('test', test_id)]
+        self._test_start = time.perf_counter()
+
+    def stop_test(self):
+        """
+        Finish current test, append its steps to the log.
+        :return: type: Step, root step of the test
+        """
+        if not self._stack:
+            return None
+        test = self._stack[0]
+        test.duration = time.perf_counter() - self._test_start
+        self._stack = []
+        self.last_test = test
+        if self.path:
+            with open(self.path, 'a') as log:
+                log.write(''.join(json.dumps(record) + '\n' for record in iter_records(test)))
+        return test
+
+    def attach(self, driver):
+        """
+        Time every WebDriver command sent by driver and its elements.
+        """
+        if getattr(driver.execute, 'recorder', None) is self:
+            return
+        execute = driver.execute
+
+        @functools.wraps(execute)
+        def timed_execute(driver_command, params=None):
+            locator = None
+            if params and 'using' in params:
+                locator = '{}={}'.format(params['using'], params.get('value'))
+            with self.step(driver_command, locator, kind='command'):
+                return execute(driver_command, params)
+
+        timed_execute.recorder = self
+        driver.execute = timed_execute
+
+    def instrument(self, *classes):
+        """
+        Time every helper method (name starting with single underscore) defined in given classes.
+        """
+        for cls in classes:
+            for name, attribute in list(vars(cls).items()):
+                if not name.startswith('_') or name.startswith('__'):
+                    continue
+                if isinstance(attribute, staticmethod):
+                    setattr(cls, name, staticmethod(self._timed(attribute.__func__, has_self=False)))
+                elif callable(attribute) and not hasattr(attribute, 'recorder'):
+                    setattr(cls, name, self._timed(attribute, has_self=True))
+
+    def _timed(self, function, has_self):
+        if hasattr(function, 'recorder'):
+            return function
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            positional = args[1:] if has_self else args
+            locator = str(positional[0]) if positional and isinstance(positional[0], Locator) else None
+            with self.step(function.__qualname__, locator):
+                return function(*args, **kwargs)
+
+        timed.recorder = self
+        return timed
+
+    def install(self):
+        """
+        Count condition polls of every WebDriverWait, polls go to the recorder installed last.
+        """
+        global _poll_recorder
+        _poll_recorder = self
+        if hasattr(WebDriverWait.until, 'counts_polls'):
+            return
+        for name in ('until', 'until_not'):
+            until = getattr(WebDriverWait, name)
+
+            def counted_until(wait, method, message='', until=until):
+                def polled(driver):
+                    # looked up at poll time, WebDriverWait is patched once for all recorders
+                    if _poll_recorder is not None:
+                        _poll_recorder.record_poll()
+                    return method(driver)
+                return until(wait, polled, message)
+
+            counted_until = functools.wraps(until)(counted_until)
+            counted_until.counts_polls = True
+            setattr(WebDriverWait, name, counted_until)
+
+
+_poll_recorder = None
+
+
+def iter_records(test):
+    """
+    Flatten steps of test into JSON serializable records, depth first.
+    """
+    stack = [(test, test.name)]
+    while stack:
+        step, path = stack.pop()
+        yield {'kind': step.kind, 'test': test.name, 'path': path, 'name': step.name, 'locator': step.locator,
+               'start_ms': int(step.start * 1000), 'ms': round(step.duration * 1000, 3),
+               'commands': step.commands, 'polls': step.polls}
+        for child in reversed(step.children):
+            stack.append((child, '{};{}'.format(path, child.name)))
+
+
+def read_records(path):
+    with open(path) as log:
+        for line in log:
+            if line.strip():
+                yield json.loads(line)
+
+
+def percentile(values, percent):
+    """
+    Nearest-rank percentile.
+    :param values: type: sorted list of numbers
+    :param percent: type: float, 0-100
+    """
+    rank = max(int(math.ceil(percent / 100.0 * len(values))), 1)
+    return values[rank - 1]
+
+
+def folded_stacks(records):
+    """
+    Aggregate records into flame graph folded stacks, "path self_time_ms" per distinct path.
+    """
+    total = defaultdict(float)
+    children = defaultdict(float)
+    for record in records:
+        total[record['path']] += record['ms']
+        if ';' in record['path']:
+            children[record['path'].rsplit(';', 1)[0]] += record['ms']
+    return {path: max(total[path] - children[path], 0.0) for path in total}
+
+
+def compare(old_records, new_records):
+    """
+    :return: type: list of (path, old_ms, new_ms) sorted by slowdown, slowest first
+    """
+    old, new = defaultdict(float), defaultdict(float)
+    for records, totals in ((old_records, old), (new_records, new)):
+        for record in records:
+            if record['kind'] != 'command':
+                totals[record['path']] += record['ms']
+    rows = [(path, old.get(path, 0.0), new.get(path, 0.0)) for path in set(old) | set(new)]
+    return sorted(rows, key=lambda row: row[1] - row[2])
+
+
+_recorder = None
+
+
+def get_recorder():
+    """
+    Return recorder of current process with page objects instrumented, None when settings.TIMINGS_LOG is not set.
+    """
+    global _recorder
+    if _recorder is None and settings.TIMINGS_LOG:
+        import pages
+        _recorder = Recorder(settings.TIMINGS_LOG)
+        _recorder.install()
+        _recorder.instrument(pages.BasicPage, *pages.BasicPage.__subclasses__())
+    return _recorder
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Summarize page-object timings')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    flame = subparsers.add_parser('flame', help='print folded stacks, input for flamegraph.pl')
+    flame.add_argument('log')
+    diff = subparsers.add_parser('compare', help='print steps which got slower between two runs')
+    diff.add_argument('old_log')
+    diff.add_argument('new_log')
+    diff.add_argument('--top', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.command == 'flame':
+        for path, self_ms in sorted(folded_stacks(read_records(args.log)).items()):
+            print('{} {}'.format(path.replace(' ', '_'), int(round(self_ms))))
+    else:
+        for path, old_ms, new_ms in compare(read_records(args.old_log), read_records(args.new_log))[:args.top]:
+            print(json.dumps({'path': path, 'old_ms': round(old_ms, 3), 'new_ms': round(new_ms, 3),
+                              'delta_ms': round(new_ms - old_ms, 3)}))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""
+Module generates checkout load on the shop by replaying page-object flows of many concurrent customers
+
+Every customer registers, adds a product to cart, goes to checkout and fills the checkout form.
+A few customers drive real browsers with AsyncBasicPage, the rest replay the same form posts with ShopClient
+from a thread pool. Customer starts are spread evenly over the ramp-up period and at most `concurrency`
+customers run at once. Throughput and latency percentiles are reported for every checkout step.
+
+Usage: SHOP_URL=local python load_generator.py --browsers 2 --http 100 --concurrency 20 --ramp-up 10
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import local_shop
+import settings
+from async_driver import AsyncBasicPage, AsyncWebDriver
+from browser_profile import LaunchProfile
+from instrumentation import percentile
+from pages import BasicPage
+from shop_api import ShopClient, make_adapter
+
+STEPS = ('start_browser', 'register_user', 'add_to_cart', 'checkout', 'fill_checkout_form')
+
+
+class LoadStats:
+    def __init__(self):
+        self.samples = OrderedDict()
+        self.errors = OrderedDict()
+        self.started = self.finished = None
+
+    def add(self, kind, step, seconds, error=None):
+        key = (kind, step)
+        if error is None:
+            self.samples.setdefault(key, []).append(seconds * 1000)
+        else:
+            self.errors.setdefault(key, []).append('{}: {}'.format(type(error).__name__, error))
+
+    def summary(self):
+        """
+        :return: type: list of dicts, one per customer kind and step in STEPS order
+        """
+        duration = max((self.finished or 0) - (self.started or 0), 1e-9)
+        rows = []
+        for kind in ('browser', 'http'):
+            for step in STEPS:
+                durations = sorted(self.samples.get((kind, step), []))
+                errors = self.errors.get((kind, step), [])
+                if not durations and not errors:
+                    continue
+                rows.append({'kind': kind, 'step': step, 'ok': len(durations), 'errors': len(errors),
+                             'per_second': round(len(durations) / duration, 2),
+                             'p50_ms': round(percentile(durations, 50), 1) if durations else None,
+                             'p95_ms': round(percentile(durations, 95), 1) if durations else None,
+                             'p99_ms': round(percentile(durations, 99), 1) if durations else None,
+                             'first_error': errors[0] if errors else None})
+        return rows
+
+
+class LoadGenerator:
+    def __init__(self, app_url, browsers=1, http_sessions=20, concurrency=10, ramp_up=10, product='2',
+                 profile=None):
+        """
+        :param browsers: type: int, customers driving real browsers
+        :param http_sessions: type: int, customers replaying form posts over HTTP only
+        :param concurrency: type: int, customers running at once
+        :param ramp_up: type: float, seconds over which customer starts are spread
+        :param product: type: str [1-4], number of home page product bought, one piece of it has to be orderable
+        """
+        self.app_url = app_url
+        self.browsers = browsers
+        self.http_sessions = http_sessions
+        self.concurrency = concurrency
+        self.ramp_up = ramp_up
+        self.product = product
+        self.profile = profile
+        self.stats = LoadStats()
+        self.product_id = None
+        # one connection per customer running at once, customers must not wait for a free one
+        self.adapter = make_adapter(concurrency)
+
+    def prepare(self):
+        """
+        Resolve id of the bought product once, before any step is timed.
+        :raises ValueError: when the product cannot be checked out in quantity of one
+        """
+        client = ShopClient(self.app_url, adapter=self.adapter)
+        product_id = client.get_home_product_ids()[int(self.product) - 1]
+        minimum = client.get_minimum_quantity(product_id)
+        if minimum > 1:
+            raise ValueError('Product {} has a minimum quantity of {}, customers add one and cannot check out'
+                             .format(self.product, minimum))
+        self.product_id = product_id
+
+    def schedule(self):
+        """
+        :return: type: list of (delay, kind), browser customers spread among http ones
+        """
+        total = self.browsers + self.http_sessions
+        kinds = ['browser' if (index + 1) * self.browsers // total > index * self.browsers // total else 'http'
+                 for index in range(total)]
+        return [(index * self.ramp_up / float(total), kind) for index, kind in enumerate(kinds)]
+
+    async def _step(self, kind, step, action):
+        start = time.perf_counter()
+        try:
+            result = await action()
+        except Exception as error:
+            self.stats.add(kind, step, time.perf_counter() - start, error)
+            raise
+        self.stats.add(kind, step, time.perf_counter() - start)
+        return result
+
+    async def _browser_customer(self):
+        driver = await self._step('browser', 'start_browser', lambda: AsyncWebDriver.launch(self.profile))
+        try:
+            page = AsyncBasicPage(driver)
+            await driver.get(self.app_url)
+
+            async def go_to_checkout():
+                await page._go_to_shopping_cart_page()
+                await page._click_enabled_element(page.CHECKOUT_BUTTON_XPATH)
+
+            await self._step('browser', 'register_user', page._register_user)
+            await self._step('browser', 'add_to_cart', lambda: page._add_single_product_to_cart(self.product))
+            await self._step('browser', 'checkout', go_to_checkout)
+            await self._step('browser', 'fill_checkout_form', page._fill_checkout_form)
+        finally:
+            await driver.quit()
+
+    async def _http_customer(self, executor):
+        loop = asyncio.get_running_loop()
+        client = ShopClient(self.app_url, adapter=self.adapter)
+        steps = [('register_user', lambda: client.register(BasicPage._email_generator(), '1qazZAQ!')),
+                 ('add_to_cart', lambda: client.add_to_cart(self.product_id)),
+                 ('checkout', client.open_checkout),
+                 ('fill_checkout_form', client.submit_checkout)]
+        # connections are pooled by all clients, closing the session would drop them for other customers too
+        for step, action in steps:
+            await self._step('http', step, lambda action=action: loop.run_in_executor(executor, action))
+
+    async def _customer(self, delay, kind, semaphore, executor):
+        await asyncio.sleep(delay)
+        async with semaphore:
+            try:
+                if kind == 'browser':
+                    await self._browser_customer()
+                else:
+                    await self._http_customer(executor)
+            except Exception:
+                # the failed step is already recorded, the customer gives up like a real one would
+                pass
+
+    async def run(self):
+        """
+        :return: type: LoadStats
+        """
+        if self.product_id is None:
+            self.prepare()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        self.stats = LoadStats()
+        self.stats.started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            await asyncio.gather(*(self._customer(delay, kind, semaphore, executor)
+                                   for delay, kind in self.schedule()))
+        self.stats.finished = time.perf_counter()
+        return self.stats
+
+
+def print_summary(rows, duration):
+    print('{:<8} {:<20} {:>6} {:>6} {:>8} {:>9} {:>9} {:>9}'.format('kind', 'step', 'ok', 'errors', 'per s',
+                                                                    'p50 ms', 'p95 ms', 'p99 ms'))
+    for row in rows:
+        print('{kind:<8} {step:<20} {ok:>6} {errors:>6} {per_second:>8} {p50_ms!s:>9} {p95_ms!s:>9} '
+              '{p99_ms!s:>9}'.format(**row))
+    for row in rows:
+        if row['first_error']:
+            print('{kind} {step}: {first_error}'.format(**row))
+    print('{:.1f}s'.format(duration))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate checkout load on the shop')
+    parser.add_argument('--browsers', type=int, default=1, help='customers driving real browsers')
+    parser.add_argument('--http', type=int, default=20, help='customers replaying form posts over HTTP')
+    parser.add_argument('-c', '--concurrency', type=int, default=10, help='customers running at once')
+    parser.add_argument('--ramp-up', type=float, default=10, help='seconds over which customers start')
+    parser.add_argument('--product', default='2', choices=['1', '2', '3', '4'])
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+    if args.browsers + args.http < 1 or args.concurrency < 1:
+        parser.error('at least one customer and concurrency of at least 1 are required')
+
+    generator = LoadGenerator(local_shop.resolve_app_url(settings.APP_URL), args.browsers, args.http,
+                              args.concurrency, args.ramp_up, args.product, LaunchProfile.from_settings())
+    try:
+        generator.prepare()
+    except ValueError as error:
+        parser.error(str(error))
+    stats = asyncio.run(generator.run())
+    rows = stats.summary()
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print_summary(rows, stats.finished - stats.started)
+    return 1 if any(row['errors'] for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
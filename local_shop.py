@@ -0,0 +1,918 @@
+"""
+Module represents local stand-in shop serving the DOM structure the page objects expect
+
+Carts, customers and orders are kept in memory per OCSESSID session cookie.
+Usage: python local_shop.py --port 8000, then run tests with SHOP_URL=http://127.0.0.1:8000/
+       or run tests with SHOP_URL=local to start the shop inside the test process.
+"""
+import argparse
+import html
+import itertools
+import json
+import secrets
+import threading
+from collections import OrderedDict, namedtuple
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+ShopProduct = namedtuple('ShopProduct', ['id', 'name', 'model', 'price', 'minimum'])
+
+PRODUCTS = OrderedDict((product.id, product) for product in [
+    ShopProduct('1', 'Test product 1', 'TP-1', Decimal('100.00'), 2),
+    ShopProduct('2', 'Test product 2', 'TP-2', Decimal('25.50'), 1),
+    ShopProduct('3', 'Test product 3', 'TP-3', Decimal('1250.00'), 1),
+    ShopProduct('4', 'Test product 4', 'TP-4', Decimal('7.25'), 1),
+])
+FLAT_SHIPPING_RATE = Decimal('5.00')
+COUNTRY = ('170', 'Poland')
+ZONES = OrderedDict([
+    ('2630', 'Dolnoslaskie'), ('2631', 'Kujawsko-Pomorskie'), ('2632', 'Lodzkie'), ('2633', 'Lubelskie'),
+    ('2634', 'Lubuskie'), ('2635', 'Malopolskie'), ('2636', 'Mazowieckie'), ('2637', 'Opolskie'),
+    ('2638', 'Podkarpackie'), ('2639', 'Podlaskie'), ('2640', 'Pomorskie'), ('2641', 'Slaskie'),
+    ('2642', 'Swietokrzyskie'), ('2643', 'Warminsko-Mazurskie'), ('2644', 'Wielkopolskie'),
+    ('2645', 'Zachodniopomorskie'),
+])
+CATEGORY_PATH = '20'
+CATEGORY_PAGE_SIZE = 15
+SESSION_COOKIE = 'OCSESSID'
+
+_CSS = """
+body { font-family: sans-serif; }
+.dropdown-menu, .collapse, .modal { display: none; }
+.open > .dropdown-menu, .collapse.in, .modal.in { display: block; }
+.alert .close { display: block; }
+.btn { display: inline-block; padding: 6px 12px; }
+i.fa { font-style: normal; }
+"""
+
+_JS = """
+// in-flight request counter polled by waits.no_pending_ajax, like jQuery.active on the real shop
+var jQuery = window.jQuery = {active: 0};
+
+function request(method, route, data, done) {
+    var xhr = new XMLHttpRequest();
+    jQuery.active++;
+    xhr.open(method, 'index.php?route=' + route);
+    xhr.setRequestHeader('Content-Type', 'application/x-www-form-urlencoded');
+    xhr.onloadend = function () {
+        try {
+            if (xhr.status === 200 && done) {
+                done(xhr.responseText);
+            }
+        } finally {
+            jQuery.active--;
+        }
+    };
+    xhr.send(data || null);
+}
+
+function serialize(container) {
+    var fields = container.querySelectorAll('input, select, textarea'), data = [];
+    for (var i = 0; i < fields.length; i++) {
+        var field = fields[i];
+        if (!field.name || ((field.type === 'radio' || field.type === 'checkbox') && !field.checked)) {
+            continue;
+        }
+        data.push(encodeURIComponent(field.name) + '=' + encodeURIComponent(field.value));
+    }
+    return data.join('&');
+}
+
+function showErrors(container, errors) {
+    var old = container.querySelectorAll('.text-danger');
+    for (var i = 0; i < old.length; i++) {
+        old[i].parentNode.removeChild(old[i]);
+    }
+    for (var name in errors) {
+        var error = document.createElement('div'), field = container.querySelector('[name="' + name + '"]');
+        error.className = 'text-danger';
+        error.textContent = errors[name];
+        (field ? field.parentNode : container).appendChild(error);
+    }
+}
+
+function refreshCart() {
+    request('GET', 'common/cart/info', null, function (text) {
+        var info = new DOMParser().parseFromString(text, 'text/html');
+        document.querySelector('#cart > button').innerHTML = info.querySelector('#cart > button').innerHTML;
+        document.querySelector('#cart > ul').innerHTML = info.querySelector('#cart > ul').innerHTML;
+    });
+}
+
+var cart = {
+    add: function (product_id, quantity) {
+        cart.post('checkout/cart/add', 'product_id=' + product_id + '&quantity=' + (quantity || 1), document.body);
+    },
+    post: function (route, data, container) {
+        request('POST', route, data, function (text) {
+            var json = JSON.parse(text);
+            if (json.error) {
+                showErrors(container, json.error);
+            } else {
+                setTimeout(refreshCart, 100);
+            }
+        });
+    },
+    remove: function (key) {
+        request('POST', 'checkout/cart/remove', 'key=' + key, function () {
+            if (/route=checkout\\/(cart|checkout)/.test(location.search)) {
+                location.reload();
+            } else {
+                refreshCart();
+            }
+        });
+    }
+};
+
+var CHECKOUT_STEPS = {
+    'button-payment-address': ['checkout/payment_address/save', 'collapse-payment-address', 'collapse-shipping-address'],
+    'button-shipping-address': ['checkout/shipping_address/save', 'collapse-shipping-address', 'collapse-shipping-method'],
+    'button-shipping-method': ['checkout/shipping_method/save', 'collapse-shipping-method', 'collapse-payment-method'],
+    'button-payment-method': ['checkout/payment_method/save', 'collapse-payment-method', 'collapse-checkout-confirm'],
+    'button-confirm': ['checkout/confirm', 'collapse-checkout-confirm', null]
+};
+
+function checkoutStep(button) {
+    var step = CHECKOUT_STEPS[button.id], panel = document.getElementById(step[1]);
+    request('POST', step[0], serialize(panel), function (text) {
+        var json = JSON.parse(text);
+        if (json.redirect) {
+            location = json.redirect;
+        } else if (json.error) {
+            showErrors(panel, json.error);
+        } else {
+            panel.classList.remove('in');
+            document.getElementById(step[2]).classList.add('in');
+        }
+    });
+}
+
+function showShippingQuote(json) {
+    var old = document.getElementById('modal-shipping');
+    if (old) {
+        old.parentNode.removeChild(old);
+    }
+    if (json.error) {
+        showErrors(document.getElementById('collapse-shipping'), json.error);
+        return;
+    }
+    var body = '';
+    for (var code in json.shipping_method) {
+        var method = json.shipping_method[code];
+        body += '<p><strong>' + method.title + '</strong></p>';
+        for (var key in method.quote) {
+            var quote = method.quote[key];
+            body += '<div class="radio"><label><input type="radio" name="shipping_method" value="' + quote.code +
+                '" /> ' + quote.title + ' - ' + quote.text + '</label></div>';
+        }
+    }
+    var modal = document.createElement('div');
+    modal.id = 'modal-shipping';
+    modal.className = 'modal in';
+    modal.innerHTML = '<div class="modal-dialog"><div class="modal-content">' +
+        '<div class="modal-header"><button type="button" class="close" data-dismiss="modal">&times;</button>' +
+        '<h4 class="modal-title">Please select the preferred shipping method to use on this order.</h4></div>' +
+        '<div class="modal-body">' + body + '</div>' +
+        '<div class="modal-footer"><button type="button" class="btn btn-default" data-dismiss="modal">Cancel</button>' +
+        '<input type="button" value="Apply Shipping" id="button-shipping" class="btn btn-primary" /></div>' +
+        '</div></div>';
+    document.body.appendChild(modal);
+}
+
+document.addEventListener('click', function (event) {
+    var target = event.target, toggle = target.closest('[data-toggle="dropdown"]');
+    var opened = document.querySelectorAll('.open');
+    for (var i = 0; i < opened.length; i++) {
+        if (!opened[i].contains(target) || (toggle && opened[i] === toggle.parentNode)) {
+            opened[i].classList.remove('open');
+            if (toggle && opened[i] === toggle.parentNode) {
+                event.preventDefault();
+                return;
+            }
+        }
+    }
+    if (toggle) {
+        event.preventDefault();
+        toggle.parentNode.classList.add('open');
+        return;
+    }
+    var collapse = target.closest('[data-toggle="collapse"]');
+    if (collapse) {
+        event.preventDefault();
+        document.querySelector(collapse.getAttribute('href')).classList.toggle('in');
+        return;
+    }
+    var dismiss = target.closest('[data-dismiss]');
+    if (dismiss) {
+        var dismissed = dismiss.closest('.' + dismiss.getAttribute('data-dismiss'));
+        dismissed.parentNode.removeChild(dismissed);
+        return;
+    }
+    if (target.id === 'button-cart') {
+        cart.post('checkout/cart/add', serialize(document.getElementById('product')),
+                  document.getElementById('product'));
+    } else if (target.id === 'button-quote') {
+        request('POST', 'extension/total/shipping/quote', serialize(document.getElementById('collapse-shipping')),
+                function (text) { showShippingQuote(JSON.parse(text)); });
+    } else if (target.id === 'button-shipping') {
+        request('POST', 'extension/total/shipping/shipping', serialize(document.getElementById('modal-shipping')),
+                function (text) {
+                    var json = JSON.parse(text);
+                    if (json.redirect) {
+                        location = json.redirect;
+                    }
+                });
+    } else if (CHECKOUT_STEPS[target.id]) {
+        checkoutStep(target);
+    }
+});
+"""
+
+
+def format_price(value):
+    return '${:,.2f}'.format(value)
+
+
+def url(route, **params):
+    return 'index.php?' + urlencode(dict(route=route, **params), safe='/')
+
+
+class Session:
+    def __init__(self):
+        self.cart = OrderedDict()
+        self.shipping_method = None
+        self.customer = None
+        self.success = None
+        self.checkout = {}
+
+
+class Shop:
+    """
+    In-memory state shared by all request handlers.
+    """
+
+    def __init__(self):
+        self.sessions = {}
+        self.customers = {}
+        self.orders = []
+        self.lock = threading.Lock()
+        self._cart_keys = itertools.count(1)
+
+    def session(self, session_id):
+        if session_id not in self.sessions:
+            self.sessions[session_id] = Session()
+        return self.sessions[session_id]
+
+    def add_to_cart(self, session, product_id, quantity):
+        for key, (cart_product_id, cart_quantity) in session.cart.items():
+            if cart_product_id == product_id:
+                session.cart[key] = (product_id, cart_quantity + quantity)
+                return key
+        key = str(next(self._cart_keys))
+        session.cart[key] = (product_id, quantity)
+        return key
+
+    @staticmethod
+    def cart_lines(session):
+        """
+        :return: type: list of (key, ShopProduct, quantity, line total)
+        """
+        return [(key, PRODUCTS[product_id], quantity, PRODUCTS[product_id].price * quantity)
+                for key, (product_id, quantity) in session.cart.items()]
+
+    def totals(self, session):
+        """
+        :return: type: list of (title, value)
+        """
+        sub_total = sum((line[3] for line in self.cart_lines(session)), Decimal('0.00'))
+        totals = [('Sub-Total', sub_total)]
+        if session.shipping_method and session.cart:
+            totals.append(('Flat Shipping Rate', FLAT_SHIPPING_RATE))
+        totals.append(('Total', sum((value for _, value in totals), Decimal('0.00'))))
+        return totals
+
+    def cart_total_text(self, session):
+        quantity = sum(quantity for _, quantity in session.cart.values())
+        return '{} item(s) - {}'.format(quantity, format_price(self.totals(session)[-1][1]))
+
+    def minimum_errors(self, session):
+        return ['Minimum order amount for {} is {}!'.format(product.name, product.minimum)
+                for _, product, quantity, _ in self.cart_lines(session) if quantity < product.minimum]
+
+
+class ShopRequestHandler(BaseHTTPRequestHandler):
+    shop = None
+
+    def log_message(self, format, *args):
+        pass
+
+    # request plumbing
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.form = dict(parse_qsl(self.rfile.read(length).decode('utf-8'), keep_blank_values=True))
+        self._dispatch('POST')
+
+    def _dispatch(self, method):
+        parts = urlsplit(self.path)
+        if parts.path not in ('/', '/index.php'):
+            self._send(404, 'text/plain', 'Not Found')
+            return
+        self.query = dict(parse_qsl(parts.query))
+        if method == 'GET':
+            self.form = {}
+        self._new_cookie = None
+        session_id = self._session_id()
+        with self.shop.lock:
+            self.session = self.shop.session(session_id)
+            route = self.query.get('route', 'common/home')
+            handler = getattr(self, '{}_{}'.format(method.lower(), route.replace('/', '_')), None)
+            if handler is None:
+                self._send(404, 'text/plain', 'Not Found')
+            else:
+                handler()
+
+    def _session_id(self):
+        for cookie in (self.headers.get('Cookie') or '').split(';'):
+            name, _, value = cookie.strip().partition('=')
+            if name == SESSION_COOKIE and value:
+                return value
+        self._new_cookie = secrets.token_hex(13)
+        return self._new_cookie
+
+    def _send(self, status, content_type, body, headers=()):
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type + '; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if self._new_cookie:
+            self.send_header('Set-Cookie', '{}={}; Path=/'.format(SESSION_COOKIE, self._new_cookie))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, data):
+        self._send(200, 'application/json', json.dumps(data))
+
+    def _redirect(self, location):
+        self._send(302, 'text/html', '', [('Location', location)])
+
+    def _page(self, title, container_id, content):
+        self._send(200, 'text/html', self._layout(title, container_id, content))
+
+    # page fragments
+
+    def _layout(self, title, container_id, content):
+        if self.session.customer:
+            account_links = ('<li><a href="{}">My Account</a></li><li><a href="{}">Logout</a></li>'
+                             .format(url('account/account'), url('account/logout')))
+        else:
+            account_links = ('<li><a href="{}">Register</a></li><li><a href="{}">Login</a></li>'
+                             .format(url('account/register'), url('account/login')))
+        return (
+            '<!DOCTYPE html><html><head><meta charset="UTF-8" /><title>{title}</title>'
+            '<style>{css}</style><script>{js}</script></head><body>'
+            '<nav id="top"><div class="container"><div class="pull-left"></div>'
+            '<div id="top-links" class="nav pull-right"><ul class="list-inline">'
+            '<li><a href="#"><i class="fa fa-phone">&#9742;</i> <span>123456789</span></a></li>'
+            '<li class="dropdown"><a href="{account}" title="My Account" class="dropdown-toggle" '
+            'data-toggle="dropdown"><i class="fa fa-user">&#9786;</i> <span>My Account</span> '
+            '<span class="caret">&#9662;</span></a><ul class="dropdown-menu dropdown-menu-right">{account_links}</ul>'
+            '</li>'
+            '<li><a href="#"><i class="fa fa-heart">&#9829;</i> <span>Wish List (0)</span></a></li>'
+            '<li><a href="{cart_url}" title="Shopping Cart"><i class="fa fa-shopping-cart">&#128722;</i> '
+            '<span>Shopping Cart</span></a></li>'
+            '<li><a href="{checkout_url}" title="Checkout"><i class="fa fa-share">&#10148;</i> '
+            '<span>Checkout</span></a></li>'
+            '</ul></div></div></nav>'
+            '<header><div class="container"><div class="row">'
+            '<div class="col-sm-4"><div id="logo"><h1><a href="{home}">Your Store</a></h1></div></div>'
+            '<div class="col-sm-5"><div id="search" class="input-group"></div></div>'
+            '<div class="col-sm-3">{cart}</div>'
+            '</div></div></header>'
+            '<div class="container"><nav id="menu" class="navbar"><ul class="nav navbar-nav">'
+            '<li><a href="{category}">All Products</a></li></ul></nav></div>'
+            '<div id="{container_id}" class="container">{content}</div>'
+            '<footer><div class="container"><p>Local stand-in shop</p></div></footer>'
+            '</body></html>'
+        ).format(title=html.escape(title), css=_CSS, js=_JS, account=url('account/account'),
+                 account_links=account_links, cart_url=url('checkout/cart'), checkout_url=url('checkout/checkout'),
+                 home=url('common/home'), cart=self._cart_widget(),
+                 category=url('product/category', path=CATEGORY_PATH), container_id=container_id, content=content)
+
+    def _cart_widget(self):
+        lines = self.shop.cart_lines(self.session)
+        if lines:
+            rows = ''.join(
+                '<tr><td class="text-center">{image}</td><td class="text-left"><a href="{link}">{name}</a></td>'
+                '<td class="text-right">x {quantity}</td><td class="text-right">{total}</td>'
+                '<td class="text-center"><button type="button" onclick="cart.remove(\'{key}\');" title="Remove" '
+                'class="btn btn-danger btn-xs"><i class="fa fa-times">&#10005;</i></button></td></tr>'.format(
+                    image='', link=url('product/product', product_id=product.id), name=html.escape(product.name),
+                    quantity=quantity, total=format_price(total), key=key)
+                for key, product, quantity, total in lines)
+            totals = ''.join('<tr><td class="text-right"><strong>{}</strong></td><td class="text-right">{}</td></tr>'
+                             .format(title, format_price(value)) for title, value in self.shop.totals(self.session))
+            items = ('<li><table class="table table-striped"><tbody>{}</tbody></table></li>'
+                     '<li><div><table class="table table-bordered"><tbody>{}</tbody></table>'
+                     '<p class="text-right"><a href="{}"><strong><i class="fa fa-shopping-cart"></i> View Cart'
+                     '</strong></a>&nbsp;&nbsp;&nbsp;<a href="{}"><strong><i class="fa fa-share"></i> Checkout'
+                     '</strong></a></p></div></li>').format(rows, totals, url('checkout/cart'),
+                                                            url('checkout/checkout'))
+        else:
+            items = '<li><p class="text-center">Your shopping cart is empty!</p></li>'
+        return ('<div id="cart" class="btn-group btn-block"><button type="button" data-toggle="dropdown" '
+                'class="btn btn-inverse btn-block btn-lg dropdown-toggle"><i class="fa fa-shopping-cart"></i> '
+                '<span id="cart-total">{}</span></button><ul class="dropdown-menu pull-right">{}</ul></div>'
+                .format(self.shop.cart_total_text(self.session), items))
+
+    @staticmethod
+    def _breadcrumb(*items):
+        links = ['<li><a href="{}"><i class="fa fa-home">&#8962;</i></a></li>'.format(url('common/home'))]
+        links += ['<li><a href="{}">{}</a></li>'.format(link, title) for title, link in items]
+        return '<ul class="breadcrumb">{}</ul>'.format(''.join(links))
+
+    def _alerts(self, warnings=()):
+        alerts = ''
+        if self.session.success:
+            alerts += ('<div class="alert alert-success alert-dismissible"><i class="fa fa-check-circle"></i> {}'
+                       '<button type="button" class="close" data-dismiss="alert">&times;</button></div>'
+                       .format(self.session.success))
+            self.session.success = None
+        for warning in warnings:
+            alerts += ('<div class="alert alert-danger alert-dismissible"><i class="fa fa-exclamation-circle"></i> {}'
+                       '<button type="button" class="close" data-dismiss="alert">&times;</button></div>'
+                       .format(html.escape(warning)))
+        return alerts
+
+    @staticmethod
+    def _product_thumb(product, quantity_argument=''):
+        return (
+            '<div class="product-layout col-lg-3 col-md-3 col-sm-6 col-xs-12"><div class="product-thumb transition">'
+            '<div class="image"><a href="{link}"></a></div>'
+            '<div class="caption"><h4><a href="{link}">{name}</a></h4><p>{name} description</p>'
+            '<p class="price"><span class="price-new">{price}</span></p></div>'
+            '<div class="button-group"><button type="button" onclick="cart.add(\'{id}\'{quantity});">'
+            '<i class="fa fa-shopping-cart"></i> <span>Add to Cart</span></button>'
+            '<button type="button" title="Add to Wish List">&#9829;</button>'
+            '<button type="button" title="Compare this Product">&#8644;</button></div>'
+            '</div></div>'
+        ).format(link=url('product/product', product_id=product.id), name=html.escape(product.name),
+                 price=format_price(product.price), id=product.id, quantity=quantity_argument)
+
+    @staticmethod
+    def _select(name, element_id, options, selected=None):
+        return '<select name="{}" id="{}" class="form-control"><option value=""> --- Please Select --- </option>{}' \
+               '</select>'.format(name, element_id, ''.join(
+                   '<option value="{}"{}>{}</option>'.format(value, ' selected="selected"' if value == selected else '',
+                                                             title) for value, title in options.items()))
+
+    @staticmethod
+    def _input(label, name, element_id, input_type='text'):
+        return ('<div class="form-group required"><label class="control-label" for="{id}">{label}</label>'
+                '<div><input type="{type}" name="{name}" value="" placeholder="{label}" id="{id}" '
+                'class="form-control" /></div></div>').format(label=label, name=name, id=element_id, type=input_type)
+
+    # catalog
+
+    def get_common_home(self):
+        products = ''.join(self._product_thumb(product) for product in PRODUCTS.values())
+        content = ('<div class="row"><div id="content" class="col-sm-12">'
+                   '<div class="slideshow"></div><h3>Featured</h3><div class="row">{}</div>'
+                   '</div></div>').format(products)
+        self._page('Your Store', 'common-home', content)
+
+    def get_product_category(self):
+        limit = int(self.query.get('limit') or CATEGORY_PAGE_SIZE)
+        page = int(self.query.get('page') or 1)
+        products = list(PRODUCTS.values())
+        shown = products[(page - 1) * limit:page * limit]
+        thumbs = ''.join(self._product_thumb(product, ", '{}'".format(product.minimum)) for product in shown)
+        pagination = ''
+        if page * limit < len(products):
+            pagination = '<ul class="pagination"><li><a href="{}">&gt;</a></li></ul>'.format(
+                url('product/category', path=CATEGORY_PATH, page=page + 1, limit=limit))
+        content = ('{}<div class="row"><div id="content" class="col-sm-12"><h2>All Products</h2>'
+                   '<div class="row">{}</div><div class="row"><div class="col-sm-6 text-left">{}</div></div>'
+                   '</div></div>').format(self._breadcrumb(('All Products', url('product/category',
+                                                                                   path=CATEGORY_PATH))),
+                                          thumbs, pagination)
+        self._page('All Products', 'product-category', content)
+
+    def get_product_product(self):
+        product = PRODUCTS.get(self.query.get('product_id'))
+        if product is None:
+            self._send(404, 'text/plain', 'Product not found!')
+            return
+        minimum = ''
+        if product.minimum > 1:
+            minimum = ('<div class="alert alert-info"><i class="fa fa-info-circle"></i> '
+                       'This product has a minimum quantity of {}</div>'.format(product.minimum))
+        content = (
+            '{breadcrumb}<div class="row"><div id="content" class="col-sm-12"><div class="row">'
+            '<div class="col-sm-8"><div class="tab-content"><p>{name} description</p></div></div>'
+            '<div class="col-sm-4"><h1>{name}</h1><ul class="list-unstyled"><li>Product Code: {model}</li></ul>'
+            '<ul class="list-unstyled"><li><h2>{price}</h2></li></ul>'
+            '<div id="product"><div class="form-group"><label class="control-label" for="input-quantity">Qty</label>'
+            '<input type="text" name="quantity" value="{minimum_quantity}" size="2" id="input-quantity" '
+            'class="form-control" /><input type="hidden" name="product_id" value="{id}" /><br />'
+            '<button type="button" id="button-cart" class="btn btn-primary btn-lg btn-block">Add to Cart</button>'
+            '</div>{minimum}</div></div></div></div></div>'
+        ).format(breadcrumb=self._breadcrumb((html.escape(product.name), url('product/product',
+                                                                             product_id=product.id))),
+                 name=html.escape(product.name), model=product.model, price=format_price(product.price),
+                 minimum_quantity=product.minimum, id=product.id, minimum=minimum)
+        self._page(product.name, 'product-product', content)
+
+    # cart
+
+    def get_common_cart_info(self):
+        self._send(200, 'text/html', self._cart_widget())
+
+    def post_checkout_cart_add(self):
+        product = PRODUCTS.get(self.form.get('product_id'))
+        try:
+            quantity = int(self.form.get('quantity') or 1)
+        except ValueError:
+            quantity = 0
+        if product is None:
+            self._json({'error': {'product_id': 'Product not found!'}})
+        elif quantity < 1:
+            self._json({'error': {'quantity': 'Quantity must be at least 1!'}})
+        else:
+            self.shop.add_to_cart(self.session, product.id, quantity)
+            self._json({'success': 'Success: You have added {} to your shopping cart!'.format(product.name),
+                        'total': self.shop.cart_total_text(self.session)})
+
+    def post_checkout_cart_edit(self):
+        for name, value in self.form.items():
+            key = name[len('quantity['):-1] if name.startswith('quantity[') else None
+            if key in self.session.cart:
+                try:
+                    quantity = int(value)
+                except ValueError:
+                    continue
+                if quantity > 0:
+                    self.session.cart[key] = (self.session.cart[key][0], quantity)
+                else:
+                    del self.session.cart[key]
+        self.session.success = 'Success: You have modified your shopping cart!'
+        self._redirect(url('checkout/cart'))
+
+    def post_checkout_cart_remove(self):
+        self.session.cart.pop(self.form.get('key'), None)
+        self._json({'success': 'Success: You have modified your shopping cart!',
+                    'total': self.shop.cart_total_text(self.session)})
+
+    def get_checkout_cart(self):
+        breadcrumb = self._breadcrumb(('Shopping Cart', url('checkout/cart')))
+        if not self.session.cart:
+            content = ('{}{}<div class="row"><div id="content" class="col-sm-12"><h1>Shopping Cart</h1>'
+                       '<p>Your shopping cart is empty!</p><div class="buttons clearfix"><div class="pull-right">'
+                       '<a href="{}" class="btn btn-primary">Continue</a></div></div></div></div>'
+                       ).format(breadcrumb, self._alerts(), url('common/home'))
+            self._page('Shopping Cart', 'checkout-cart', content)
+            return
+        rows = ''.join(
+            '<tr><td class="text-center"></td><td class="text-left"><a href="{link}">{name}</a></td>'
+            '<td class="text-left">{model}</td><td class="text-left"><div class="input-group btn-block">'
+            '<input type="text" name="quantity[{key}]" value="{quantity}" size="1" class="form-control" />'
+            '<span class="input-group-btn"><button type="submit" title="Update" class="btn btn-primary">'
+            '<i class="fa fa-refresh">&#8635;</i></button><button type="button" title="Remove" '
+            'class="btn btn-danger" onclick="cart.remove(\'{key}\');"><i class="fa fa-times-circle">&#10005;</i>'
+            '</button></span></div></td><td class="text-right">{price}</td><td class="text-right">{total}</td></tr>'
+            .format(link=url('product/product', product_id=product.id), name=html.escape(product.name),
+                    model=product.model, key=key, quantity=quantity, price=format_price(product.price),
+                    total=format_price(total))
+            for key, product, quantity, total in self.shop.cart_lines(self.session))
+        zone = self.session.checkout.get('shipping_zone_id')
+        shipping_panel = (
+            '<div class="panel panel-default"><div class="panel-heading"><h4 class="panel-title">'
+            '<a href="#collapse-shipping" class="accordion-toggle" data-toggle="collapse">Estimate Shipping &amp; '
+            'Taxes <i class="fa fa-caret-down">&#9662;</i></a></h4></div>'
+            '<div id="collapse-shipping" class="panel-collapse collapse"><div class="panel-body">'
+            '<p>Enter your destination to get a shipping estimate.</p><div class="form-horizontal">'
+            '<div class="form-group required"><label class="control-label" for="input-country">Country</label>'
+            '<div>{country}</div></div>'
+            '<div class="form-group required"><label class="control-label" for="input-zone">Region / State</label>'
+            '<div>{zone}</div></div>'
+            '<div class="form-group required"><label class="control-label" for="input-postcode">Post Code</label>'
+            '<div><input type="text" name="postcode" value="" id="input-postcode" class="form-control" /></div>'
+            '</div><button type="button" id="button-quote" class="btn btn-primary">Get Quotes</button>'
+            '</div></div></div></div>'
+        ).format(country=self._select('country_id', 'input-country', OrderedDict([COUNTRY]), COUNTRY[0]),
+                 zone=self._select('zone_id', 'input-zone', ZONES, zone))
+        totals = ''.join('<tr><td class="text-right"><strong>{}:</strong></td><td class="text-right">{}</td></tr>'
+                         .format(title, format_price(value)) for title, value in self.shop.totals(self.session))
+        content = (
+            '{breadcrumb}{alerts}<div class="row"><div id="content" class="col-sm-12"><h1>Shopping Cart</h1>'
+            '<form action="{edit}" method="post"><div class="table-responsive"><table class="table table-bordered">'
+            '<thead><tr><td class="text-center">Image</td><td class="text-left">Product Name</td>'
+            '<td class="text-left">Model</td><td class="text-left">Quantity</td><td class="text-right">Unit Price</td>'
+            '<td class="text-right">Total</td></tr></thead><tbody>{rows}</tbody></table></div></form>'
+            '<h2>What would you like to do next?</h2>'
+            '<p>Choose if you have a discount code or want to estimate your delivery cost.</p>'
+            '<div class="panel-group" id="accordion"><div class="panel panel-default"><div class="panel-heading">'
+            '<h4 class="panel-title"><a href="#collapse-coupon" class="accordion-toggle" data-toggle="collapse">'
+            'Use Coupon Code</a></h4></div><div id="collapse-coupon" class="panel-collapse collapse">'
+            '<div class="panel-body"></div></div></div>{shipping_panel}</div><br />'
+            '<div class="row"><div class="col-sm-4 col-sm-offset-8"><table class="table table-bordered">'
+            '<tbody>{totals}</tbody></table></div></div>'
+            '<div class="buttons clearfix"><div class="pull-left"><a href="{home}" class="btn btn-default">'
+            'Continue Shopping</a></div><div class="pull-right"><a href="{checkout}" class="btn btn-primary">'
+            'Checkout</a></div></div></div></div>'
+        ).format(breadcrumb=breadcrumb, alerts=self._alerts(self.shop.minimum_errors(self.session)),
+                 edit=url('checkout/cart/edit'), rows=rows, shipping_panel=shipping_panel, totals=totals,
+                 home=url('common/home'), checkout=url('checkout/checkout'))
+        self._page('Shopping Cart', 'checkout-cart', content)
+
+    def post_extension_total_shipping_quote(self):
+        errors = {}
+        if self.form.get('country_id') != COUNTRY[0]:
+            errors['country_id'] = 'Please select a country!'
+        if self.form.get('zone_id') not in ZONES:
+            errors['zone_id'] = 'Please select a region / state!'
+        if errors:
+            self._json({'error': errors})
+            return
+        self.session.checkout['shipping_zone_id'] = self.form['zone_id']
+        self._json({'shipping_method': {'flat': {'title': 'Flat Rate', 'quote': {'flat': {
+            'code': 'flat.flat', 'title': 'Flat Shipping Rate', 'text': format_price(FLAT_SHIPPING_RATE)}}}}})
+
+    def post_extension_total_shipping_shipping(self):
+        if self.form.get('shipping_method') != 'flat.flat':
+            self._json({'error': {'shipping_method': 'Please choose a shipping method!'}})
+            return
+        self.session.shipping_method = 'flat.flat'
+        self.session.success = 'Success: Your shipping estimate has been applied!'
+        self._json({'redirect': url('checkout/cart')})
+
+    # account
+
+    def get_account_register(self, errors=None):
+        errors = errors or {}
+        fields = ''.join(self._input(label, name, 'input-' + name, input_type)
+                         for label, name, input_type in (('First Name', 'firstname', 'text'),
+                                                         ('Last Name', 'lastname', 'text'),
+                                                         ('E-Mail', 'email', 'email'),
+                                                         ('Telephone', 'telephone', 'tel')))
+        passwords = (self._input('Password', 'password', 'input-password', 'password') +
+                     self._input('Password Confirm', 'confirm', 'input-confirm', 'password'))
+        warnings = ''.join('<div class="text-danger">{}</div>'.format(html.escape(error))
+                           for error in errors.values())
+        content = (
+            '{breadcrumb}<div class="row"><div id="content" class="col-sm-9"><h1>Register Account</h1>'
+            '<p>If you already have an account with us, please login at the login page.</p>{warnings}'
+            '<form action="{action}" method="post" class="form-horizontal">'
+            '<fieldset id="account"><legend>Your Personal Details</legend>{fields}</fieldset>'
+            '<fieldset><legend>Your Password</legend>{passwords}</fieldset>'
+            '<div class="buttons"><div class="pull-right">I have read and agree to the Privacy Policy '
+            '<input type="checkbox" name="agree" value="1" /> &nbsp;'
+            '<input type="submit" value="Continue" class="btn btn-primary" /></div></div>'
+            '</form></div></div>'
+        ).format(breadcrumb=self._breadcrumb(('Account', url('account/account')),
+                                             ('Register', url('account/register'))),
+                 warnings=warnings, action=url('account/register'), fields=fields, passwords=passwords)
+        self._page('Register Account', 'account-register', content)
+
+    def post_account_register(self):
+        errors = {}
+        for name in ('firstname', 'lastname', 'email', 'telephone', 'password'):
+            if not self.form.get(name):
+                errors[name] = 'Please fill {}!'.format(name)
+        if self.form.get('email') in self.shop.customers:
+            errors['email'] = 'Warning: E-Mail Address is already registered!'
+        if self.form.get('confirm') != self.form.get('password'):
+            errors['confirm'] = 'Password confirmation does not match password!'
+        if not self.form.get('agree'):
+            errors['agree'] = 'Warning: You must agree to the Privacy Policy!'
+        if errors:
+            self.get_account_register(errors)
+            return
+        self.shop.customers[self.form['email']] = dict(self.form)
+        self.session.customer = self.form['email']
+        self._redirect(url('account/success'))
+
+    def get_account_success(self):
+        content = ('{}<div class="row"><div id="content" class="col-sm-12"><h1>Your Account Has Been Created!</h1>'
+                   '<p>Congratulations! Your new account has been successfully created!</p>'
+                   '<div class="buttons"><div class="pull-right"><a href="{}" class="btn btn-primary">Continue</a>'
+                   '</div></div></div></div>').format(
+            self._breadcrumb(('Account', url('account/account')), ('Success', url('account/success'))),
+            url('account/account'))
+        self._page('Your Account Has Been Created!', 'common-success', content)
+
+    def get_account_account(self):
+        if not self.session.customer:
+            self._redirect(url('account/login'))
+            return
+        content = ('{}<div class="row"><div id="content" class="col-sm-12"><h2>My Account</h2>'
+                   '<p>{}</p></div></div>').format(self._breadcrumb(('Account', url('account/account'))),
+                                                   html.escape(self.session.customer))
+        self._page('My Account', 'account-account', content)
+
+    def get_account_login(self, warning=None):
+        content = (
+            '{breadcrumb}{alert}<div class="row"><div id="content" class="col-sm-12"><div class="row">'
+            '<div class="col-sm-6"><div class="well"><h2>New Customer</h2><p><strong>Register Account</strong></p>'
+            '<a href="{register}" class="btn btn-primary">Continue</a></div></div>'
+            '<div class="col-sm-6"><div class="well"><h2>Returning Customer</h2>'
+            '<form action="{action}" method="post">'
+            '<div class="form-group"><label class="control-label" for="input-email">E-Mail Address</label>'
+            '<input type="text" name="email" value="" id="input-email" class="form-control" /></div>'
+            '<div class="form-group"><label class="control-label" for="input-password">Password</label>'
+            '<input type="password" name="password" value="" id="input-password" class="form-control" /></div>'
+            '<input type="submit" value="Login" class="btn btn-primary" /></form></div></div>'
+            '</div></div></div>'
+        ).format(breadcrumb=self._breadcrumb(('Account', url('account/account')), ('Login', url('account/login'))),
+                 alert=self._alerts([warning] if warning else []), register=url('account/register'),
+                 action=url('account/login'))
+        self._page('Account Login', 'account-login', content)
+
+    def post_account_login(self):
+        customer = self.shop.customers.get(self.form.get('email'))
+        if customer is None or customer['password'] != self.form.get('password'):
+            self.get_account_login('Warning: No match for E-Mail Address and/or Password.')
+            return
+        self.session.customer = customer['email']
+        self._redirect(url('account/account'))
+
+    def get_account_logout(self):
+        self.session.customer = None
+        self._redirect(url('common/home'))
+
+    # checkout
+
+    def get_checkout_checkout(self):
+        if not self.session.cart or self.shop.minimum_errors(self.session):
+            self._redirect(url('checkout/cart'))
+            return
+        payment_address = ''.join(self._input(label, name, 'input-payment-' + name.replace('_', '-'))
+                                  for label, name in (('First Name', 'firstname'), ('Last Name', 'lastname'),
+                                                      ('Address 1', 'address_1'), ('City', 'city'),
+                                                      ('Post Code', 'postcode')))
+        payment_address += (
+            '<div class="form-group required"><label class="control-label" for="input-payment-country">Country'
+            '</label><div>{}</div></div><div class="form-group required"><label class="control-label" '
+            'for="input-payment-zone">Region / State</label><div>{}</div></div>'
+        ).format(self._select('country_id', 'input-payment-country', OrderedDict([COUNTRY]), COUNTRY[0]),
+                 self._select('zone_id', 'input-payment-zone', ZONES))
+        lines = ''.join('<tr><td class="text-left">{}</td><td class="text-right">{}</td><td class="text-right">{}'
+                        '</td></tr>'.format(html.escape(product.name), quantity, format_price(total))
+                        for _, product, quantity, total in self.shop.cart_lines(self.session))
+        panels = [
+            ('Step 1: Checkout Options', 'collapse-checkout-option',
+             '<p>{}</p>'.format('Logged in as ' + html.escape(self.session.customer) if self.session.customer
+                                else 'Guest Checkout')),
+            ('Step 2: Billing Details', 'collapse-payment-address',
+             '<form class="form-horizontal"><fieldset id="address">{}</fieldset></form><div class="buttons clearfix">'
+             '<div class="pull-right"><input type="button" value="Continue" id="button-payment-address" '
+             'class="btn btn-primary" /></div></div>'.format(payment_address)),
+            ('Step 3: Delivery Details', 'collapse-shipping-address',
+             '<div class="radio"><label><input type="radio" name="shipping_address" value="existing" '
+             'checked="checked" /> I want to use an existing address</label></div><div class="buttons clearfix">'
+             '<div class="pull-right"><input type="button" value="Continue" id="button-shipping-address" '
+             'class="btn btn-primary" /></div></div>'),
+            ('Step 4: Delivery Method', 'collapse-shipping-method',
+             '<p>Please select the preferred shipping method to use on this order.</p><div class="radio"><label>'
+             '<input type="radio" name="shipping_method" value="flat.flat" checked="checked" /> Flat Shipping Rate - '
+             '{}</label></div><div class="buttons"><div class="pull-right"><input type="button" value="Continue" '
+             'id="button-shipping-method" class="btn btn-primary" /></div></div>'.format(
+                 format_price(FLAT_SHIPPING_RATE))),
+            ('Step 5: Payment Method', 'collapse-payment-method',
+             '<p>Please select the preferred payment method to use on this order.</p><div class="radio"><label>'
+             '<input type="radio" name="payment_method" value="cod" checked="checked" /> Cash On Delivery</label>'
+             '</div><p><strong>Add Comments About Your Order</strong></p><p><textarea name="comment" rows="8" '
+             'class="form-control"></textarea></p><div class="buttons"><div class="pull-right">I have read and '
+             'agree to the Terms &amp; Conditions <input type="checkbox" name="agree" value="1" /> &nbsp;'
+             '<input type="button" value="Continue" id="button-payment-method" class="btn btn-primary" /></div>'
+             '</div>'),
+            ('Step 6: Confirm Order', 'collapse-checkout-confirm',
+             '<div class="table-responsive"><table class="table table-bordered table-hover"><tbody>{}</tbody>'
+             '</table></div><div class="buttons"><div class="pull-right"><input type="button" value="Confirm Order" '
+             'id="button-confirm" class="btn btn-primary" /></div></div>'.format(lines)),
+        ]
+        accordion = ''.join(
+            '<div class="panel panel-default"><div class="panel-heading"><h4 class="panel-title">{}</h4></div>'
+            '<div class="panel-collapse collapse{}" id="{}"><div class="panel-body">{}</div></div></div>'.format(
+                title, ' in' if collapse_id == 'collapse-payment-address' else '', collapse_id, body)
+            for title, collapse_id, body in panels)
+        content = ('{}<div class="row"><div id="content" class="col-sm-12"><h1>Checkout</h1>'
+                   '<div class="panel-group" id="accordion">{}</div></div></div>').format(
+            self._breadcrumb(('Shopping Cart', url('checkout/cart')), ('Checkout', url('checkout/checkout'))),
+            accordion)
+        self.session.checkout = {}
+        self._page('Checkout', 'checkout-checkout', content)
+
+    def post_checkout_payment_address_save(self):
+        errors = {name: '{} must be between 1 and 128 characters!'.format(name)
+                  for name in ('firstname', 'lastname', 'address_1', 'city') if not self.form.get(name)}
+        if self.form.get('zone_id') not in ZONES:
+            errors['zone_id'] = 'Please select a region / state!'
+        if not errors:
+            self.session.checkout['payment_address'] = dict(self.form)
+        self._json({'error': errors} if errors else {})
+
+    def post_checkout_shipping_address_save(self):
+        if 'payment_address' not in self.session.checkout:
+            self._json({'error': {'shipping_address': 'Warning: Billing details are required!'}})
+            return
+        self.session.checkout['shipping_address'] = self.session.checkout['payment_address']
+        self._json({})
+
+    def post_checkout_shipping_method_save(self):
+        if self.form.get('shipping_method') != 'flat.flat':
+            self._json({'error': {'shipping_method': 'Warning: Shipping method required!'}})
+            return
+        self.session.checkout['shipping_method'] = 'flat.flat'
+        self._json({})
+
+    def post_checkout_payment_method_save(self):
+        errors = {}
+        if self.form.get('payment_method') != 'cod':
+            errors['payment_method'] = 'Warning: Payment method required!'
+        if not self.form.get('agree'):
+            errors['agree'] = 'Warning: You must agree to the Terms & Conditions!'
+        if not errors:
+            self.session.checkout['payment_method'] = 'cod'
+        self._json({'error': errors} if errors else {})
+
+    def post_checkout_confirm(self):
+        missing = [step for step in ('payment_address', 'shipping_address', 'shipping_method', 'payment_method')
+                   if step not in self.session.checkout]
+        if missing or not self.session.cart:
+            self._json({'redirect': url('checkout/cart')})
+            return
+        self.shop.orders.append({'customer': self.session.customer, 'cart': dict(self.session.cart),
+                                 'total': str(self.shop.totals(self.session)[-1][1])})
+        self.session.cart.clear()
+        self.session.shipping_method = None
+        self.session.checkout = {}
+        self._json({'redirect': url('checkout/success')})
+
+    def get_checkout_success(self):
+        content = ('{}<div class="row"><div id="content" class="col-sm-12"><h1>Your order has been placed!</h1>'
+                   '<p>Your order has been successfully processed!</p><div class="buttons"><div class="pull-right">'
+                   '<a href="{}" class="btn btn-primary">Continue</a></div></div></div></div>').format(
+            self._breadcrumb(('Shopping Cart', url('checkout/cart')), ('Checkout', url('checkout/checkout')),
+                             ('Success', url('checkout/success'))), url('common/home'))
+        self._page('Your order has been placed!', 'common-success', content)
+
+
+def make_server(host='127.0.0.1', port=0):
+    """
+    :param port: type: int, 0 picks a free port
+    :return: type: ThreadingHTTPServer with its own, empty shop
+    """
+    handler = type('BoundShopRequestHandler', (ShopRequestHandler,), {'shop': Shop()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start(host='127.0.0.1', port=0):
+    """
+    Start shop in a background thread.
+    :return: type: tuple (ThreadingHTTPServer, str base url)
+    """
+    server = make_server(host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, 'http://{}:{}/'.format(*server.server_address[:2])
+
+
+_local_url = None
+
+
+def resolve_app_url(app_url):
+    """
+    Return `app_url`, for "local" start the stand-in shop once per process and return its url.
+    """
+    global _local_url
+    if app_url != 'local':
+        return app_url
+    if _local_url is None:
+        _local_url = start()[1]
+    return _local_url
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run local stand-in shop')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args(argv)
+    server = make_server(args.host, args.port)
+    print('Serving shop on http://{}:{}/'.format(args.host, args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    main()
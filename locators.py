@@ -0,0 +1,100 @@
+"""
+Module represents typed locators and cache of element handles found with them
+"""
+import functools
+import re
+import weakref
+from collections import namedtuple
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.command import Command
+
+_ID_XPATH_PATTERN = re.compile(r'^//\*\[@id="([\w-]+)"\]$')
+# commands replacing the document, handles found before them are stale
+NAVIGATION_COMMANDS = frozenset([Command.GET, Command.REFRESH, Command.GO_BACK, Command.GO_FORWARD])
+
+
+class Locator(namedtuple('Locator', ['by', 'value'])):
+    """
+    Pair accepted by driver.find_element(*locator) and by expected conditions.
+    """
+    __slots__ = ()
+
+    def __str__(self):
+        return '{}={}'.format(self.by, self.value)
+
+
+def XPath(value):
+    """
+    XPath locator. Expressions selecting only by id, eg. //*[@id="button-cart"], are compiled
+    to id lookups, so browser does not have to evaluate them from the document root.
+    """
+    match = _ID_XPATH_PATTERN.match(value)
+    return Id(match.group(1)) if match else Locator(By.XPATH, value)
+
+
+def Css(value):
+    return Locator(By.CSS_SELECTOR, value)
+
+
+def Id(value):
+    return Locator(By.ID, value)
+
+
+@functools.lru_cache(maxsize=None)
+def as_locator(value):
+    """
+    Return given locator, plain strings are treated as XPath.
+    """
+    return value if isinstance(value, Locator) else XPath(value)
+
+
+class ElementCache:
+    """
+    Element handles found on current page of one driver. Handles are dropped when the driver navigates,
+    handles gone stale otherwise, eg. after a click loading another page, have to be checked before reuse.
+    """
+
+    def __init__(self):
+        self._elements = {}
+
+    def get(self, locator):
+        return self._elements.get(locator)
+
+    def put(self, locator, element):
+        self._elements[locator] = element
+
+    def discard(self, locator):
+        self._elements.pop(locator, None)
+
+    def clear(self):
+        self._elements.clear()
+
+    def attach(self, driver):
+        """
+        Drop all handles whenever driver loads, reloads or goes back or forward.
+        """
+        execute = driver.execute
+
+        @functools.wraps(execute)
+        def invalidating_execute(driver_command, params=None):
+            if driver_command in NAVIGATION_COMMANDS:
+                self.clear()
+            return execute(driver_command, params)
+
+        driver.execute = invalidating_execute
+
+
+_caches = weakref.WeakKeyDictionary()
+
+
+def get_element_cache(driver):
+    """
+    Return element cache shared by all page objects of driver, so navigation through one of them
+    invalidates handles of the others as well.
+    """
+    if driver not in _caches:
+        cache = ElementCache()
+        cache.attach(driver)
+        _caches[driver] = cache
+    return _caches[driver]
@@ -0,0 +1,260 @@
+"""
+Module represents streaming geckodriver log analyzer
+
+The log is read line by line, memory use does not depend on its size: message frequencies are kept
+in bounded counters and only the longest stalls are remembered.
+Entries are matched with test time windows from settings.TIMINGS_LOG by their millisecond timestamps.
+
+Usage: python log_analyzer.py geckodriver.log
+       python log_analyzer.py geckodriver.log --timings timings.jsonl --stall-ms 5000 --json
+"""
+import argparse
+import bisect
+import heapq
+import json
+import re
+import sys
+from collections import Counter, namedtuple
+
+from instrumentation import read_records
+
+# exact is False when entry has no timestamp of its own and ms is taken from the previous timestamped entry
+LogEntry = namedtuple('LogEntry', ['line_no', 'ms', 'exact', 'source', 'level', 'message'])
+Stall = namedtuple('Stall', ['gap_ms', 'start_ms', 'end_ms', 'line_no', 'before', 'after', 'test'])
+TestWindow = namedtuple('TestWindow', ['start_ms', 'end_ms', 'test'])
+
+# interleaved writes of browser processes can leave a fragment of another line in front of the timestamp
+TIMESTAMPED_PATTERN = re.compile(r'(\d{13})\t([^\t]*)\t(TRACE|DEBUG|INFO|WARN|ERROR|FATAL)\t(.*)$')
+PROCESS_PATTERN = re.compile(r'^\[(Parent|Child|GPU) \d+, [^\]]*\] (WARNING|ERROR): (.*)$')
+IPC_PATTERN = re.compile(r'^###!!! \[(\w+)\]\[[^\]]*\] Error: (.*)$')
+CONSOLE_PATTERN = re.compile(r'^console\.(error|warn): (.*)$')
+NORMALIZE_PATTERNS = [
+    (re.compile(r'[a-z]+://\S+'), '<url>'),
+    (re.compile(r'[A-Za-z]:[\\/][^\s"]*|/[^\s"]*/[^\s"]*'), '<path>'),
+    (re.compile(r'0x[0-9a-fA-F]+|\d+'), 'N'),
+]
+SESSION_START_SOURCE = 'mozrunner::runner'
+SESSION_END_MESSAGE = 'Stopped listening on port'
+
+
+def parse_line(line, line_no, last_ms):
+    """
+    :param last_ms: type: int, timestamp of the previous timestamped entry, used for lines without timestamp
+    :return: type: LogEntry, None for stack traces, continuation lines and fragments
+    """
+    line = line.rstrip('\r\n')
+    match = TIMESTAMPED_PATTERN.search(line)
+    if match:
+        ms, source, level, message = match.groups()
+        return LogEntry(line_no, int(ms), True, source, level, message)
+    match = PROCESS_PATTERN.match(line)
+    if match:
+        source, level, message = match.groups()
+        return LogEntry(line_no, last_ms, False, source, 'WARN' if level == 'WARNING' else level, message)
+    match = IPC_PATTERN.match(line)
+    if match:
+        return LogEntry(line_no, last_ms, False, 'ipc:' + match.group(1), 'ERROR', match.group(2))
+    if line.startswith('IPDL protocol error:'):
+        return LogEntry(line_no, last_ms, False, 'ipc', 'ERROR', line)
+    match = CONSOLE_PATTERN.match(line)
+    if match:
+        level, message = match.groups()
+        return LogEntry(line_no, last_ms, False, 'console', level.upper(), message)
+    return None
+
+
+def iter_entries(lines):
+    """
+    Lazily parse log lines.
+    :param lines: type: iterable of str, eg. open file
+    """
+    last_ms = None
+    for line_no, line in enumerate(lines, 1):
+        entry = parse_line(line, line_no, last_ms)
+        if entry is not None:
+            if entry.exact:
+                last_ms = entry.ms
+            yield entry
+
+
+def normalize(message, limit=160):
+    """
+    Drop variable parts of message, eg. ports, pids and urls, so repeated messages are counted together.
+    """
+    for pattern, replacement in NORMALIZE_PATTERNS:
+        message = pattern.sub(replacement, message)
+    return message.strip()[:limit]
+
+
+class BoundedCounter:
+    """
+    Approximate counter keeping at most `size` keys (space-saving algorithm). Counts of the most
+    frequent keys are exact as long as fewer than `size` distinct keys were seen, otherwise
+    a count is overestimated by at most `error(key)`.
+    """
+
+    def __init__(self, size=200):
+        self.size = size
+        self._counts = {}
+        self._errors = {}
+
+    def add(self, key, count=1):
+        if key in self._counts:
+            self._counts[key] += count
+            return
+        error = 0
+        if len(self._counts) >= self.size:
+            evicted = min(self._counts, key=self._counts.get)
+            error = self._counts.pop(evicted)
+            del self._errors[evicted]
+        self._counts[key] = error + count
+        self._errors[key] = error
+
+    def error(self, key):
+        return self._errors.get(key, 0)
+
+    def most_common(self, n=None):
+        return Counter(self._counts).most_common(n)
+
+
+class TestWindows:
+    def __init__(self, windows):
+        """
+        :param windows: type: iterable of TestWindow
+        """
+        self._windows = sorted(windows)
+        self._starts = [window.start_ms for window in self._windows]
+        self._longest = max([window.end_ms - window.start_ms for window in self._windows] or [0])
+
+    @classmethod
+    def from_timings(cls, path):
+        """
+        Read windows of "test" records of an instrumentation timings log.
+        """
+        return cls(TestWindow(record['start_ms'], record['start_ms'] + int(record['ms']), record['test'])
+                   for record in read_records(path) if record['kind'] == 'test')
+
+    def find(self, ms):
+        """
+        :return: type: str, id of the test running at ms, latest started one when windows overlap
+        """
+        if ms is None:
+            return None
+        index = bisect.bisect_right(self._starts, ms) - 1
+        while index >= 0 and self._windows[index].start_ms >= ms - self._longest:
+            if self._windows[index].end_ms >= ms:
+                return self._windows[index].test
+            index -= 1
+        return None
+
+
+class LogAnalyzer:
+    def __init__(self, windows=None, stall_ms=5000, top_stalls=20, counter_size=200):
+        """
+        :param windows: type: TestWindows
+        :param stall_ms: type: int, gap between timestamped entries of one browser session considered a stall
+        """
+        self.windows = windows or TestWindows([])
+        self.stall_ms = stall_ms
+        self.top_stalls = top_stalls
+        self.lines = 0
+        self.sessions = 0
+        self.levels = Counter()
+        self.messages = BoundedCounter(counter_size)
+        self.per_test = {}
+        self._stalls = []
+        self._previous = None
+
+    def feed(self, entry):
+        self.levels[entry.level] += 1
+        if entry.level in ('WARN', 'ERROR', 'FATAL'):
+            self.messages.add((entry.level, entry.source, normalize(entry.message)))
+        test = self.windows.find(entry.ms)
+        if test is not None and entry.level in ('WARN', 'ERROR', 'FATAL'):
+            self.per_test.setdefault(test, Counter())[entry.level] += 1
+        if not entry.exact:
+            return
+        # time before a session ends and until the next one starts is idle time between runs, not a stall
+        if entry.message.startswith(SESSION_END_MESSAGE):
+            self._previous = None
+            return
+        if entry.source == SESSION_START_SOURCE:
+            self.sessions += 1
+        elif self._previous is not None and entry.ms - self._previous.ms >= self.stall_ms:
+            self._add_stall(entry, test)
+        self._previous = entry
+
+    def _add_stall(self, entry, test):
+        stall = Stall(entry.ms - self._previous.ms, self._previous.ms, entry.ms, entry.line_no,
+                      normalize(self._previous.message), normalize(entry.message), test)
+        if len(self._stalls) < self.top_stalls:
+            heapq.heappush(self._stalls, stall)
+        else:
+            heapq.heappushpop(self._stalls, stall)
+
+    def analyze(self, lines):
+        for entry in iter_entries(self._count_lines(lines)):
+            self.feed(entry)
+        return self
+
+    def _count_lines(self, lines):
+        for line in lines:
+            self.lines += 1
+            yield line
+
+    @property
+    def stalls(self):
+        return sorted(self._stalls, reverse=True)
+
+    def summary(self, top=20):
+        return {'lines': self.lines,
+                'sessions': self.sessions,
+                'levels': dict(self.levels),
+                'top_messages': [{'level': level, 'source': source, 'message': message, 'count': count,
+                                  'max_overcount': self.messages.error((level, source, message))}
+                                 for (level, source, message), count in self.messages.most_common(top)],
+                'per_test': {test: dict(counts) for test, counts in sorted(self.per_test.items())},
+                'stalls': [stall._asdict() for stall in self.stalls]}
+
+
+def print_summary(summary):
+    print('{lines} lines, {sessions} browser sessions'.format(**summary))
+    print('levels: ' + ', '.join('{} {}'.format(level, count) for level, count in sorted(summary['levels'].items())))
+    print('\nmost frequent warnings and errors:')
+    for row in summary['top_messages']:
+        print('{count:>7} {level:<5} {source:<45} {message}'.format(**row))
+    if summary['per_test']:
+        print('\nwarnings and errors per test:')
+        for test, counts in summary['per_test'].items():
+            print('  {} {}'.format(test, ', '.join('{} {}'.format(level, count)
+                                                   for level, count in sorted(counts.items()))))
+    if summary['stalls']:
+        print('\nstalls:')
+        for stall in summary['stalls']:
+            print('{gap_ms:>8}ms at line {line_no} ({test})\n          after:  {before}\n          before: {after}'
+                  .format(**stall))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Summarize geckodriver log')
+    parser.add_argument('log')
+    parser.add_argument('--timings', help='instrumentation timings log to match entries with tests')
+    parser.add_argument('--stall-ms', type=int, default=5000)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    windows = TestWindows.from_timings(args.timings) if args.timings else None
+    analyzer = LogAnalyzer(windows, args.stall_ms, args.top)
+    with open(args.log, encoding='utf-8', errors='replace') as log:
+        analyzer.analyze(log)
+    summary = analyzer.summary(args.top)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,89 +4,227 @@ Module represents products section in pages
 import random
 import re
 import string
+import time
 
-from selenium.common.exceptions import NoSuchElementException
-from selenium.webdriver.common.by import By
+from selenium.common.exceptions import (ElementClickInterceptedException, ElementNotInteractableException,
+                                        NoSuchElementException, StaleElementReferenceException)
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait, Select
 
+import flakiness
+import price_checks
+import session_cache
+import settings
+import waits
+from catalog import CatalogScanner
+from locators import Css, XPath, as_locator, get_element_cache
+from shop_api import ShopClient
+
 
 class BasicPage:
-    PROD1_DETAILS_XPATH = '/html/body/div[2]/div/div/div[2]/div[1]/div/div[2]/h4/a'
-    PROD2_DETAILS_XPATH = '/html/body/div[2]/div/div/div[2]/div[2]/div/div[2]/h4/a'
-    PROD3_DETAILS_XPATH = '/html/body/div[2]/div/div/div[2]/div[3]/div/div[2]/h4/a'
-    PROD4_DETAILS_XPATH = '/html/body/div[2]/div/div/div[2]/div[4]/div/div[2]/h4/a'
+    PROD1_DETAILS_XPATH = XPath('/html/body/div[2]/div/div/div[2]/div[1]/div/div[2]/h4/a')
+    PROD2_DETAILS_XPATH = XPath('/html/body/div[2]/div/div/div[2]/div[2]/div/div[2]/h4/a')
+    PROD3_DETAILS_XPATH = XPath('/html/body/div[2]/div/div/div[2]/div[3]/div/div[2]/h4/a')
+    PROD4_DETAILS_XPATH = XPath('/html/body/div[2]/div/div/div[2]/div[4]/div/div[2]/h4/a')
     PRODUCT_DETAILS_XPATHS = {'1': PROD1_DETAILS_XPATH,
                               '2': PROD2_DETAILS_XPATH,
                               '3': PROD3_DETAILS_XPATH,
                               '4': PROD4_DETAILS_XPATH}
-    HOME_PAGE_XPATH = '/html/body/div[2]/ul/li[1]/a/i'
-    SHOPPING_CART_PAGE_XPATH = '/html/body/nav/div/div[2]/ul/li[4]/a/span'
-
-    MY_ACCOUNT_BUTTON_XPATH = '/html/body/nav/div/div[2]/ul/li[2]/a/span[1]'
-    REGISTER_BUTTON_CSS = '.dropdown-menu-right > li:nth-child(1) > a:nth-child(1)'
-    FIRST_NAME_REGISTRY_XPATH = '//*[@id="input-firstname"]'
-    LAST_NAME_REGISTRY_XPATH = '//*[@id="input-lastname"]'
-    EMAIL_REGISTRY_XPATH = '//*[@id="input-email"]'
-    TEL_REGISTRY_XPATH = '//*[@id="input-telephone"]'
-    PASSWORD_REGISTRY_XPATH = '//*[@id="input-password"]'
-    PASSWORD_CONFIRM_REGISTRY_XPATH = '//*[@id="input-confirm"]'
-    PRIVACY_POLICY_BUTTON_REGISTRY_XPATH = '/html/body/div[2]/div/div/form/div/div/input[1]'
-    CONTINUE_BUTTON_REGISTRY_XPATH = '/html/body/div[2]/div/div/form/div/div/input[2]'
-    FINISH_ORDER_BUTTON_XPATH = '/html/body/div[2]/div/div/div/div/a'
-
-    VIEW_BUTTON_FROM_CART_XPATH = '/html/body/header/div/div/div[3]/div/ul/li[2]/div/p/a[1]/strong'
-    REMOVE_BUTTON_XPATH = '/html/body/header/div/div/div[3]/div/ul/li[1]/table/tbody/tr[1]/td[5]/button'
-    CART_XPATH = '//*[@id="cart-total"]'
+    HOME_PAGE_XPATH = XPath('/html/body/div[2]/ul/li[1]/a/i')
+    SHOPPING_CART_PAGE_XPATH = XPath('/html/body/nav/div/div[2]/ul/li[4]/a/span')
+
+    MY_ACCOUNT_BUTTON_XPATH = XPath('/html/body/nav/div/div[2]/ul/li[2]/a/span[1]')
+    REGISTER_BUTTON_CSS = Css('.dropdown-menu-right > li:nth-child(1) > a:nth-child(1)')
+    LOGIN_BUTTON_CSS = Css('.dropdown-menu-right > li:nth-child(2) > a:nth-child(1)')
+    LOGIN_EMAIL_XPATH = XPath('//*[@id="input-email"]')
+    LOGIN_PASSWORD_XPATH = XPath('//*[@id="input-password"]')
+    LOGIN_SUBMIT_CSS = Css('input[type="submit"][value="Login"]')
+    FIRST_NAME_REGISTRY_XPATH = XPath('//*[@id="input-firstname"]')
+    LAST_NAME_REGISTRY_XPATH = XPath('//*[@id="input-lastname"]')
+    EMAIL_REGISTRY_XPATH = XPath('//*[@id="input-email"]')
+    TEL_REGISTRY_XPATH = XPath('//*[@id="input-telephone"]')
+    PASSWORD_REGISTRY_XPATH = XPath('//*[@id="input-password"]')
+    PASSWORD_CONFIRM_REGISTRY_XPATH = XPath('//*[@id="input-confirm"]')
+    PRIVACY_POLICY_BUTTON_REGISTRY_XPATH = XPath('/html/body/div[2]/div/div/form/div/div/input[1]')
+    CONTINUE_BUTTON_REGISTRY_XPATH = XPath('/html/body/div[2]/div/div/form/div/div/input[2]')
+    FINISH_ORDER_BUTTON_XPATH = XPath('/html/body/div[2]/div/div/div/div/a')
+
+    VIEW_BUTTON_FROM_CART_XPATH = XPath('/html/body/header/div/div/div[3]/div/ul/li[2]/div/p/a[1]/strong')
+    REMOVE_BUTTON_XPATH = XPath('/html/body/header/div/div/div[3]/div/ul/li[1]/table/tbody/tr[1]/td[5]/button')
+    CART_XPATH = XPath('//*[@id="cart-total"]')
+
+    SESSION_COOKIE = 'OCSESSID'
+    CART_RESET_MODES = ('cookie', 'http', 'ui')
+
+    POLL_FREQUENCY = 0.1
+    # retries of one action on stale, intercepted or not interactable element, the latter two are limited
+    # by shared retry budget on top of that
+    MAX_RETRIES = 2
 
     def __init__(self, driver):
         self.driver = driver
+        self._elements = get_element_cache(driver)
+        self._latency = flakiness.get_latency_history()
+        self._retry_budget = flakiness.get_retry_budget()
+
+    def _wait_until(self, condition, timeout=None, locator=None):
+        """
+        :param timeout: type: float, None waits as long as learned for locator, see flakiness.LatencyHistory
+        :param locator: type: Locator, element the condition waits for, polling is adapted to it as well
+        """
+        learned_timeout, poll_frequency = self._latency.wait_for(locator)
+        wait = WebDriverWait(self.driver, learned_timeout if timeout is None else timeout,
+                             poll_frequency=poll_frequency)
+        return wait.until(condition)
+
+    def _wait_for_page_to_settle(self, timeout=None):
+        """
+        Wait until AJAX requests are finished and DOM stops changing.
+        """
+        self._wait_until(waits.no_pending_ajax(), timeout)
+        self._wait_until(waits.dom_is_stable(), timeout)
+
+    def _wait_for_text_to_settle(self, xpath, timeout=None):
+        return self._wait_until(waits.text_is_stable(as_locator(xpath)), timeout)
+
+    def _find_element(self, xpath, clickable=False, timeout=None):
+        """
+        Return element handle cached for current page, find and cache it when missing or stale.
+        :param xpath: type: Locator or str treated as XPath
+        :param clickable: type: bool, wait for element to be visible and enabled instead of present
+        """
+        locator = as_locator(xpath)
+        element = self._elements.get(locator)
+        if element is not None:
+            try:
+                # one round trip proves the handle still belongs to the current page
+                enabled = element.is_enabled()
+                if not clickable or enabled and element.is_displayed():
+                    return element
+            except StaleElementReferenceException:
+                self._elements.discard(locator)
+        condition = EC.element_to_be_clickable if clickable else EC.presence_of_element_located
+        start = time.perf_counter()
+        element = self._wait_until(condition(locator), timeout, locator)
+        self._latency.observe(locator, time.perf_counter() - start)
+        self._elements.put(locator, element)
+        return element
+
+    def _on_element(self, xpath, action, clickable=False, timeout=None):
+        """
+        Run action on element. Element is looked up again when its handle went stale and clicks intercepted
+        by another element or not interactable yet are retried after page settles, as long as MAX_RETRIES
+        and retry budget allow.
+        :param action: type: callable taking WebElement
+        """
+        locator = as_locator(xpath)
+        lookups = retries = 0
+        while True:
+            try:
+                result = action(self._find_element(locator, clickable, timeout))
+            except StaleElementReferenceException:
+                # page changed under the handle, finding the element again is not a flaky retry
+                lookups += 1
+                if lookups > self.MAX_RETRIES:
+                    raise
+                self._elements.discard(locator)
+                continue
+            except (ElementClickInterceptedException, ElementNotInteractableException):
+                retries += 1
+                if retries > self.MAX_RETRIES or not self._retry_budget.withdraw():
+                    raise
+                self._elements.discard(locator)
+                self._wait_for_page_to_settle()
+                continue
+            self._retry_budget.deposit()
+            return result
+
+    def _refresh(self):
+        # cached handles of every page object of the driver are dropped by the driver itself
+        self.driver.refresh()
 
-    def _wait_for_element(self, xpath, timeout=10):
-        wait = WebDriverWait(self.driver, timeout)
-        wait.until(EC.presence_of_element_located((By.XPATH, xpath)))
+    def _wait_for_element(self, xpath, timeout=None):
+        return self._find_element(xpath, timeout=timeout)
 
-    def _wait_for_element_to_be_clickable(self, xpath, timeout=10):
-        wait = WebDriverWait(self.driver, timeout)
-        wait.until(EC.element_to_be_clickable((By.XPATH, xpath)))
+    def _wait_for_element_to_be_clickable(self, xpath, timeout=None):
+        return self._find_element(xpath, clickable=True, timeout=timeout)
 
-    def _click_enabled_element(self, xpath, timeout=10):
-        self._wait_for_element_to_be_clickable(xpath, timeout)
-        self.driver.find_element_by_xpath(xpath).click()
+    def _click_enabled_element(self, xpath, timeout=None):
+        self._on_element(xpath, lambda elem: elem.click(), clickable=True, timeout=timeout)
 
-    def _insert_text_to_enabled_element(self, xpath, text, timeout=10):
-        self._wait_for_element(xpath, timeout)
-        elem = self.driver.find_element_by_xpath(xpath)
-        elem.send_keys(Keys.CONTROL + 'a')
-        elem.send_keys(Keys.DELETE)
-        elem.send_keys(text)
+    def _insert_text_to_enabled_element(self, xpath, text, timeout=None):
+        def insert_text(elem):
+            elem.send_keys(Keys.CONTROL + 'a')
+            elem.send_keys(Keys.DELETE)
+            elem.send_keys(text)
+        self._on_element(xpath, insert_text, timeout=timeout)
 
-    def _get_text_from_enabled_element(self, xpath, timeout=10):
-        self._wait_for_element(xpath, timeout)
-        return self.driver.find_element_by_xpath(xpath).text
+    def _get_text_from_enabled_element(self, xpath, timeout=None):
+        return self._on_element(xpath, lambda elem: elem.text, timeout=timeout)
 
-    def _get_element_from_enabled_element(self, xpath, timeout=10):
-        self._wait_for_element(xpath, timeout)
-        return self.driver.find_element_by_xpath(xpath)
+    def _get_element_from_enabled_element(self, xpath, timeout=None):
+        return self._find_element(xpath, timeout=timeout)
+
+    def _read_elements(self, xpaths, attributes=(), timeout=None):
+        """
+        Read many elements in one driver round trip, waiting until all of them are present.
+        :param xpaths: type: dict, name -> Locator or str treated as XPath
+        :param attributes: type: iterable of attribute names to read besides text and visibility
+        :return: type: dict, name -> {'text': str, 'visible': bool, <attribute>: str}
+        """
+        locators = {name: as_locator(xpath) for name, xpath in xpaths.items()}
+        return self._wait_until(waits.all_elements_read(locators, attributes), timeout)
+
+    @staticmethod
+    def _extract_price(text):
+        """
+        Return price following the dollar sign, eg. "2 item(s) - $244.00" will be converted to 244.00
+        and "-$5.00" to -5.00, parsed the same way as by price_checks
+        :param text: type: str
+        """
+        return price_checks.format_cents(price_checks.to_cents(text))
 
     @staticmethod
-    def _convert_price_to_float(price):
+    def _convert_price_to_cents(price):
         """
-        Convert string price formats, eg. 10,000,000.00 will be converted to 10000000.0
+        Convert string price to exact integer cents, eg. 10,000,000.00 will be converted to 1000000000
         :param price: type: str
         """
-        return float(price.replace(",", "")) if "," in price else float(price)
+        return price_checks.to_cents(price)
 
-    def _get_cart_items_quantity(self):
-        self.driver.refresh()
-        cart_string = self._get_text_from_enabled_element(self.CART_XPATH)
-        return re.match("(.*) item", cart_string).group(1)
+    @staticmethod
+    def _parse_cart_total(cart_string):
+        """
+        Split cart button text, eg. "2 item(s) - $244.00" will be split to ('2', '244.00')
+        :param cart_string: type: str
+        """
+        return re.match("(.*) item", cart_string).group(1), BasicPage._extract_price(cart_string)
 
-    def _get_cart_items_value(self):
-        self.driver.refresh()
-        cart_string = self._get_text_from_enabled_element(self.CART_XPATH)
-        return re.search("(?<=\$)(.*)", cart_string).group()
+    def _get_cart_state(self, refresh=False):
+        """
+        Read quantity and value from cart button with one read. Actions adding products wait for the button
+        to update, so reload is needed only after changes made outside of the page.
+        :param refresh: type: bool, reload page before reading
+        :return: type: tuple (quantity, value), eg. ('2', '244.00')
+        """
+        if refresh:
+            self._refresh()
+        return self._parse_cart_total(self._get_text_from_enabled_element(self.CART_XPATH))
+
+    def _get_cart_items_quantity(self, refresh=False):
+        return self._get_cart_state(refresh)[0]
+
+    def _get_cart_items_value(self, refresh=False):
+        return self._get_cart_state(refresh)[1]
+
+    def _click_and_wait_for_cart_update(self, xpath, timeout=None):
+        """
+        Click element adding products to cart with AJAX and wait until cart button shows the new cart.
+        """
+        old_cart_string = self._get_text_from_enabled_element(self.CART_XPATH)
+        self._click_enabled_element(xpath, timeout)
+        self._wait_until(waits.text_to_change(self.CART_XPATH, old_cart_string), timeout)
 
     def _click_cart_button(self):
         self._click_enabled_element(self.CART_XPATH)
@@ -94,12 +232,32 @@ class BasicPage:
     def _click_view_button(self):
         self._click_enabled_element(self.VIEW_BUTTON_FROM_CART_XPATH)
 
-    def _clean_cart(self):
+    def _clean_cart(self, mode=None):
+        """
+        Empty the cart.
+        :param mode: type: str, one of CART_RESET_MODES, settings.CART_RESET_MODE by default
+            cookie - drop session cookie, the browser starts a new guest session with an empty cart
+            http - set quantity of all items to 0 with one request sharing the browser's cookies
+            ui - remove items one by one with the cart dropdown, verifies the remove button as well
+        """
+        mode = mode or settings.CART_RESET_MODE
+        if mode == 'cookie':
+            self.driver.delete_cookie(self.SESSION_COOKIE)
+            self._refresh()
+        elif mode == 'http':
+            ShopClient.from_driver(self.driver).clear_cart()
+            self._refresh()
+        elif mode == 'ui':
+            self._clean_cart_with_ui()
+        else:
+            raise ValueError('Unknown cart reset mode {!r}, expected one of {}'.format(mode, self.CART_RESET_MODES))
+
+    def _clean_cart_with_ui(self):
         while True:
-            self.driver.refresh()
+            self._refresh()
             self._click_cart_button()
             try:
-                self.driver.find_element_by_xpath(self.REMOVE_BUTTON_XPATH).is_displayed()
+                self.driver.find_element(*self.REMOVE_BUTTON_XPATH).is_displayed()
                 self._click_enabled_element(self.REMOVE_BUTTON_XPATH)
             except NoSuchElementException:
                 break
@@ -115,26 +273,54 @@ class BasicPage:
         self._click_enabled_element(self.SHOPPING_CART_PAGE_XPATH)
 
     def _register_user(self):
+        """
+        Register new customer, the customer stays logged in.
+        :return: type: dict, credentials {'email': ..., 'password': ...}
+        """
         self._click_enabled_element(self.MY_ACCOUNT_BUTTON_XPATH)
-        self.driver.find_element_by_css_selector(self.REGISTER_BUTTON_CSS).click()
+        self.driver.find_element(*self.REGISTER_BUTTON_CSS).click()
         first_name = self._get_element_from_enabled_element(self.FIRST_NAME_REGISTRY_XPATH)
         first_name.send_keys('Jan')
-        import time
-        time.sleep(2)
+        self._wait_for_page_to_settle()
         last_name = self._get_element_from_enabled_element(self.LAST_NAME_REGISTRY_XPATH)
         last_name.send_keys('Kowalski')
+        credentials = {'email': self._email_generator(), 'password': '1qazZAQ!'}
         email = self._get_element_from_enabled_element(self.EMAIL_REGISTRY_XPATH)
-        email.send_keys(self._email_generator())
+        email.send_keys(credentials['email'])
         tel = self._get_element_from_enabled_element(self.TEL_REGISTRY_XPATH)
         tel.send_keys('46652033')
         password = self._get_element_from_enabled_element(self.PASSWORD_REGISTRY_XPATH)
-        password.send_keys('1qazZAQ!')
+        password.send_keys(credentials['password'])
         password_confirm = self._get_element_from_enabled_element(self.PASSWORD_CONFIRM_REGISTRY_XPATH)
-        password_confirm.send_keys('1qazZAQ!')
+        password_confirm.send_keys(credentials['password'])
         self._get_element_from_enabled_element(self.PRIVACY_POLICY_BUTTON_REGISTRY_XPATH).click()
         self._get_element_from_enabled_element(self.CONTINUE_BUTTON_REGISTRY_XPATH).click()
         self._click_enabled_element(self.FINISH_ORDER_BUTTON_XPATH)
         self._click_enabled_element(self.HOME_PAGE_XPATH)
+        return credentials
+
+    def _login_user(self, email, password):
+        """
+        Log in existing customer and go back to home page.
+        :return: type: bool, False when the shop rejected the credentials
+        """
+        self._click_enabled_element(self.MY_ACCOUNT_BUTTON_XPATH)
+        self.driver.find_element(*self.LOGIN_BUTTON_CSS).click()
+        self._insert_text_to_enabled_element(self.LOGIN_EMAIL_XPATH, email)
+        self._insert_text_to_enabled_element(self.LOGIN_PASSWORD_XPATH, password)
+        self._click_enabled_element(self.LOGIN_SUBMIT_CSS)
+        self._wait_for_page_to_settle()
+        if not ShopClient.from_driver(self.driver).is_logged_in():
+            return False
+        self._click_enabled_element(self.HOME_PAGE_XPATH)
+        return True
+
+    def _log_in_with_cached_session(self):
+        """
+        Log in the customer of current worker, its session is restored from cache when still valid.
+        :return: type: dict, credentials {'email': ..., 'password': ...}
+        """
+        return session_cache.get_session_cache().log_in(self)
 
     @staticmethod
     def _email_generator():
@@ -143,26 +329,26 @@ class BasicPage:
 
 
 class HomePage(BasicPage):
-    PROD1_ADD_TO_CART_XPATH = '/html/body/div[2]/div/div/div[2]/div[1]/div/div[3]/button[1]'
-    PROD2_ADD_TO_CART_XPATH = '/html/body/div[2]/div/div/div[2]/div[2]/div/div[3]/button[1]'
-    PROD3_ADD_TO_CART_XPATH = '/html/body/div[2]/div/div/div[2]/div[3]/div/div[3]/button[1]'
-    PROD4_ADD_TO_CART_XPATH = '/html/body/div[2]/div/div/div[2]/div[4]/div/div[3]/button[1]'
+    PROD1_ADD_TO_CART_XPATH = XPath('/html/body/div[2]/div/div/div[2]/div[1]/div/div[3]/button[1]')
+    PROD2_ADD_TO_CART_XPATH = XPath('/html/body/div[2]/div/div/div[2]/div[2]/div/div[3]/button[1]')
+    PROD3_ADD_TO_CART_XPATH = XPath('/html/body/div[2]/div/div/div[2]/div[3]/div/div[3]/button[1]')
+    PROD4_ADD_TO_CART_XPATH = XPath('/html/body/div[2]/div/div/div[2]/div[4]/div/div[3]/button[1]')
     PRODUCT_IDS_XPATHS = {'1': PROD1_ADD_TO_CART_XPATH,
                           '2': PROD2_ADD_TO_CART_XPATH,
                           '3': PROD3_ADD_TO_CART_XPATH,
                           '4': PROD4_ADD_TO_CART_XPATH}
 
-    PROD1_PRICE_XPATH = '/html/body/div[2]/div/div/div[2]/div[1]/div/div[2]/p[2]/span'
-    PROD2_PRICE_XPATH = '/html/body/div[2]/div/div/div[2]/div[2]/div/div[2]/p[2]/span'
-    PROD3_PRICE_XPATH = '/html/body/div[2]/div/div/div[2]/div[3]/div/div[2]/p[2]/span'
-    PROD4_PRICE_XPATH = '/html/body/div[2]/div/div/div[2]/div[4]/div/div[2]/p[2]/span'
+    PROD1_PRICE_XPATH = XPath('/html/body/div[2]/div/div/div[2]/div[1]/div/div[2]/p[2]/span')
+    PROD2_PRICE_XPATH = XPath('/html/body/div[2]/div/div/div[2]/div[2]/div/div[2]/p[2]/span')
+    PROD3_PRICE_XPATH = XPath('/html/body/div[2]/div/div/div[2]/div[3]/div/div[2]/p[2]/span')
+    PROD4_PRICE_XPATH = XPath('/html/body/div[2]/div/div/div[2]/div[4]/div/div[2]/p[2]/span')
     PRODUCT_PRICES_XPATHS = {'1': PROD1_PRICE_XPATH,
                              '2': PROD2_PRICE_XPATH,
                              '3': PROD3_PRICE_XPATH,
                              '4': PROD4_PRICE_XPATH}
 
-    REGISTRY_BUTTON_XPATH = '//*[@id="button-register"]'
-    MESSAGE_CART_XPATH = '/html/body/header/div/div/div[3]/div/ul/li/p'
+    REGISTRY_BUTTON_XPATH = XPath('//*[@id="button-register"]')
+    MESSAGE_CART_XPATH = XPath('/html/body/header/div/div/div[3]/div/ul/li/p')
 
     def __init__(self, driver):
         self.driver = driver
@@ -173,70 +359,92 @@ class HomePage(BasicPage):
 
         :param product_number: type: str [1-4]
         """
-        self._click_enabled_element(self.PRODUCT_IDS_XPATHS[product_number])
+        self._click_and_wait_for_cart_update(self.PRODUCT_IDS_XPATHS[product_number])
 
     def _get_product_value(self, product_number):
         """
         :param product_number: type: str [1-4]
         """
         value_string = self._get_text_from_enabled_element(self.PRODUCT_PRICES_XPATHS[product_number])
-        return re.search("(?<=\$)(.*)", value_string).group()
+        return self._extract_price(value_string)
+
+    def _get_product_values(self):
+        """
+        Read prices of all products at once.
+        :return: type: dict, product number -> price string
+        """
+        elements = self._read_elements(self.PRODUCT_PRICES_XPATHS)
+        return {prod_id: self._extract_price(elem['text']) for prod_id, elem in elements.items()}
+
+    def _iter_catalog_products(self, page_size=None):
+        """
+        Yield catalog.Product records of home page and all categories, pages are loaded lazily.
+        """
+        return CatalogScanner(self.driver, page_size).iter_catalog()
+
+    def _add_product_to_cart(self, product):
+        """
+        :param product: type: catalog.Product
+        """
+        self._click_and_wait_for_cart_update(product.add_to_cart)
 
 
 class DetailsPage(BasicPage):
-    INPUT_QUANTITY_DETAILS_PAGE_XPATH = '//*[@id="input-quantity"]'
-    ADD_TO_CART_XPATH = '//*[@id="button-cart"]'
-    ALERT_INFO_CSS = '.alert'
-    SET_QTY_XPATH = '//*[@id="input-quantity"]'
+    INPUT_QUANTITY_DETAILS_PAGE_XPATH = XPath('//*[@id="input-quantity"]')
+    ADD_TO_CART_XPATH = XPath('//*[@id="button-cart"]')
+    ALERT_INFO_CSS = Css('.alert')
+    SET_QTY_XPATH = XPath('//*[@id="input-quantity"]')
 
     def __init__(self, driver):
         self.driver = driver
         super(DetailsPage, self).__init__(self.driver)
 
     def _get_default_quantity(self):
-        qty = self.driver.find_element_by_xpath(self.INPUT_QUANTITY_DETAILS_PAGE_XPATH)
-        return qty.get_attribute('value')
+        return self._on_element(self.INPUT_QUANTITY_DETAILS_PAGE_XPATH, lambda elem: elem.get_attribute('value'))
 
     def _fill_qty_field_with_given_amount(self, value):
         self._insert_text_to_enabled_element(self.SET_QTY_XPATH, value)
 
+    def _add_to_cart(self):
+        self._click_and_wait_for_cart_update(self.ADD_TO_CART_XPATH)
+
 
 class ShoppingCartPage(BasicPage):
-    SUB_TOTAL_VALUE_BEFORE_SHIPPING = '/html/body/div[2]/div/div/div[2]/div/table/tbody/tr[1]/td[2]'
-    SUB_TOTAL_VALUE = '/html/body/div[2]/div[2]/div/div[2]/div/table/tbody/tr[1]/td[2]'
-    FLAT_SHIPPING_RATE_VALUE = '/html/body/div[2]/div[2]/div/div[2]/div/table/tbody/tr[2]/td[2]'
-    TOTAL_VALUE = '/html/body/div[2]/div[2]/div/div[2]/div/table/tbody/tr[3]/td[2]'
-    CHECKOUT_BUTTON_XPATH = '/html/body/div[2]/div/div/div[3]/div[2]/a'
-
-    FIRST_NAME_INPUT_XPATH = '//*[@id="input-payment-firstname"]'
-    LAST_NAME_INPUT_XPATH = '//*[@id="input-payment-lastname"]'
-    ADDRESS1_INPUT_XPATH = '//*[@id="input-payment-address-1"]'
-    CITY_INPUT_XPATH = '//*[@id="input-payment-city"]'
-    REGION_INPUT_XPATH = '//*[@id="input-payment-zone"]'
-
-    CONTINUE_BILLING_DETAILS_BUTTON_XPATH = '//*[@id="button-payment-address"]'
-    SHOPPING_BUTTON_XPATH = '//*[@id="button-shipping-address"]'
-    SHOPPING_METHOD_BUTTON_XPATH = '//*[@id="button-shipping-method"]'
-    PAYMENT_BUTTON_XPATH = '//*[@id="button-payment-method"]'
-    TERM_AND_CONDITIONS_BUTTON_XPATH = '/html/body/div[2]/div/div/div/div[5]/div[2]/div/div[2]/div/input[1]'
-    CONFIRM_ORDER_XPATH = '//*[@id="button-confirm"]'
-
-    ALERT_FROM_CHECKOUT_PAGE_XPATH = '/html/body/div[2]/div[1]'
-    SECOND_ALERT_FROM_CHECKOUT_PAGE = '/html/body/div[2]/div[2]'
-    CLOSE_MESSAGE_XPATH = '/html/body/div[2]/div[1]/button'
-
-    SUCCESS_CHECKOUT_XPATH = '/html/body/div[2]/ul/li[4]/a'
-    BUY_MESSAGE_XPATH = '/html/body/div[2]/div/div/h1'
-    VALIDATION_MESSAGE_XPATH = '/html/body/div[2]/div/div/p'
-    UPDATE_BUTTON_XPATH = '/html/body/div[2]/div/div/form/div/table/tbody/tr/td[4]/div/span/button[1]'
-
-    ESTIMATE_SHOPPING_AND_TAXES_XPATH = '/html/body/div[2]/div/div/div[1]/div[2]/div[1]/h4/a'
-    REGION_FROM_TAXES_FORM_XPATH = '//*[@id="input-zone"]'
-    FLAT_RATE_XPATH = '/html/body/div[3]/div/div/div[2]/div/label/input'
-    SHIPPING_METHOD_XPATH = '/html/body/div[3]/div/div/div[2]/div/label'
-    GET_QUOTES_BUTTON_XPATH = '//*[@id="button-quote"]'
-    APPLY_SHOPPING_BUTTON_XPATH = '//*[@id="button-shipping"]'
-    SET_QTY_FROM_SHOPPING_PAGE = '/html/body/div[2]/div/div/form/div/table/tbody/tr[1]/td[4]/div/input'
+    SUB_TOTAL_VALUE_BEFORE_SHIPPING = XPath('/html/body/div[2]/div/div/div[2]/div/table/tbody/tr[1]/td[2]')
+    SUB_TOTAL_VALUE = XPath('/html/body/div[2]/div[2]/div/div[2]/div/table/tbody/tr[1]/td[2]')
+    FLAT_SHIPPING_RATE_VALUE = XPath('/html/body/div[2]/div[2]/div/div[2]/div/table/tbody/tr[2]/td[2]')
+    TOTAL_VALUE = XPath('/html/body/div[2]/div[2]/div/div[2]/div/table/tbody/tr[3]/td[2]')
+    CHECKOUT_BUTTON_XPATH = XPath('/html/body/div[2]/div/div/div[3]/div[2]/a')
+
+    FIRST_NAME_INPUT_XPATH = XPath('//*[@id="input-payment-firstname"]')
+    LAST_NAME_INPUT_XPATH = XPath('//*[@id="input-payment-lastname"]')
+    ADDRESS1_INPUT_XPATH = XPath('//*[@id="input-payment-address-1"]')
+    CITY_INPUT_XPATH = XPath('//*[@id="input-payment-city"]')
+    REGION_INPUT_XPATH = XPath('//*[@id="input-payment-zone"]')
+
+    CONTINUE_BILLING_DETAILS_BUTTON_XPATH = XPath('//*[@id="button-payment-address"]')
+    SHOPPING_BUTTON_XPATH = XPath('//*[@id="button-shipping-address"]')
+    SHOPPING_METHOD_BUTTON_XPATH = XPath('//*[@id="button-shipping-method"]')
+    PAYMENT_BUTTON_XPATH = XPath('//*[@id="button-payment-method"]')
+    TERM_AND_CONDITIONS_BUTTON_XPATH = XPath('/html/body/div[2]/div/div/div/div[5]/div[2]/div/div[2]/div/input[1]')
+    CONFIRM_ORDER_XPATH = XPath('//*[@id="button-confirm"]')
+
+    ALERT_FROM_CHECKOUT_PAGE_XPATH = XPath('/html/body/div[2]/div[1]')
+    SECOND_ALERT_FROM_CHECKOUT_PAGE = XPath('/html/body/div[2]/div[2]')
+    CLOSE_MESSAGE_XPATH = XPath('/html/body/div[2]/div[1]/button')
+
+    SUCCESS_CHECKOUT_XPATH = XPath('/html/body/div[2]/ul/li[4]/a')
+    BUY_MESSAGE_XPATH = XPath('/html/body/div[2]/div/div/h1')
+    VALIDATION_MESSAGE_XPATH = XPath('/html/body/div[2]/div/div/p')
+    UPDATE_BUTTON_XPATH = XPath('/html/body/div[2]/div/div/form/div/table/tbody/tr/td[4]/div/span/button[1]')
+
+    ESTIMATE_SHOPPING_AND_TAXES_XPATH = XPath('/html/body/div[2]/div/div/div[1]/div[2]/div[1]/h4/a')
+    REGION_FROM_TAXES_FORM_XPATH = XPath('//*[@id="input-zone"]')
+    FLAT_RATE_XPATH = XPath('/html/body/div[3]/div/div/div[2]/div/label/input')
+    SHIPPING_METHOD_XPATH = XPath('/html/body/div[3]/div/div/div[2]/div/label')
+    GET_QUOTES_BUTTON_XPATH = XPath('//*[@id="button-quote"]')
+    APPLY_SHOPPING_BUTTON_XPATH = XPath('//*[@id="button-shipping"]')
+    SET_QTY_FROM_SHOPPING_PAGE = XPath('/html/body/div[2]/div/div/form/div/table/tbody/tr[1]/td[4]/div/input')
 
     def __init__(self, driver):
         self.driver = driver
@@ -247,7 +455,7 @@ class ShoppingCartPage(BasicPage):
             taxes = self._get_text_from_enabled_element(self.SUB_TOTAL_VALUE_BEFORE_SHIPPING)
         except AttributeError:
             taxes = self._get_text_from_enabled_element(self.SUB_TOTAL_VALUE)
-        return re.search("(?<=\$)(.*)", taxes).group()
+        return self._extract_price(taxes)
 
     def _get_first_alert_message(self):
         cart_string = self._get_text_from_enabled_element(self.ALERT_FROM_CHECKOUT_PAGE_XPATH)
@@ -259,33 +467,39 @@ class ShoppingCartPage(BasicPage):
 
     def _get_taxes(self):
         taxes = self._get_text_from_enabled_element(self.SHIPPING_METHOD_XPATH)
-        return re.search("(?<=\$)(.*)", taxes).group()
+        return self._extract_price(taxes)
 
     def _fill_qty_field_with_given_amount(self, value):
         self._insert_text_to_enabled_element(self.SET_QTY_FROM_SHOPPING_PAGE, value)
 
-    def _select_region_from_taxes_form(self):
-        region = Select(self._get_element_from_enabled_element(self.REGION_FROM_TAXES_FORM_XPATH))
-        region.select_by_value('2632')
+    def _select_region_from_taxes_form(self, region='2632'):
+        """
+        :param region: type: str, zone id, eg. 2632
+        """
+        select = Select(self._get_element_from_enabled_element(self.REGION_FROM_TAXES_FORM_XPATH))
+        select.select_by_value(region)
 
     def _calculated_sub_total_price_with_flat_shipping_rate(self):
-        from time import sleep
-        sleep(5)
-        taxes = self._get_text_from_enabled_element(self.SUB_TOTAL_VALUE)
-        sub_total = re.search("(?<=\$)(.*)", taxes).group()
-        sub_total_price = self._convert_price_to_float(sub_total)
-
-        taxes = self._get_text_from_enabled_element(self.FLAT_SHIPPING_RATE_VALUE)
-        rate_price = re.search("(?<=\$)(.*)", taxes).group()
-        rate_price = self._convert_price_to_float(rate_price)
-        total_price = sub_total_price + rate_price
-        return total_price
+        """
+        :return: type: int, sub-total plus flat shipping rate in cents
+        """
+        self._wait_for_page_to_settle()
+        self._wait_for_text_to_settle(self.TOTAL_VALUE)
+        elements = self._read_elements({'sub_total': self.SUB_TOTAL_VALUE, 'rate': self.FLAT_SHIPPING_RATE_VALUE})
+        return sum(price_checks.to_cents_array([elements['sub_total']['text'], elements['rate']['text']]))
+
+    def _get_cart_snapshot(self):
+        """
+        Read all cart lines, totals and cart button with one script call.
+        :return: type: price_checks.CartSnapshot
+        """
+        self._wait_for_page_to_settle()
+        return price_checks.parse_cart(self.driver.execute_script(price_checks.READ_CART_JS))
 
     def _fill_checkout_form(self):
         first_name = self._get_element_from_enabled_element(self.FIRST_NAME_INPUT_XPATH)
         first_name.send_keys('Jan')
-        import time
-        time.sleep(5)
+        self._wait_for_page_to_settle()
         last_name = self._get_element_from_enabled_element(self.LAST_NAME_INPUT_XPATH)
         last_name.send_keys('Kowalski')
         adress1 = self._get_element_from_enabled_element(self.ADDRESS1_INPUT_XPATH)
@@ -0,0 +1,172 @@
+"""
+Module runs tests in parallel worker processes, every worker leases browser sessions from its own pool
+
+Failed tests are run once more, a test passing on rerun is reported as FLAKY. Tests flaking repeatedly
+are quarantined in settings.QUARANTINE_FILE and run in a separate pass which does not fail the run.
+
+Usage: python parallel_runner.py -n 4 test_order_product
+       python parallel_runner.py -n 4 --impact-base HEAD test_order_product
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import sys
+import time
+import unittest
+from multiprocessing.util import Finalize
+
+import driver_pool
+import flakiness
+import impact
+import local_shop
+import settings
+from browser_profile import LaunchProfile
+
+
+def iter_test_ids(suite):
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            yield from iter_test_ids(test)
+        else:
+            yield test.id()
+
+
+def _init_worker():
+    pool = driver_pool.get_pool()
+    # atexit handlers are not called in pool workers, finalizers are
+    Finalize(pool, pool.close, exitpriority=10)
+
+
+def run_single_test(test_id):
+    """
+    Run one test in current worker.
+    :param test_id: type: str, eg. test_order_product.TestOrderProduct.test_buying_process
+    :return: type: tuple (test_id, status, details, duration)
+    """
+    suite = unittest.defaultTestLoader.loadTestsFromName(test_id)
+    stream = io.StringIO()
+    start = time.perf_counter()
+    result = unittest.TextTestRunner(stream=stream, verbosity=0).run(suite)
+    duration = time.perf_counter() - start
+    if result.errors:
+        status, details = 'ERROR', result.errors[0][1]
+    elif result.failures:
+        status, details = 'FAIL', result.failures[0][1]
+    elif result.skipped:
+        status, details = 'skipped', result.skipped[0][1]
+    else:
+        status, details = 'ok', ''
+    return test_id, status, details, duration
+
+
+def run_parallel(test_ids, workers):
+    """
+    Spread tests across `workers` processes.
+    :return: type: list of run_single_test results in completion order
+    """
+    results = []
+    with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+        for result in pool.imap_unordered(run_single_test, test_ids):
+            test_id, status, _, duration = result
+            print('{} ... {} ({:.1f}s)'.format(test_id, status, duration), flush=True)
+            results.append(result)
+        pool.close()
+        pool.join()
+    return results
+
+
+def rerun_failures(results, workers, reruns=1):
+    """
+    Run failed tests again, a test passing on rerun is reported as FLAKY with details of its failure.
+    :return: type: list of run_single_test results
+    """
+    for _ in range(reruns):
+        failed = [result[0] for result in results if result[1] in ('FAIL', 'ERROR')]
+        if not failed:
+            break
+        print('Rerunning {} failed tests'.format(len(failed)), flush=True)
+        rerun = {result[0]: result for result in run_parallel(failed, min(workers, len(failed)))}
+        results = [(result[0], 'FLAKY', result[2], result[3]) if rerun.get(result[0], (None, ''))[1] == 'ok'
+                   else rerun.get(result[0], result) for result in results]
+    return results
+
+
+def record_outcomes(quarantine, results):
+    """
+    :return: type: tuple (newly quarantined test ids, released test ids)
+    """
+    before = set(quarantine.quarantined)
+    outcomes = {'ok': 'pass', 'FLAKY': 'flaky', 'FAIL': 'fail', 'ERROR': 'fail'}
+    for test_id, status, _, _ in results:
+        if status in outcomes:
+            quarantine.record(test_id, outcomes[status])
+    after = set(quarantine.quarantined)
+    return sorted(after - before), sorted(before - after)
+
+
+def print_summary(results, duration):
+    for test_id, status, details, _ in results:
+        if status in ('FAIL', 'ERROR'):
+            print('=' * 70)
+            print('{}: {}'.format(status, test_id))
+            print('-' * 70)
+            print(details)
+    flaky = [test_id for test_id, status, _, _ in results if status == 'FLAKY']
+    if flaky:
+        print('=' * 70)
+        print('FLAKY, passed on rerun:\n  ' + '\n  '.join(flaky))
+    print('-' * 70)
+    print('Ran {} tests in {:.1f}s'.format(len(results), duration))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', '--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--impact-base', metavar='REF',
+                        help='run only tests affected by pages.py changes since REF, see impact.py')
+    parser.add_argument('--timings', default=settings.TIMINGS_LOG, help='timings log of an earlier run')
+    parser.add_argument('--reruns', type=int, default=1, help='runs of failed tests telling flaky ones apart')
+    parser.add_argument('--quarantine', default=settings.QUARANTINE_FILE,
+                        help='flaky test quarantine file, empty runs all tests in the main pass')
+    parser.add_argument('names', nargs='*', default=['test_order_product'])
+    args = parser.parse_args(argv)
+
+    suite = unittest.defaultTestLoader.loadTestsFromNames(args.names)
+    test_ids = list(iter_test_ids(suite))
+    if args.impact_base:
+        modules = [sys.modules[name.split('.')[0]] for name in args.names]
+        all_tests = len(test_ids)
+        test_ids, reason = impact.select(test_ids, args.timings, args.impact_base, modules)
+        print('Selected {} of {} tests, {}'.format(len(test_ids), all_tests, reason))
+    start = time.perf_counter()
+    # one stand-in shop for all workers, they inherit its url
+    settings.APP_URL = os.environ['SHOP_URL'] = local_shop.resolve_app_url(settings.APP_URL)
+    if settings.BROWSER_PROFILE_DIR:
+        # create shared profile before workers start copying it
+        LaunchProfile.from_settings().prewarm()
+    quarantine = flakiness.Quarantine(args.quarantine) if args.quarantine else None
+    quarantined = [test_id for test_id in test_ids if quarantine and quarantine.is_quarantined(test_id)]
+    main_ids = [test_id for test_id in test_ids if test_id not in quarantined]
+    results = rerun_failures(run_parallel(main_ids, args.workers), args.workers, args.reruns)
+    print_summary(results, time.perf_counter() - start)
+    quarantine_results = []
+    if quarantined:
+        print('Quarantine pass, {} tests'.format(len(quarantined)), flush=True)
+        quarantine_results = rerun_failures(run_parallel(quarantined, args.workers), args.workers, args.reruns)
+        for test_id, status, _, _ in quarantine_results:
+            print('  {} ... {} (quarantined)'.format(test_id, status))
+    if quarantine:
+        added, released = record_outcomes(quarantine, results + quarantine_results)
+        quarantine.save()
+        for test_id in added:
+            print('Quarantined {}'.format(test_id))
+        for test_id in released:
+            print('Released from quarantine {}'.format(test_id))
+    failed = [r for r in results if r[1] in ('FAIL', 'ERROR')]
+    print('FAILED (failures={})'.format(len(failed)) if failed else 'OK')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Module represents exact price parsing and cart consistency checks
+
+Prices are parsed to integer cents, sums of them are exact unlike sums of floats. The shopping cart page
+is read with one script call into a CartSnapshot of cents arrays and all invariants are checked
+in one pass over it:
+    quantity x unit price == line total, for every line
+    sum of line totals == Sub-Total
+    sum of totals above Total (Sub-Total, Flat Shipping Rate, taxes) == Total
+    cart button == Total and number of items on the cart page
+    unit price == price listed in catalog, when listing is given
+"""
+import re
+from array import array
+from collections import OrderedDict, namedtuple
+
+# price after a dollar sign or a bare price string, eg. "2 item(s) - $1,250.00" or "1,250.00",
+# discounts are negative with the minus before or after the dollar sign, eg. "-$5.00", "$-5.00" or "-5.00"
+PRICE_PATTERN = re.compile(r'(?:^(-)?|(-)?\$(-)?)(\d[\d,]*)\.(\d{2})\b')
+ITEMS_PATTERN = re.compile(r'^(\d+) item')
+SUB_TOTAL = 'Sub-Total'
+TOTAL = 'Total'
+
+READ_CART_JS = """
+var lines = [], totals = [];
+var rows = document.querySelectorAll('#content form table tbody tr');
+for (var i = 0; i < rows.length; i++) {
+    var cells = rows[i].cells, quantity = rows[i].querySelector('input[name^="quantity"]');
+    lines.push([cells[1].innerText.trim(), quantity ? quantity.value : cells[3].innerText.trim(),
+                cells[4].innerText.trim(), cells[5].innerText.trim()]);
+}
+var totalRows = document.querySelectorAll('#content .col-sm-4 table tr');
+for (var j = 0; j < totalRows.length; j++) {
+    totals.push([totalRows[j].cells[0].innerText.trim().replace(/:$/, ''), totalRows[j].cells[1].innerText.trim()]);
+}
+var widget = document.getElementById('cart-total');
+return {lines: lines, totals: totals, widget: widget ? widget.innerText.trim() : ''};
+"""
+
+CartSnapshot = namedtuple('CartSnapshot', ['names', 'quantities', 'unit_prices', 'line_totals', 'totals',
+                                           'widget_quantity', 'widget_total'])
+
+
+def to_cents(text):
+    """
+    Convert price string to integer cents, eg. "$10,000,000.00" will be converted to 1000000000
+    :param text: type: str
+    """
+    match = PRICE_PATTERN.search(text.strip())
+    if match is None:
+        raise ValueError('No price in {!r}'.format(text))
+    cents = int(match.group(4).replace(',', '')) * 100 + int(match.group(5))
+    return -cents if '-' in match.group(1, 2, 3) else cents
+
+
+def to_cents_array(texts):
+    """
+    :param texts: type: iterable of price strings
+    :return: type: array of int64 cents
+    """
+    return array('q', map(to_cents, texts))
+
+
+def format_cents(cents):
+    """
+    :return: type: str, eg. 1,250.00 for 125000 and -5.00 for -500
+    """
+    sign = '-' if cents < 0 else ''
+    return '{}{:,}.{:02d}'.format(sign, abs(cents) // 100, abs(cents) % 100)
+
+
+def parse_cart(page):
+    """
+    :param page: type: dict returned by READ_CART_JS
+    :return: type: CartSnapshot
+    """
+    lines = page['lines']
+    items = ITEMS_PATTERN.match(page['widget'])
+    return CartSnapshot(names=[line[0] for line in lines],
+                        quantities=array('q', (int(line[1]) for line in lines)),
+                        unit_prices=to_cents_array(line[2] for line in lines),
+                        line_totals=to_cents_array(line[3] for line in lines),
+                        totals=OrderedDict((title, to_cents(value)) for title, value in page['totals']),
+                        widget_quantity=int(items.group(1)) if items else None,
+                        widget_total=to_cents(page['widget']) if PRICE_PATTERN.search(page['widget']) else None)
+
+
+def listed_prices(products):
+    """
+    :param products: type: iterable of catalog.Product
+    :return: type: dict, product name -> cents
+    """
+    return {product.name: to_cents(product.price) for product in products}
+
+
+def check_cart(snapshot, listed=None):
+    """
+    :param listed: type: dict, product name -> listed cents, see listed_prices
+    :return: type: list of str, violated invariants, empty when cart is consistent
+    """
+    violations = []
+    quantity_sum = line_sum = 0
+    for name, quantity, unit_price, line_total in zip(snapshot.names, snapshot.quantities, snapshot.unit_prices,
+                                                      snapshot.line_totals):
+        if quantity * unit_price != line_total:
+            violations.append('{}: {} x {} != {}'.format(name, quantity, format_cents(unit_price),
+                                                         format_cents(line_total)))
+        if listed is not None and name in listed and listed[name] != unit_price:
+            violations.append('{}: unit price {} != listed {}'.format(name, format_cents(unit_price),
+                                                                      format_cents(listed[name])))
+        quantity_sum += quantity
+        line_sum += line_total
+
+    totals = snapshot.totals
+    if SUB_TOTAL in totals and totals[SUB_TOTAL] != line_sum:
+        violations.append('{} {} != sum of lines {}'.format(SUB_TOTAL, format_cents(totals[SUB_TOTAL]),
+                                                            format_cents(line_sum)))
+    if TOTAL in totals:
+        expected = sum(value for title, value in totals.items() if title != TOTAL)
+        if totals[TOTAL] != expected:
+            violations.append('{} {} != {} {}'.format(TOTAL, format_cents(totals[TOTAL]),
+                                                      ' + '.join(title for title in totals if title != TOTAL),
+                                                      format_cents(expected)))
+        if snapshot.widget_total is not None and snapshot.widget_total != totals[TOTAL]:
+            violations.append('cart button {} != {} {}'.format(format_cents(snapshot.widget_total), TOTAL,
+                                                               format_cents(totals[TOTAL])))
+    if snapshot.widget_quantity is not None and snapshot.widget_quantity != quantity_sum:
+        violations.append('cart button {} item(s) != {} on cart page'.format(snapshot.widget_quantity,
+                                                                           quantity_sum))
+    return violations
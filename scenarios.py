@@ -0,0 +1,212 @@
+"""
+Module represents data-driven scenarios expanded from parameter matrices into separate test methods
+
+    @scenarios.expand
+    class TestOrderProduct(unittest.TestCase):
+        @scenarios.scenario(scenarios.Matrix(product=['1', '2'], region=['2632', '2641']))
+        def test_estimate_shipping_and_taxes(self, product, region):
+            ...
+
+gives test_estimate_shipping_and_taxes__product_1__region_2632 and so on, every cell reports separately
+and can be run by another parallel_runner worker. Cells which passed are remembered in
+settings.SCENARIO_CACHE_DIR and skipped until the test module, page objects, locators, waits, settings or shop change.
+"""
+import functools
+import hashlib
+import inspect
+import itertools
+import json
+import os
+import re
+import tempfile
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit
+
+import settings
+
+
+class Matrix:
+    def __init__(self, **axes):
+        """
+        :param axes: type: name -> iterable of values, cells are all combinations of values
+        """
+        self.axes = OrderedDict((name, tuple(values)) for name, values in axes.items())
+        self._filters = ()
+
+    def where(self, predicate):
+        """
+        :param predicate: type: callable taking cell values as keyword arguments, False drops the cell
+        :return: type: Matrix, filtered copy
+        """
+        matrix = Matrix(**self.axes)
+        matrix._filters = self._filters + (predicate,)
+        return matrix
+
+    def __iter__(self):
+        names = list(self.axes)
+        for values in itertools.product(*self.axes.values()):
+            cell = OrderedDict(zip(names, values))
+            if all(predicate(**cell) for predicate in self._filters):
+                yield cell
+
+
+def cell_name(cell):
+    """
+    :return: type: str, eg. product_1__region_2632
+    """
+    return '__'.join('{}_{}'.format(name, re.sub(r'\W+', '_', str(value))) for name, value in cell.items())
+
+
+def scenario(matrix):
+    """
+    Mark test method taking cell values as keyword arguments, see expand.
+    """
+    def decorate(function):
+        function.scenario_matrix = matrix
+        return function
+    return decorate
+
+
+class _ScenarioClass(type):
+    """
+    Metaclass of expanded TestCase classes, adds cell methods when the class is first listed, looked up
+    for a missing attribute or instantiated, eg. by unittest loader or pytest collection.
+    """
+
+    def __dir__(cls):
+        _expand_cells(cls)
+        return super(_ScenarioClass, cls).__dir__()
+
+    def __getattr__(cls, name):
+        # only called for missing attributes, eg. a cell loaded by name
+        if not _expand_cells(cls):
+            raise AttributeError(name)
+        return getattr(cls, name)
+
+    def __call__(cls, *args, **kwargs):
+        _expand_cells(cls)
+        return super(_ScenarioClass, cls).__call__(*args, **kwargs)
+
+
+def _expand_cells(cls):
+    """
+    :return: type: bool, True when cell methods were added now
+    """
+    expanded = False
+    for klass in cls.__mro__:
+        scenarios = vars(klass).get('_pending_scenarios')
+        while scenarios:
+            name, function = scenarios.popitem()
+            for cell in function.scenario_matrix:
+                case_name = '{}__{}'.format(name, cell_name(cell))
+                setattr(klass, case_name, _make_case(function, cell, case_name))
+            expanded = True
+    return expanded
+
+
+def expand(cls):
+    """
+    Replace every scenario method of TestCase class with one test method per matrix cell.
+    Matrices are iterated only when tests are collected, not when the module is imported.
+    """
+    namespace = {name: value for name, value in vars(cls).items() if name not in ('__dict__', '__weakref__')}
+    namespace['_pending_scenarios'] = OrderedDict(
+        (name, namespace.pop(name)) for name, function in list(namespace.items())
+        if getattr(function, 'scenario_matrix', None) is not None)
+    return _ScenarioClass(cls.__name__, cls.__bases__, namespace)
+
+
+def _make_case(function, cell, case_name):
+    @functools.wraps(function)
+    def case(self):
+        cache = get_result_cache()
+        if cache is not None:
+            verified = cache.get(self.id(), function, cell)
+            if verified is not None:
+                self.skipTest('verified {}'.format(time.strftime('%Y-%m-%d %H:%M', time.localtime(verified))))
+        function(self, **cell)
+        if cache is not None:
+            cache.put(self.id(), function, cell)
+
+    case.__name__ = case.__qualname__ = case_name
+    case.__doc__ = '{}\n{}'.format((function.__doc__ or '').rstrip(),
+                                   ', '.join('{}={}'.format(name, value) for name, value in cell.items()))
+    return case
+
+
+def normalize_target(app_url):
+    """
+    Drop the port of shop url, eg. random port of local stand-in shop, so results carry over between runs.
+    """
+    parts = urlsplit(app_url)
+    if not parts.port:
+        return app_url
+    return urlunsplit(parts._replace(netloc=parts.netloc.rpartition(':')[0]))
+
+
+class ResultCache:
+    """
+    One file per passed cell, valid as long as fingerprint of scenario and its dependencies did not change.
+    Separate files let parallel workers record results without sharing a file.
+    """
+
+    def __init__(self, directory, dependencies=(), target=''):
+        """
+        :param dependencies: type: iterable of modules, eg. pages, changing their source invalidates results
+        :param target: type: str, shop the results were verified against
+        """
+        self.directory = directory
+        self.target = normalize_target(target)
+        self._dependencies = hashlib.sha1(''.join(inspect.getsource(module)
+                                                  for module in dependencies).encode('utf-8')).hexdigest()
+        self._modules = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def fingerprint(self, function, cell):
+        """
+        Hash of the whole test module, with its scenario data and helpers, dependencies, shop and cell values.
+        """
+        module = inspect.getmodule(function)
+        if module not in self._modules:
+            self._modules[module] = inspect.getsource(module)
+        source = '\n'.join([self._modules[module], function.__qualname__, self._dependencies, self.target,
+                            repr(list(cell.items()))])
+        return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+    def _path(self, test_id):
+        return os.path.join(self.directory, hashlib.sha1(test_id.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, test_id, function, cell):
+        """
+        :return: type: float, time the cell passed with current fingerprint, None when not verified
+        """
+        try:
+            with open(self._path(test_id)) as result_file:
+                result = json.load(result_file)
+        except (FileNotFoundError, ValueError):
+            return None
+        return result['passed'] if result['fingerprint'] == self.fingerprint(function, cell) else None
+
+    def put(self, test_id, function, cell):
+        result = {'test': test_id, 'fingerprint': self.fingerprint(function, cell), 'passed': time.time()}
+        with tempfile.NamedTemporaryFile('w', dir=self.directory, delete=False, suffix='.tmp') as result_file:
+            json.dump(result, result_file)
+        os.replace(result_file.name, self._path(test_id))
+
+
+_result_cache = None
+
+
+def get_result_cache():
+    """
+    Return result cache of current process, None when settings.SCENARIO_CACHE_DIR is not set.
+    """
+    global _result_cache
+    if _result_cache is None and settings.SCENARIO_CACHE_DIR:
+        import locators
+        import pages
+        import waits
+        _result_cache = ResultCache(settings.SCENARIO_CACHE_DIR, [pages, locators, waits, settings],
+                                    settings.APP_URL)
+    return _result_cache
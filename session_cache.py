@@ -0,0 +1,161 @@
+"""
+Module represents cache of logged-in customer sessions
+
+Every worker process registers its own customer once, later browser sessions get its cookies and local storage
+restored instead of going through registration again. Entries expire after settings.SESSION_TTL seconds or
+when the shop no longer accepts the session, then the customer logs in again (or is registered again when
+the shop does not know the account any more).
+"""
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from urllib.parse import urljoin
+
+import settings
+from shop_api import ShopClient
+
+COOKIE_FIELDS = ('name', 'value', 'path', 'secure', 'httpOnly', 'expiry')
+
+_READ_LOCAL_STORAGE_JS = """
+var items = {};
+for (var i = 0; i < window.localStorage.length; i++) {
+    var key = window.localStorage.key(i);
+    items[key] = window.localStorage.getItem(key);
+}
+return items;
+"""
+
+_WRITE_LOCAL_STORAGE_JS = """
+window.localStorage.clear();
+for (var key in arguments[0]) {
+    window.localStorage.setItem(key, arguments[0][key]);
+}
+"""
+
+
+def snapshot(driver, credentials, ttl):
+    """
+    :param credentials: type: dict, {'email': ..., 'password': ...}
+    :return: type: dict, JSON serializable cache entry
+    """
+    cookies = [{name: value for name, value in cookie.items() if name in COOKIE_FIELDS}
+               for cookie in driver.get_cookies()]
+    expires = time.time() + ttl
+    for cookie in cookies:
+        if 'expiry' in cookie:
+            expires = min(expires, cookie['expiry'])
+    return {'credentials': credentials,
+            'cookies': cookies,
+            'local_storage': driver.execute_script(_READ_LOCAL_STORAGE_JS),
+            'expires': expires}
+
+
+def restore(driver, entry):
+    """
+    Replace cookies and local storage of the shop page open in driver, page has to be reloaded afterwards.
+    """
+    driver.delete_all_cookies()
+    for cookie in entry['cookies']:
+        driver.add_cookie(cookie)
+    driver.execute_script(_WRITE_LOCAL_STORAGE_JS, entry['local_storage'])
+
+
+class SessionCache:
+    def __init__(self, path=None, ttl=1800):
+        """
+        :param path: type: str, JSON file entries are shared through between runs, None keeps them in memory
+        :param ttl: type: int, seconds an entry is valid
+        """
+        self.path = path
+        self.ttl = ttl
+        self._entries = self._load()
+
+    def _load(self):
+        if not self.path:
+            return {}
+        try:
+            with open(self.path) as cache_file:
+                entries = json.load(cache_file)
+        except (FileNotFoundError, ValueError):
+            return {}
+        return entries
+
+    def _save(self, key, entry):
+        """
+        Write one entry (None removes it) merged into current file content, other workers may use the file too.
+        """
+        if not self.path:
+            return
+        entries = {key: entry for key, entry in self._load().items() if entry['expires'] > time.time()}
+        if entry is None:
+            entries.pop(key, None)
+        else:
+            entries[key] = entry
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.NamedTemporaryFile('w', dir=directory, delete=False, suffix='.tmp') as cache_file:
+            json.dump(entries, cache_file)
+        os.replace(cache_file.name, self.path)
+
+    def get(self, key):
+        """
+        :return: type: dict, entry or None when missing or expired, expired entry is evicted
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry['expires'] <= time.time():
+            self.evict(key)
+            return None
+        return entry
+
+    def put(self, key, entry):
+        self._entries[key] = entry
+        self._save(key, entry)
+
+    def evict(self, key):
+        self._entries.pop(key, None)
+        self._save(key, None)
+
+    @staticmethod
+    def key_for(driver):
+        """
+        One customer per run, worker process and shop, parallel workers never share a customer (and its cart).
+        Worker names repeat in every run, eg. MainProcess, so the run id keeps concurrent runs apart.
+        """
+        run_id = settings.RUN_ID or os.getpid()
+        return '{}/{}@{}'.format(run_id, multiprocessing.current_process().name, urljoin(driver.current_url, '.'))
+
+    def log_in(self, page):
+        """
+        Log in the customer of current worker with page object, restoring cached session when possible.
+        :param page: type: pages.BasicPage
+        :return: type: dict, credentials {'email': ..., 'password': ...}
+        """
+        key = self.key_for(page.driver)
+        # credentials of expired entry are still good for logging in again
+        stale = self._entries.get(key)
+        entry = self.get(key)
+        if entry is not None:
+            restore(page.driver, entry)
+            page._refresh()
+            if ShopClient.from_driver(page.driver).is_logged_in():
+                return entry['credentials']
+            self.evict(key)
+        credentials = stale['credentials'] if stale else None
+        if credentials is None or not page._login_user(**credentials):
+            credentials = page._register_user()
+        self.put(key, snapshot(page.driver, credentials, self.ttl))
+        return credentials
+
+
+_cache = None
+
+
+def get_session_cache():
+    """
+    Return cache of current process configured by settings.SESSION_CACHE and settings.SESSION_TTL.
+    """
+    global _cache
+    if _cache is None:
+        _cache = SessionCache(settings.SESSION_CACHE, settings.SESSION_TTL)
+    return _cache
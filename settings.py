@@ -0,0 +1,54 @@
+"""
+Module represents run configuration shared by tests and tools
+"""
+import os
+
+
+def _flag(name, default):
+    return os.environ.get(name, default).lower() in ('1', 'true', 'yes')
+
+
+# "local" starts the in-memory stand-in shop from local_shop.py
+APP_URL = os.environ.get('SHOP_URL', 'PATH_TO_APP')
+
+DRIVER_POOL_SIZE = int(os.environ.get('DRIVER_POOL_SIZE', '1'))
+# host:port of browser_daemon.py handing out warm browser sessions, tests start their own browsers when not set
+BROWSER_DAEMON = os.environ.get('BROWSER_DAEMON')
+
+# cookie, http or ui, see BasicPage._clean_cart
+CART_RESET_MODE = os.environ.get('CART_RESET_MODE', 'cookie')
+
+HEADLESS = _flag('HEADLESS', '0')
+LOAD_IMAGES = _flag('LOAD_IMAGES', '1')
+DISABLE_EXTENSIONS = _flag('DISABLE_EXTENSIONS', '1')
+DISABLE_BACKGROUND_SERVICES = _flag('DISABLE_BACKGROUND_SERVICES', '1')
+# pre-warmed Firefox profile reused between runs, created on first use
+BROWSER_PROFILE_DIR = os.environ.get('BROWSER_PROFILE_DIR')
+GECKODRIVER_LOG = os.environ.get('GECKODRIVER_LOG', 'geckodriver.log')
+
+# JSON lines file page-object step timings are appended to, timing is disabled when not set
+TIMINGS_LOG = os.environ.get('TIMINGS_LOG')
+
+# JSON file logged-in customer sessions are kept in between runs, kept only in memory when not set
+SESSION_CACHE = os.environ.get('SESSION_CACHE')
+# seconds a cached session is reused before the customer logs in again
+SESSION_TTL = int(os.environ.get('SESSION_TTL', '1800'))
+# id of this run in SESSION_CACHE keys, runs sharing the file at the same time need different ids;
+# process id when not set, so sessions are then reused only within one run
+RUN_ID = os.environ.get('RUN_ID')
+
+# directory passed scenario cells are remembered in and skipped on later runs, nothing is cached when not set
+SCENARIO_CACHE_DIR = os.environ.get('SCENARIO_CACHE_DIR')
+
+# directory failed tests leave recent commands, page summaries, console lines, page source and a screenshot in,
+# empty disables it
+ARTIFACTS_DIR = os.environ.get('ARTIFACTS_DIR', 'artifacts')
+# WebDriver commands and console lines kept in memory for the artifacts of a failed test
+ARTIFACT_BUFFER_SIZE = int(os.environ.get('ARTIFACT_BUFFER_SIZE', '200'))
+
+# wait for every locator as long as it needed in earlier runs of TIMINGS_LOG, fixed 10 seconds when off
+ADAPTIVE_TIMEOUTS = _flag('ADAPTIVE_TIMEOUTS', '1')
+# retries of intercepted or not interactable clicks earned by every page-object action
+RETRY_BUDGET = float(os.environ.get('RETRY_BUDGET', '0.1'))
+# JSON file outcomes of flaky tests are kept in, quarantined tests run in a separate pass of parallel_runner
+QUARANTINE_FILE = os.environ.get('QUARANTINE_FILE', 'quarantine.json')
@@ -0,0 +1,248 @@
+"""
+Module represents HTTP client talking to the shop with the browser's session cookies
+
+All clients of a process share one pool of keep-alive connections, so state setup and checks
+sent between UI steps do not open a new connection each.
+"""
+import html
+import re
+from collections import namedtuple
+from urllib.parse import parse_qs, urljoin, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import price_checks
+
+POOL_SIZE = 10
+
+CartState = namedtuple('CartState', ['keys', 'product_ids', 'snapshot', 'warnings'])
+
+
+class ShopClient:
+    ACCOUNT_ROUTE = 'account/account'
+    CART_INFO_ROUTE = 'common/cart/info'
+    CART_EDIT_ROUTE = 'checkout/cart/edit'
+    CART_ADD_ROUTE = 'checkout/cart/add'
+    CART_ROUTE = 'checkout/cart'
+    SHIPPING_QUOTE_ROUTE = 'extension/total/shipping/quote'
+    SHIPPING_APPLY_ROUTE = 'extension/total/shipping/shipping'
+    REGISTER_ROUTE = 'account/register'
+    CHECKOUT_ROUTE = 'checkout/checkout'
+    # form posts sent by the Continue buttons of checkout steps, in order
+    CHECKOUT_STEP_ROUTES = ('checkout/payment_address/save', 'checkout/shipping_address/save',
+                            'checkout/shipping_method/save', 'checkout/payment_method/save', 'checkout/confirm')
+    CART_KEY_PATTERN = re.compile(r"cart\.remove\('(\d+)'\)")
+    PRODUCT_ID_PATTERN = re.compile(r"cart\.add\('(\d+)'")
+    # quantity field of product details page is filled with minimum quantity of the product
+    MINIMUM_QUANTITY_PATTERN = re.compile(r'name="quantity" value="(\d+)"')
+    CART_TOTAL_PATTERN = re.compile(r'<span id="cart-total">(.*?)</span>', re.S)
+    # rows of the cart page form: product id, name, cart key, quantity, unit price, line total
+    CART_LINE_PATTERN = re.compile(r'product_id=(\d+)"[^>]*>([^<]*)</a>.*?name="quantity\[(\w+)\]" value="(\d+)"'
+                                   r'.*?<td class="text-right">([^<]*)</td>\s*<td class="text-right">([^<]*)</td>',
+                                   re.S)
+    CART_TOTALS_PATTERN = re.compile(r'<strong>([^<]*):</strong></td>\s*<td class="text-right">([^<]*)</td>')
+    WARNING_PATTERN = re.compile(r'<div class="alert alert-danger[^"]*">\s*<i[^>]*>.*?</i>\s*(.*?)\s*<button', re.S)
+
+    def __init__(self, base_url, session=None, adapter=None):
+        """
+        :param base_url: type: str, shop home url, eg. https://example.com/
+        :param adapter: type: HTTPAdapter new session is mounted with, get_adapter() by default
+        """
+        self.base_url = base_url
+        if session is None:
+            adapter = adapter or get_adapter()
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+
+    @classmethod
+    def from_driver(cls, driver, base_url=None):
+        """
+        Create client sharing cookies (and so the cart) with given browser session.
+        """
+        client = cls(base_url or driver.current_url)
+        client.sync_cookies(driver)
+        return client
+
+    def sync_cookies(self, driver):
+        for cookie in driver.get_cookies():
+            self.session.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain', ''),
+                                     path=cookie.get('path', '/'))
+
+    def _url(self):
+        return urljoin(self.base_url, 'index.php')
+
+    def _get(self, route, **params):
+        response = self.session.get(self._url(), params=dict(params, route=route))
+        response.raise_for_status()
+        return response
+
+    def _post(self, route, data, **params):
+        response = self.session.post(self._url(), params=dict(params, route=route), data=data)
+        response.raise_for_status()
+        return response
+
+    @staticmethod
+    def _route(url):
+        """
+        :return: type: str, route of shop url, eg. checkout/success
+        """
+        return parse_qs(urlsplit(url or '').query).get('route', ['common/home'])[0]
+
+    def is_logged_in(self):
+        """
+        Check session with one request, account page redirects guests to the login page.
+        """
+        response = self.session.get(self._url(), params={'route': self.ACCOUNT_ROUTE}, allow_redirects=False)
+        return response.status_code == 200
+
+    def get_cart_keys(self):
+        """
+        :return: type: list of str, keys of cart items as used by cart.remove()
+        """
+        page = self._get(self.CART_INFO_ROUTE).text
+        return list(dict.fromkeys(self.CART_KEY_PATTERN.findall(page)))
+
+    def clear_cart(self):
+        """
+        Remove all cart items with one cart update setting every quantity to 0.
+        """
+        keys = self.get_cart_keys()
+        if keys:
+            self._post(self.CART_EDIT_ROUTE, {'quantity[{}]'.format(key): 0 for key in keys})
+
+    def get_cart_total(self):
+        """
+        :return: type: tuple (int quantity, int value in cents) of the cart button
+        """
+        text = html.unescape(self.CART_TOTAL_PATTERN.search(self._get(self.CART_INFO_ROUTE).text).group(1))
+        return int(re.match(r'\s*(\d+)', text).group(1)), price_checks.to_cents(text)
+
+    def get_cart(self):
+        """
+        Read the cart page as the customer sees it.
+        :return: type: CartState, lines and totals in cents and warnings, eg. minimum quantity not met
+        """
+        page = self._get(self.CART_ROUTE).text
+        header, _, content = page.partition('id="content"')
+        lines = [[html.unescape(value.strip()) for value in line] for line in self.CART_LINE_PATTERN.findall(content)]
+        widget = self.CART_TOTAL_PATTERN.search(header)
+        snapshot = price_checks.parse_cart({
+            'lines': [[name, quantity, unit_price, total] for _, name, _, quantity, unit_price, total in lines],
+            'totals': [[html.unescape(title.strip()), value]
+                       for title, value in self.CART_TOTALS_PATTERN.findall(content)],
+            'widget': html.unescape(widget.group(1)).strip() if widget else ''})
+        return CartState(keys=[line[2] for line in lines], product_ids=[line[0] for line in lines], snapshot=snapshot,
+                         warnings=[html.unescape(warning) for warning in self.WARNING_PATTERN.findall(page)])
+
+    def set_quantity(self, product_id, quantity):
+        """
+        Update quantity of a cart item as the Update button does, 0 removes the item.
+        """
+        cart = self.get_cart()
+        if product_id not in cart.product_ids:
+            raise ValueError('Product {} is not in cart'.format(product_id))
+        key = cart.keys[cart.product_ids.index(product_id)]
+        self._post(self.CART_EDIT_ROUTE, {'quantity[{}]'.format(key): quantity})
+
+    def get_shipping_quote(self, region, country='170'):
+        """
+        :return: type: dict, shipping method code -> price text, eg. {'flat.flat': '$5.00'}
+        """
+        result = self._post(self.SHIPPING_QUOTE_ROUTE, {'country_id': country, 'zone_id': region,
+                                                        'postcode': ''}).json()
+        if result.get('error'):
+            raise ValueError('Shipping quote was rejected: {}'.format(result['error']))
+        return {quote['code']: quote['text'] for method in result['shipping_method'].values()
+                for quote in method['quote'].values()}
+
+    def apply_shipping(self, code='flat.flat'):
+        """
+        Apply quoted shipping method to cart totals as the Apply Shipping button does.
+        """
+        result = self._post(self.SHIPPING_APPLY_ROUTE, {'shipping_method': code}).json()
+        if result.get('error'):
+            raise ValueError('Shipping method {} was rejected: {}'.format(code, result['error']))
+
+    def get_home_product_ids(self):
+        """
+        :return: type: list of str, product ids in order of add to cart buttons on home page
+        """
+        page = self._get('common/home').text
+        return list(dict.fromkeys(self.PRODUCT_ID_PATTERN.findall(page)))
+
+    def get_minimum_quantity(self, product_id):
+        """
+        :return: type: int, quantity the product can be ordered in at least
+        """
+        match = self.MINIMUM_QUANTITY_PATTERN.search(self._get('product/product', product_id=product_id).text)
+        return int(match.group(1)) if match else 1
+
+    def register(self, email, password, first_name='Jan', last_name='Kowalski', telephone='46652033'):
+        """
+        Post registration form, the customer stays logged in.
+        """
+        response = self._post(self.REGISTER_ROUTE, {'firstname': first_name, 'lastname': last_name, 'email': email,
+                                                    'telephone': telephone, 'password': password,
+                                                    'confirm': password, 'newsletter': '0', 'agree': '1'})
+        if self._route(response.url) != 'account/success':
+            raise ValueError('Registration of {} was rejected'.format(email))
+
+    def add_to_cart(self, product_id, quantity=1):
+        """
+        :return: type: dict, JSON answer of the shop
+        """
+        result = self._post(self.CART_ADD_ROUTE, {'product_id': product_id, 'quantity': quantity}).json()
+        if 'error' in result:
+            raise ValueError('Product {} was not added to cart: {}'.format(product_id, result['error']))
+        return result
+
+    def open_checkout(self):
+        response = self._get(self.CHECKOUT_ROUTE)
+        if self._route(response.url) != self.CHECKOUT_ROUTE:
+            raise ValueError('Checkout redirected to {}'.format(response.url))
+
+    def submit_checkout(self, first_name='Jan', last_name='Kowalski', address='Sloneczna 1', city='Wroclaw',
+                        country='170', region='2631'):
+        """
+        Send the checkout steps as _fill_checkout_form does: billing address, existing delivery address,
+        flat shipping, cash on delivery with accepted terms and order confirmation.
+        :return: type: str, url of order success page
+        """
+        forms = [{'payment_address': 'new', 'firstname': first_name, 'lastname': last_name, 'address_1': address,
+                  'city': city, 'postcode': '', 'country_id': country, 'zone_id': region},
+                 {'shipping_address': 'existing'},
+                 {'shipping_method': 'flat.flat', 'comment': ''},
+                 {'payment_method': 'cod', 'comment': '', 'agree': '1'},
+                 {}]
+        result = {}
+        for route, form in zip(self.CHECKOUT_STEP_ROUTES, forms):
+            result = self._post(route, form).json()
+            if result.get('error'):
+                raise ValueError('{} was rejected: {}'.format(route, result['error']))
+        if self._route(result.get('redirect')) != 'checkout/success':
+            raise ValueError('Order was not confirmed, redirected to {}'.format(result.get('redirect')))
+        return result['redirect']
+
+
+_adapter = None
+
+
+def get_adapter():
+    """
+    Return transport adapter shared by clients of current process, keeping up to POOL_SIZE
+    connections per host alive.
+    """
+    global _adapter
+    if _adapter is None:
+        _adapter = make_adapter(POOL_SIZE)
+    return _adapter
+
+
+def make_adapter(pool_size):
+    """
+    :param pool_size: type: int, connections kept alive per host, as many as threads using the adapter at once
+    """
+    return HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=pool_size)
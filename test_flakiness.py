@@ -0,0 +1,142 @@
+"""
+Test for adaptive timeouts, retry budget and quarantine of flaky tests
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from selenium.common.exceptions import (ElementClickInterceptedException, ElementNotInteractableException,
+                                        StaleElementReferenceException)
+
+from flakiness import LatencyHistory, Quarantine, RetryBudget, tail_lines
+from locators import Id
+from pages import BasicPage
+
+
+class FakeElement:
+    def __init__(self, errors):
+        self.errors = errors
+
+    def is_enabled(self):
+        return True
+
+    def is_displayed(self):
+        return True
+
+    def click(self):
+        if self.errors:
+            raise self.errors.pop(0)()
+
+
+class FakeDriver:
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.found = 0
+
+    def execute(self, driver_command, params=None):
+        pass
+
+    def find_element(self, by, value):
+        self.found += 1
+        return FakeElement(self.errors)
+
+
+class TestTailLines(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'timings.jsonl')
+        with open(self.path, 'w') as log:
+            log.writelines('line {}\n'.format(number) for number in range(1000))
+
+    def test_last_lines_are_read_across_blocks(self):
+        self.assertEqual(['line 997', 'line 998', 'line 999'], tail_lines(self.path, 3, block_size=7))
+
+    def test_short_file_is_read_whole(self):
+        self.assertEqual(1000, len(tail_lines(self.path, 5000)))
+
+    def test_history_learns_only_from_recent_records(self):
+        step = {'kind': 'step', 'name': 'BasicPage._find_element', 'locator': 'id=cart-total'}
+        with open(self.path, 'w') as log:
+            for ms in [50000] * 10 + [100] * 10:
+                log.write(json.dumps(dict(step, ms=ms)) + '\n')
+        self.assertEqual((30.0, 0.025), LatencyHistory().load(self.path).wait_for(Id('cart-total')))
+        self.assertEqual((10, 0.025), LatencyHistory().load(self.path, records=10).wait_for(Id('cart-total')))
+
+
+class TestLatencyHistory(unittest.TestCase):
+
+    def test_defaults_until_enough_samples(self):
+        history = LatencyHistory(min_samples=3)
+        history.observe(Id('total'), 5.0)
+        self.assertEqual((10, 0.1), history.wait_for(Id('total')))
+        self.assertEqual((10, 0.1), history.wait_for(None))
+
+    def test_slow_locator_waits_longer(self):
+        history = LatencyHistory(min_samples=3)
+        for seconds in (4.0, 4.0, 5.0):
+            history.observe(Id('total'), seconds)
+        self.assertEqual((15.0, 0.1), history.wait_for(Id('total')))
+
+
+class TestRetryBudget(unittest.TestCase):
+
+    def test_actions_earn_retries(self):
+        budget = RetryBudget(ratio=0.5, minimum=1, maximum=2)
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+        budget.deposit()
+        budget.deposit()
+        self.assertTrue(budget.withdraw())
+        self.assertEqual((2, 1), (budget.retries, budget.denied))
+
+
+class TestOnElement(unittest.TestCase):
+
+    def click(self, errors, budget=None):
+        page = BasicPage(FakeDriver(errors))
+        page._retry_budget = budget or RetryBudget(minimum=0)
+        with mock.patch.object(page, '_wait_for_page_to_settle') as settle:
+            page._click_enabled_element(Id('button-cart'))
+        return page, settle
+
+    def test_stale_handle_is_found_again_without_budget(self):
+        page, settle = self.click([StaleElementReferenceException, StaleElementReferenceException])
+        self.assertEqual(3, page.driver.found)
+        self.assertEqual(0, page._retry_budget.retries)
+        settle.assert_not_called()
+
+    def test_stale_lookups_are_limited(self):
+        with self.assertRaises(StaleElementReferenceException):
+            self.click([StaleElementReferenceException] * 3)
+
+    def test_intercepted_and_not_interactable_clicks_are_charged(self):
+        page, settle = self.click([ElementClickInterceptedException, ElementNotInteractableException],
+                                  RetryBudget(minimum=2))
+        self.assertEqual(2, page._retry_budget.retries)
+        self.assertEqual(2, settle.call_count)
+
+    def test_spent_budget_raises(self):
+        with self.assertRaises(ElementClickInterceptedException):
+            self.click([ElementClickInterceptedException])
+
+
+class TestQuarantine(unittest.TestCase):
+
+    def test_repeatedly_flaky_test_is_quarantined_until_stable(self):
+        quarantine = Quarantine(threshold=2, release_after=2)
+        for outcome in ('flaky', 'pass', 'flaky'):
+            quarantine.record('test_a', outcome)
+        self.assertEqual(['test_a'], quarantine.quarantined)
+        quarantine.record('test_a', 'pass')
+        self.assertTrue(quarantine.is_quarantined('test_a'))
+        quarantine.record('test_a', 'pass')
+        self.assertFalse(quarantine.is_quarantined('test_a'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+Test for selection of tests affected by page-object changes
+"""
+import types
+import unittest
+
+import impact
+from locators import Id
+
+PAGE_SOURCE = '''"""
+Pages
+"""
+import os
+
+
+class CartPage:
+    CART_XPATH = '//*[@id="cart"]'
+    TIMEOUT = 10
+
+    def __init__(self, driver):
+        self.driver = driver
+
+    def _open_cart(self):
+        return self.CART_XPATH
+
+    def _wait(self):
+        return self.TIMEOUT
+'''
+
+TEST_SOURCE = '''
+class TestCart:
+    def setUp(self):
+        pass
+
+    def test_total(self):
+        return CartPage.TOTAL_XPATH
+'''
+
+INDEX = {'test.TestCart.test_open': {'methods': ['CartPage._open_cart'], 'constants': ['CartPage.CART_XPATH']},
+         'test.TestCart.test_wait': {'methods': ['CartPage._wait'], 'constants': []}}
+TEST_IDS = ['test.TestCart.test_open', 'test.TestCart.test_wait', 'test.TestCart.test_total']
+
+
+class TestChangedSymbols(unittest.TestCase):
+
+    def test_changed_lines(self):
+        diff = '@@ -15,0 +16,2 @@\n+    x\n+    y\n@@ -20 +22 @@\n-a\n+b\n'
+        self.assertEqual(({20}, {16, 17, 22}), impact.changed_lines(diff))
+
+    def test_members_changed_by_diff(self):
+        diff = '@@ -11 +11 @@\n@@ -15 +15 @@\n'
+        self.assertEqual(({'CartPage.__init__', 'CartPage._open_cart'}, False),
+                         impact.changed_symbols(PAGE_SOURCE, PAGE_SOURCE, diff))
+
+    def test_module_level_change_is_not_accounted_for(self):
+        self.assertEqual((set(), True), impact.changed_symbols(PAGE_SOURCE, PAGE_SOURCE, '@@ -4 +4 @@\n'))
+
+
+class TestIndex(unittest.TestCase):
+
+    def test_locators_are_mapped_to_constants(self):
+        module = types.ModuleType('fake_pages')
+        module.CartPage = type('CartPage', (), {'__module__': 'fake_pages', 'CART_XPATH': Id('cart')})
+        records = [{'kind': 'test', 'test': 'test_a', 'name': 'test_a', 'locator': None},
+                   {'kind': 'step', 'test': 'test_a', 'name': 'CartPage._open_cart', 'locator': 'id=cart'},
+                   {'kind': 'command', 'test': 'test_a', 'name': 'findElement', 'locator': 'css selector=[id="cart"]'}]
+        self.assertEqual({'test_a': {'methods': ['CartPage._open_cart'], 'constants': ['CartPage.CART_XPATH']}},
+                         impact.build_index(records, module))
+
+
+class TestAffectedTests(unittest.TestCase):
+
+    def select(self, symbols):
+        return impact.affected_tests(INDEX, TEST_IDS, symbols, PAGE_SOURCE, [TEST_SOURCE])
+
+    def test_tests_using_changed_method_and_new_tests(self):
+        self.assertEqual(['test.TestCart.test_open', 'test.TestCart.test_total'], self.select({'CartPage._open_cart'}))
+
+    def test_constant_read_by_recorded_method(self):
+        self.assertEqual(['test.TestCart.test_wait', 'test.TestCart.test_total'], self.select({'CartPage.TIMEOUT'}))
+
+    def test_untraced_symbol_selects_whole_suite(self):
+        for symbol in ('CartPage.__init__', 'CartPage.UNUSED_XPATH', 'CartPage._new_helper'):
+            self.assertEqual({symbol}, impact.untraced_symbols(INDEX, {symbol, 'CartPage._wait'}, PAGE_SOURCE))
+            self.assertEqual(TEST_IDS, self.select({symbol}))
+
+    def test_constant_read_by_test_is_traced(self):
+        self.assertEqual(set(), impact.untraced_symbols(INDEX, {'CartPage.TOTAL_XPATH'}, PAGE_SOURCE, [TEST_SOURCE]))
+        self.assertEqual(['test.TestCart.test_total'], self.select({'CartPage.TOTAL_XPATH'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+"""
+Test for timing layer of page-object steps and WebDriver commands
+"""
+import unittest
+
+from selenium.webdriver.support.wait import WebDriverWait
+
+from instrumentation import Recorder, iter_records
+
+
+class FakeDriver:
+    def execute(self, driver_command, params=None):
+        return {'value': None}
+
+
+def polls_of_wait(recorder, results):
+    results = list(results)
+    recorder.start_test('test_wait')
+    WebDriverWait(FakeDriver(), 1, poll_frequency=0.01).until(lambda driver: results.pop(0))
+    return recorder.stop_test().polls
+
+
+class TestRecorder(unittest.TestCase):
+
+    def test_every_installed_recorder_counts_polls(self):
+        first, second = Recorder(), Recorder()
+        first.install()
+        self.assertEqual(2, polls_of_wait(first, [False, True]))
+        second.install()
+        self.assertEqual(3, polls_of_wait(second, [False, False, True]))
+
+    def test_commands_are_nested_in_steps(self):
+        recorder = Recorder()
+        driver = FakeDriver()
+        recorder.attach(driver)
+        recorder.attach(driver)
+        recorder.start_test('test_find')
+        with recorder.step('BasicPage._find_element', 'id=cart-total'):
+            driver.execute('findElement', {'using': 'css selector', 'value': '[id="cart-total"]'})
+        records = list(iter_records(recorder.stop_test()))
+        self.assertEqual([('test', 'test_find', 1), ('step', 'test_find;BasicPage._find_element', 1),
+                          ('command', 'test_find;BasicPage._find_element;findElement', 0)],
+                         [(record['kind'], record['path'], record['commands']) for record in records])
+        self.assertEqual('css selector=[id="cart-total"]', records[2]['locator'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+"""
+Test for typed locators and the element handle cache of page objects
+"""
+import unittest
+
+from selenium.common.exceptions import StaleElementReferenceException
+from selenium.webdriver.remote.command import Command
+
+from locators import Css, ElementCache, Id, Locator, XPath, as_locator, get_element_cache
+from pages import BasicPage
+
+
+class FakeElement:
+    def __init__(self, name):
+        self.name = name
+        self.stale = False
+
+    def is_enabled(self):
+        if self.stale:
+            raise StaleElementReferenceException()
+        return True
+
+    def is_displayed(self):
+        return self.is_enabled()
+
+
+class FakeDriver:
+    def __init__(self):
+        self.commands = []
+        self.found = []
+
+    def execute(self, driver_command, params=None):
+        self.commands.append(driver_command)
+
+    def refresh(self):
+        self.execute(Command.REFRESH)
+
+    def find_element(self, by, value):
+        element = FakeElement(value)
+        self.found.append(element)
+        return element
+
+
+class TestLocators(unittest.TestCase):
+
+    def test_id_xpath_is_compiled_to_id(self):
+        self.assertEqual(Id('input-email'), XPath('//*[@id="input-email"]'))
+        self.assertEqual(Locator('xpath', '/html/body/div[2]'), XPath('/html/body/div[2]'))
+        self.assertEqual('css selector=.alert', str(Css('.alert')))
+
+    def test_as_locator(self):
+        self.assertEqual(XPath('/html/body'), as_locator('/html/body'))
+        locator = Css('.alert')
+        self.assertIs(locator, as_locator(locator))
+
+
+class TestElementCache(unittest.TestCase):
+
+    def test_navigation_clears_cache(self):
+        driver = FakeDriver()
+        cache = ElementCache()
+        cache.attach(driver)
+        for command in (Command.GET, Command.REFRESH, Command.GO_BACK, Command.GO_FORWARD):
+            cache.put(Id('cart-total'), FakeElement('cart-total'))
+            driver.execute(command, {})
+            self.assertIsNone(cache.get(Id('cart-total')))
+        self.assertEqual([Command.GET, Command.REFRESH, Command.GO_BACK, Command.GO_FORWARD], driver.commands)
+
+    def test_other_commands_keep_cache(self):
+        driver = FakeDriver()
+        cache = ElementCache()
+        cache.attach(driver)
+        element = FakeElement('cart-total')
+        cache.put(Id('cart-total'), element)
+        driver.execute(Command.CLICK_ELEMENT, {})
+        self.assertIs(element, cache.get(Id('cart-total')))
+
+    def test_cache_is_shared_by_page_objects_of_driver(self):
+        driver = FakeDriver()
+        self.assertIs(BasicPage(driver)._elements, BasicPage(driver)._elements)
+        self.assertIs(get_element_cache(driver), BasicPage(driver)._elements)
+        self.assertIsNot(get_element_cache(driver), get_element_cache(FakeDriver()))
+
+
+class TestFindElement(unittest.TestCase):
+
+    def test_live_handle_is_reused(self):
+        page = BasicPage(FakeDriver())
+        first = page._find_element(Id('input-email'))
+        self.assertIs(first, page._find_element(Id('input-email')))
+        self.assertIs(first, page._find_element(Id('input-email'), clickable=True))
+        self.assertEqual(1, len(page.driver.found))
+
+    def test_stale_handle_is_found_again(self):
+        page = BasicPage(FakeDriver())
+        first = page._find_element(Id('input-email'))
+        # eg. click loaded the register page, which has an input-email field as well
+        first.stale = True
+        second = page._find_element(Id('input-email'))
+        self.assertIsNot(first, second)
+        self.assertIs(second, page._elements.get(Id('input-email')))
+
+    def test_handles_of_other_page_objects_are_dropped_on_refresh(self):
+        driver = FakeDriver()
+        home_page, cart_page = BasicPage(driver), BasicPage(driver)
+        cart_page._find_element(Id('input-zone'))
+        home_page._refresh()
+        self.assertIsNone(cart_page._elements.get(Id('input-zone')))
+
+
+if __name__ == '__main__':
+    unittest.main()
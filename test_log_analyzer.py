@@ -0,0 +1,79 @@
+"""
+Test for streaming geckodriver log analyzer
+"""
+import unittest
+
+import log_analyzer
+from log_analyzer import BoundedCounter, LogAnalyzer, normalize, parse_line
+
+LOG = [
+    '1562092380058\tmozrunner::runner\tINFO\tRunning command: "firefox.exe" "-marionette"\n',
+    '1562092383209\tMarionette\tINFO\tListening on port 50517\n',
+    '1562092390209\tMarionette\tWARN\tTLS certificate errors will be ignored for this session\n',
+    '[Child 19576, Chrome_ChildThread] WARNING: pipe error: 109: file z:/build/ipc_channel_win.cc, line 341\n',
+    '[Chil1562093163867\tMarionette\tINFO\tStopped listening on port 50517\n',
+    '1562093757384\tmozrunner::runner\tINFO\tRunning command: "firefox.exe" "-marionette"\n',
+    '1562093760384\tMarionette\tINFO\tListening on port 51278\n',
+]
+
+
+class TestParseLine(unittest.TestCase):
+
+    def test_timestamped_line_after_fragment(self):
+        entry = parse_line(LOG[4], 5, None)
+        self.assertEqual((5, 1562093163867, True, 'Marionette', 'INFO', 'Stopped listening on port 50517'), entry)
+
+    def test_process_line_takes_previous_timestamp(self):
+        entry = parse_line(LOG[3], 4, 1562092390209)
+        self.assertEqual((1562092390209, False, 'Child', 'WARN'), entry[1:5])
+
+    def test_continuation_line_is_skipped(self):
+        self.assertIsNone(parse_line('  Stack:\n', 1, None))
+
+    def test_normalize(self):
+        self.assertEqual('Listening on port N at <url>', normalize('Listening on port 50517 at http://127.0.0.1/'))
+
+
+class TestBoundedCounter(unittest.TestCase):
+
+    def test_least_frequent_key_is_evicted(self):
+        counter = BoundedCounter(size=2)
+        for key in ['a', 'a', 'b', 'c']:
+            counter.add(key)
+        self.assertEqual([('a', 2), ('c', 2)], counter.most_common())
+        self.assertEqual(1, counter.error('c'))
+        self.assertEqual(0, counter.error('a'))
+
+
+class TestTestWindows(unittest.TestCase):
+
+    def test_find_latest_started_running_test(self):
+        window = log_analyzer.TestWindow
+        windows = log_analyzer.TestWindows([window(0, 100, 'test_a'), window(50, 60, 'test_b'), window(200, 300, 'test_c')])
+        self.assertEqual('test_b', windows.find(55))
+        self.assertEqual('test_a', windows.find(70))
+        self.assertIsNone(windows.find(150))
+        self.assertIsNone(windows.find(None))
+
+
+class TestLogAnalyzer(unittest.TestCase):
+
+    def test_gap_inside_session_is_stall(self):
+        analyzer = LogAnalyzer(stall_ms=5000).analyze(LOG)
+        self.assertEqual([(7000, 1562092383209, 1562092390209)], [stall[:3] for stall in analyzer.stalls])
+
+    def test_gaps_across_sessions_are_not_stalls(self):
+        analyzer = LogAnalyzer(stall_ms=5000).analyze(LOG)
+        self.assertEqual(2, analyzer.sessions)
+        self.assertNotIn(4, [stall.line_no for stall in analyzer.stalls])
+        self.assertNotIn(6, [stall.line_no for stall in analyzer.stalls])
+
+    def test_summary_counts_levels_and_messages(self):
+        summary = LogAnalyzer().analyze(LOG).summary()
+        self.assertEqual(7, summary['lines'])
+        self.assertEqual({'INFO': 5, 'WARN': 2}, summary['levels'])
+        self.assertEqual(2, len(summary['top_messages']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,45 +4,73 @@ Test for ordering products
 import random
 import re
 import unittest
+from urllib.parse import urljoin
 
-from selenium import webdriver, common
-from selenium.common.exceptions import TimeoutException
+from selenium import common
 
+import driver_pool
+import failure_artifacts
+import instrumentation
+import local_shop
+import price_checks
+import scenarios
+import settings
 from pages import HomePage, DetailsPage, ShoppingCartPage
+from shop_api import ShopClient
 
+PRODUCTS = list(HomePage.PRODUCT_IDS_XPATHS)
+REGIONS = ['2632', '2641']
 
+
+@scenarios.expand
+@failure_artifacts.capture_failures
 class TestOrderProduct(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls):
-        cls.driver = webdriver.Firefox()
-        cls.driver.get("PATH_TO_APP")
+        cls.driver = driver_pool.get_pool().lease()
+        # attached before timing recorder, so snapshots do not count as page-object commands
+        cls.flight_recorder = failure_artifacts.FlightRecorder.from_settings(cls.driver)
+        cls.recorder = instrumentation.get_recorder()
+        if cls.recorder:
+            cls.recorder.attach(cls.driver)
+        cls.app_url = local_shop.resolve_app_url(settings.APP_URL)
+        cls.driver.get(cls.app_url)
+        shop = ShopClient(cls.app_url)
+        cls.product_ids = dict(zip(PRODUCTS, shop.get_home_product_ids()))
+        cls.minimum_quantities = {product: shop.get_minimum_quantity(product_id)
+                                  for product, product_id in cls.product_ids.items()}
         cls.home_page = HomePage(cls.driver)
         cls.details_page = DetailsPage(cls.driver)
         cls.shopping_page = ShoppingCartPage(cls.driver)
 
     def setUp(self):
-        try:
+        if self.flight_recorder:
+            self.flight_recorder.start_test(self.id())
+        if self.recorder:
+            self.recorder.start_test(self.id())
+        # state setup and checks go over HTTP with the browser's cookies, UI steps are left to what is tested
+        self.shop = ShopClient.from_driver(self.driver, self.app_url)
+        if self.shop.get_cart_total() != (0, 0):
+            # emptied in the browser's own session, a logged-in customer's cart outlives a new session cookie
+            self.shop.clear_cart()
             self._check_if_cart_is_empty()
-        except TimeoutException:
-            self.home_page._click_cart_button()
-            self.home_page._clean_cart()
+            self.driver.refresh()
 
-    def test_add_product_from_home_page(self):
+    @scenarios.scenario(scenarios.Matrix(product=PRODUCTS))
+    def test_add_product_from_home_page(self, product):
         """
         1. Add product to cart from home page.
         2. Check if quantity == 1.
         3. Check if value is the same as in description.
         4. Clean cart.
-        5. Do for each product.
+        Runs separately for each product.
         """
         amount_of_added_products = '1'
-        for prod_id, _ in self.home_page.PRODUCT_IDS_XPATHS.items():
-            self.home_page._add_single_product_to_cart(prod_id)
-            self.assertEqual(amount_of_added_products, self.home_page._get_cart_items_quantity())
-            prod_price = self.home_page._get_product_value(prod_id)
-            self.assertEqual(prod_price, self.home_page._get_cart_items_value())
-            self.home_page._clean_cart()
+        prod_price = self.home_page._get_product_value(product)
+        self.home_page._add_single_product_to_cart(product)
+        self.assertEqual((amount_of_added_products, prod_price), self.home_page._get_cart_state())
+        self.home_page._clean_cart()
 
     def test_add_product_from_product_details_page(self):
         """
@@ -52,15 +80,16 @@ class TestOrderProduct(unittest.TestCase):
         4. Clean cart.
         5. Do for each product.
         """
+        prod_prices = self.home_page._get_product_values()
         for prod_id, _ in self.home_page.PRODUCT_IDS_XPATHS.items():
-            prod_price = self.home_page._convert_price_to_float(self.home_page._get_product_value(prod_id))
+            prod_price = self.home_page._convert_price_to_cents(prod_prices[prod_id])
             self.home_page._click_enabled_element(self.home_page.PRODUCT_DETAILS_XPATHS[prod_id])
             default_value = self.details_page._get_default_quantity()
-            self.details_page._click_enabled_element(self.details_page.ADD_TO_CART_XPATH)
+            self.details_page._add_to_cart()
             prod_price_sum = int(default_value) * prod_price
-            self.assertEqual(default_value, self.details_page._get_cart_items_quantity())
-            self.assertEqual(prod_price_sum, self.details_page._convert_price_to_float(self.details_page.
-                                                                                       _get_cart_items_value()))
+            cart_quantity, cart_value = self.details_page._get_cart_state()
+            self.assertEqual(default_value, cart_quantity)
+            self.assertEqual(prod_price_sum, self.details_page._convert_price_to_cents(cart_value))
             self.details_page._clean_cart()
             self.details_page._go_to_home_page()
 
@@ -73,18 +102,17 @@ class TestOrderProduct(unittest.TestCase):
         5. Check if value in cart is the same as sum from point 3.
         6. Clean cart.
         """
-        value_sum = 0.0
         amount_of_added_products = str(len(self.home_page.PRODUCT_IDS_XPATHS))
+        prod_prices = self.home_page._get_product_values()
         for prod_id, _ in self.home_page.PRODUCT_IDS_XPATHS.items():
             self.home_page._add_single_product_to_cart(prod_id)
-            prod_price = self.home_page._convert_price_to_float(self.home_page._get_product_value(prod_id))
-            value_sum += prod_price
+        value_sum = sum(price_checks.to_cents_array(prod_prices.values()))
         self.assertEqual(amount_of_added_products, self.home_page._get_cart_items_quantity())
-        self.assertEqual(value_sum, self.home_page._convert_price_to_float(self.home_page._get_cart_items_value()))
+        self.assertEqual(value_sum, self.home_page._convert_price_to_cents(self.home_page._get_cart_items_value()))
 
     def test_cart_value_between_pages(self):
         """
-        1. Add randomly selected product to cart from home page.
+        1. Add randomly selected product to cart over HTTP.
         2. Go to product details page.
         3. Check if value is the same.
         4. Go to shopping cart page.
@@ -95,7 +123,7 @@ class TestOrderProduct(unittest.TestCase):
         id_of_selected_product = self._select_random_item()
         prod_price = self.home_page._get_product_value(id_of_selected_product)
 
-        self.home_page._add_single_product_to_cart(id_of_selected_product)
+        self._add_to_cart_over_http(id_of_selected_product)
         self._compare_given_quantity_and_value_with_current_cart(amount_of_added_products, prod_price)
 
         self.home_page._go_to_product_details_page(id_of_selected_product)
@@ -105,57 +133,56 @@ class TestOrderProduct(unittest.TestCase):
         self._compare_given_quantity_and_value_with_current_cart(amount_of_added_products, prod_price)
         self.assertEqual(prod_price, self.shopping_page._get_sub_total_value())
 
-    def test_estimate_shipping_and_taxes(self):
+    @scenarios.scenario(scenarios.Matrix(product=PRODUCTS, region=REGIONS))
+    def test_estimate_shipping_and_taxes(self, product, region):
         """
-        1. Add random product from details page.
+        1. Add product to cart over HTTP.
         2. Go to shopping cart page.
-        3. Fill "Estimate Shipping & Taxes" formulae.
+        3. Fill "Estimate Shipping & Taxes" formulae with region.
         4. Get value of selected shipping method.
         5. Check if it is added properly to the total value.
+        6. Check line totals, totals and cart button of the cart page at once.
+        7. Check if the quote of the shop matches the one shown.
+        Runs separately for each product and region.
         """
-        id_of_selected_product = self._select_random_item()
-        self.home_page._click_enabled_element(self.home_page.PRODUCT_DETAILS_XPATHS[id_of_selected_product])
-        self.details_page._click_enabled_element(self.details_page.ADD_TO_CART_XPATH)
-        self.details_page._go_to_shopping_cart_page()
+        self._add_to_cart_over_http(product)
+        self.home_page._go_to_shopping_cart_page()
         self.shopping_page._click_enabled_element(self.shopping_page.ESTIMATE_SHOPPING_AND_TAXES_XPATH)
-        from time import sleep
-        sleep(1)
-        self.shopping_page._select_region_from_taxes_form()
+        self.shopping_page._wait_for_page_to_settle()
+        self.shopping_page._select_region_from_taxes_form(region)
         self.shopping_page._click_enabled_element(self.shopping_page.GET_QUOTES_BUTTON_XPATH)
 
         self.shopping_page._click_enabled_element(self.shopping_page.FLAT_RATE_XPATH)
-        taxes_popup = self.shopping_page._convert_price_to_float(self.shopping_page._get_taxes())
+        taxes_popup = self.shopping_page._convert_price_to_cents(self.shopping_page._get_taxes())
         self.shopping_page._click_enabled_element(self.shopping_page.APPLY_SHOPPING_BUTTON_XPATH)
         taxes_summary = self.shopping_page._get_text_from_enabled_element(self.shopping_page.FLAT_SHIPPING_RATE_VALUE)
-        taxes_summary = re.search("(?<=\$)(.*)", taxes_summary).group()
-        taxes_summary = self.shopping_page._convert_price_to_float(taxes_summary)
-        self.assertEqual(taxes_popup, taxes_summary)
+        self.assertEqual(taxes_popup, self.shopping_page._convert_price_to_cents(taxes_summary))
 
         total_summary = self.shopping_page._get_text_from_enabled_element(self.shopping_page.TOTAL_VALUE)
-        total_summary = re.search("(?<=\$)(.*)", total_summary).group()
-        total_summary = self.shopping_page._convert_price_to_float(total_summary)
-        self.assertEqual(self.shopping_page._calculated_sub_total_price_with_flat_shipping_rate(), total_summary)
-
         self.assertEqual(self.shopping_page._calculated_sub_total_price_with_flat_shipping_rate(),
-                         self.shopping_page._convert_price_to_float(self.shopping_page._get_cart_items_value()))
+                         self.shopping_page._convert_price_to_cents(total_summary))
+
+        self.assertEqual([], price_checks.check_cart(self.shopping_page._get_cart_snapshot()))
+        quote = self.shop.get_shipping_quote(region)['flat.flat']
+        self.assertEqual(taxes_popup, price_checks.to_cents(quote))
 
     def test_buying_process(self):
         """
-        1. Add random product from details page.
-        2. Go to shopping cart.
-        3. Click Checkout.
-        4. Fill all forms.
-        5. Check if "Your order has been placed!" appeared.
+        1. Log in, cached customer session is reused when still valid.
+        2. Add random product to cart over HTTP.
+        3. Go to shopping cart.
+        4. Click Checkout.
+        5. Fill all forms.
+        6. Check if "Your order has been placed!" appeared.
         :return:
         """
         expected_buy_message = 'Your order has been placed!'
         expected_success_message = 'Success'
 
-        self.shopping_page._register_user()
+        self.shopping_page._log_in_with_cached_session()
         id_of_selected_product = self._select_random_item()
-        self.home_page._click_enabled_element(self.home_page.PRODUCT_DETAILS_XPATHS[id_of_selected_product])
-        self.details_page._click_enabled_element(self.details_page.ADD_TO_CART_XPATH)
-        self.details_page._go_to_shopping_cart_page()
+        self._add_to_cart_over_http(id_of_selected_product)
+        self.home_page._go_to_shopping_cart_page()
         self.shopping_page._click_enabled_element(self.shopping_page.CHECKOUT_BUTTON_XPATH)
         self.shopping_page._fill_checkout_form()
         success_subpage = self.shopping_page._get_text_from_enabled_element(self.shopping_page.SUCCESS_CHECKOUT_XPATH)
@@ -166,107 +193,114 @@ class TestOrderProduct(unittest.TestCase):
 
     def test_select_quantity_from_checkout_page(self):
         """
-        1. Add random product from details page.
+        1. Add random product to cart over HTTP.
         2. Go to shopping cart page.
         3. Change quantity of selected product.
         4. Sum quantities and values of all products.
-        5. Compare it to values in cart button.
+        5. Compare it to values in cart of the shop.
         """
+        expected_message = 'Success: You have modified your shopping cart!'
         id_of_selected_product = self._select_random_item()
-        prod_price = self.home_page._convert_price_to_float(self.home_page._get_product_value(id_of_selected_product))
-        self.home_page._click_enabled_element(self.home_page.PRODUCT_DETAILS_XPATHS[id_of_selected_product])
-        current_value = int(self.details_page._get_default_quantity())
-        self.details_page._click_enabled_element(self.details_page.ADD_TO_CART_XPATH)
+        prod_price = self.home_page._convert_price_to_cents(self.home_page._get_product_value(id_of_selected_product))
+        current_value = self._add_to_cart_over_http(id_of_selected_product)
 
-        self.details_page._go_to_shopping_cart_page()
+        self.home_page._go_to_shopping_cart_page()
         new_value = current_value + 1
         self.shopping_page._fill_qty_field_with_given_amount(new_value)
         self.shopping_page._click_enabled_element(self.shopping_page.UPDATE_BUTTON_XPATH)
-        self.assertEqual(prod_price * new_value, self.shopping_page._convert_price_to_float(self.shopping_page
-                                                                                            ._get_cart_items_value()))
+        # alert of the reloaded cart page, the update is done when it shows
+        self.assertEqual(expected_message, self.shopping_page._get_first_alert_message())
+        self.assertEqual((new_value, prod_price * new_value), self.shop.get_cart_total())
 
-    def test_validate_quantity_restrictions(self):
+    @scenarios.scenario(scenarios.Matrix(product=PRODUCTS))
+    def test_validate_quantity_restrictions(self, product):
         """
         1. Go to product details page.
-        2. Check for restrictions.
-        3. Get QTY value from string.
-        4. Select QTY-1 amount.
-        5. Go to checkout page.
-        6. Click checkout button.
-        7. Check if "Minimum order amount for Test product 1 is 2!" appears.
-        8. Change quantity to Qty.
-        9. Click checkout .
-        10. Fill buying form.
-        :return:
+        2. Check for restrictions, products without a minimum quantity are not checked further.
+        3. Get minimum quantity from the restriction message.
+        4. Add the minimum quantity to cart over HTTP.
+        5. Check over HTTP that the cart page shows no warnings.
+        6. Go to shopping cart page.
+        7. Set quantity to minimum-1 and update the cart.
+        8. Check if "Success: You have modified your shopping cart!" appears.
+        9. Check if "Minimum order amount for Test product 1 is 2!" appears.
+        Runs separately for each product.
         """
         expected_positive_msg = "Success: You have modified your shopping cart!"
         expected_negative_msg = "Minimum order amount for Test product 1 is 2!"
 
-        for prod_id, _ in self.home_page.PRODUCT_IDS_XPATHS.items():
-            self.home_page._click_enabled_element(self.home_page.PRODUCT_DETAILS_XPATHS[prod_id])
-            try:
-                self.driver.find_element_by_css_selector(self.details_page.ALERT_INFO_CSS).is_displayed()
-            except common.exceptions.NoSuchElementException:
-                pass
-            else:
-                validation_msg = self.driver.find_element_by_css_selector(self.details_page.ALERT_INFO_CSS).text
-                keywords = re.search("(?<=This product has a )(.*) quantity of ([0-9]*)", validation_msg)
-                if keywords.group(1) == "minimum":
-                    self.details_page._fill_qty_field_with_given_amount(keywords.group(2))
-                    self.details_page._click_enabled_element(self.details_page.ADD_TO_CART_XPATH)
-                    self.details_page._go_to_shopping_cart_page()
-                    self.shopping_page._click_enabled_element(self.shopping_page.UPDATE_BUTTON_XPATH)
-                    self.assertEqual(expected_positive_msg, self.shopping_page._get_first_alert_message())
-                    self.shopping_page._click_enabled_element(self.shopping_page.CLOSE_MESSAGE_XPATH)
-                    too_low_value = int(keywords.group(2)) - 1
-                    self.shopping_page._fill_qty_field_with_given_amount(too_low_value)
-                    self.shopping_page._click_enabled_element(self.shopping_page.UPDATE_BUTTON_XPATH)
-                    self.assertEqual(expected_positive_msg, self.shopping_page._get_first_alert_message())
-                    self.assertEqual(expected_negative_msg, self.shopping_page._get_second_alert_message())
-            self.shopping_page._go_to_home_page()
+        self.home_page._click_enabled_element(self.home_page.PRODUCT_DETAILS_XPATHS[product])
+        try:
+            self.driver.find_element(*self.details_page.ALERT_INFO_CSS).is_displayed()
+        except common.exceptions.NoSuchElementException:
+            pass
+        else:
+            validation_msg = self.driver.find_element(*self.details_page.ALERT_INFO_CSS).text
+            keywords = re.search("(?<=This product has a )(.*) quantity of ([0-9]*)", validation_msg)
+            if keywords.group(1) == "minimum":
+                self._add_to_cart_over_http(product, int(keywords.group(2)))
+                self.assertEqual([], self.shop.get_cart().warnings)
+                self.details_page._go_to_shopping_cart_page()
+                too_low_value = int(keywords.group(2)) - 1
+                self.shopping_page._fill_qty_field_with_given_amount(too_low_value)
+                self.shopping_page._click_enabled_element(self.shopping_page.UPDATE_BUTTON_XPATH)
+                self.assertEqual(expected_positive_msg, self.shopping_page._get_first_alert_message())
+                self.assertEqual(expected_negative_msg, self.shopping_page._get_second_alert_message())
+        self.shopping_page._go_to_home_page()
 
     def test_remove_product_with_setting_quantity_to_zero(self):
         """
-        1. Add random product from details page.
+        1. Add random product to cart over HTTP.
         2. Go to shopping cart page.
         3. Change quantity of selected product to 0.
         4. Check if "Your shopping cart is empty!" appeared.
         """
         expected_message = 'Your shopping cart is empty!'
         id_of_selected_product = self._select_random_item()
-        self.home_page._add_single_product_to_cart(id_of_selected_product)
+        self._add_to_cart_over_http(id_of_selected_product)
         self.details_page._go_to_shopping_cart_page()
 
         self.shopping_page._fill_qty_field_with_given_amount(0)
         self.shopping_page._click_enabled_element(self.shopping_page.UPDATE_BUTTON_XPATH)
         self.assertEqual(expected_message, self.shopping_page._get_text_from_enabled_element(self.shopping_page.
                                                                                              VALIDATION_MESSAGE_XPATH))
+        self._check_if_cart_is_empty()
 
     def tearDown(self):
-        cur_url = self.driver.current_url
-        if cur_url != "https://rekrutacjaqa2.xsolve.software/" and \
-           cur_url != "https://rekrutacjaqa2.xsolve.software/index.php?route=common/home":
+        home_urls = (self.app_url, urljoin(self.app_url, 'index.php?route=common/home'))
+        if self.driver.current_url not in home_urls:
             self.details_page._go_to_home_page()
+        if self.recorder:
+            self.recorder.stop_test()
 
     @classmethod
     def tearDownClass(cls):
-        cls.driver.close()
+        driver_pool.get_pool().release(cls.driver)
 
     def _check_if_cart_is_empty(self):
-        self.home_page._click_cart_button()
-        message = self.home_page._get_text_from_enabled_element(self.home_page.MESSAGE_CART_XPATH)
-        self.assertEqual('Your shopping cart is empty!', message)
-        self.assertEqual('0', self.home_page._get_cart_items_quantity())
-        self.assertEqual('0.00', self.home_page._get_cart_items_value())
-        self.home_page._click_cart_button()
+        self.assertEqual((0, 0), self.shop.get_cart_total())
+
+    def _add_to_cart_over_http(self, product, quantity=None):
+        """
+        Add product to cart with the browser's session, as add to cart button of its details page does.
+        :param product: type: str [1-4]
+        :param quantity: type: int, minimum quantity of the product by default
+        :return: type: int, added quantity
+        """
+        quantity = quantity or self.minimum_quantities[product]
+        # logging in may have replaced the session cookie
+        self.shop.sync_cookies(self.driver)
+        self.shop.add_to_cart(self.product_ids[product], quantity)
+        # element handles of all page objects of the driver are dropped on reload, see locators.get_element_cache
+        self.driver.refresh()
+        return quantity
 
     def _compare_given_quantity_and_value_with_current_cart(self, qty, value):
         """
         :param qty: type: str
         :param value: type: str
         """
-        self.assertEqual(qty, self.home_page._get_cart_items_quantity())
-        self.assertEqual(value, self.home_page._get_cart_items_value())
+        self.assertEqual((qty, value), self.home_page._get_cart_state())
 
     def _select_random_item(self):
         return random.choice(list(self.home_page.PRODUCT_IDS_XPATHS))
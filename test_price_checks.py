@@ -0,0 +1,55 @@
+"""
+Test for exact price parsing and cart consistency checks
+"""
+import unittest
+
+import price_checks
+from price_checks import check_cart, format_cents, parse_cart, to_cents
+
+CART_PAGE = {'lines': [['iPhone', '2', '$101.00', '$202.00'], ['MacBook', '1', '$500.00', '$500.00']],
+             'totals': [['Sub-Total', '$702.00'], ['Coupon (SAVE)', '-$5.00'], ['Flat Shipping Rate', '$5.00'],
+                        ['Total', '$702.00']],
+             'widget': '3 item(s) - $702.00'}
+
+
+class TestPrices(unittest.TestCase):
+
+    def test_to_cents(self):
+        self.assertEqual(125000, to_cents('2 item(s) - $1,250.00'))
+        self.assertEqual(125000, to_cents(' 1,250.00 '))
+        self.assertEqual(1000000000, to_cents('$10,000,000.00'))
+
+    def test_negative_prices(self):
+        for text in ('-$5.00', '$-5.00', '-5.00', 'Coupon -$5.00'):
+            self.assertEqual(-500, to_cents(text), text)
+        self.assertEqual(500, to_cents('1 item(s) - $5.00'))
+
+    def test_text_without_price(self):
+        with self.assertRaises(ValueError):
+            to_cents('0 item(s)')
+
+    def test_format_cents(self):
+        self.assertEqual('1,250.00', format_cents(125000))
+        self.assertEqual('0.05', format_cents(5))
+        self.assertEqual('-5.00', format_cents(-500))
+        self.assertEqual('-0.05', format_cents(-5))
+        self.assertEqual('-1,250.01', format_cents(to_cents('-$1,250.01')))
+
+
+class TestCartChecks(unittest.TestCase):
+
+    def test_consistent_cart_with_discount(self):
+        snapshot = parse_cart(CART_PAGE)
+        self.assertEqual(-500, snapshot.totals['Coupon (SAVE)'])
+        self.assertEqual((3, 70200), (snapshot.widget_quantity, snapshot.widget_total))
+        self.assertEqual([], check_cart(snapshot, {'iPhone': 10100}))
+
+    def test_violations_are_reported(self):
+        page = dict(CART_PAGE, lines=[['iPhone', '2', '$101.00', '$201.00']] + CART_PAGE['lines'][1:])
+        violations = check_cart(parse_cart(page), {'MacBook': 49900})
+        self.assertEqual(['iPhone: 2 x 101.00 != 201.00', 'MacBook: unit price 500.00 != listed 499.00',
+                          '{} 702.00 != sum of lines 701.00'.format(price_checks.SUB_TOTAL)], violations)
+
+
+if __name__ == '__main__':
+    unittest.main()
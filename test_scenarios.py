@@ -0,0 +1,83 @@
+"""
+Test for matrix-driven scenarios and cache of their passed cells
+"""
+import shutil
+import tempfile
+import unittest
+
+import scenarios
+import waits
+
+MATRIX = scenarios.Matrix(product=['1', '2'], region=['2632', '2641'])
+
+
+@scenarios.scenario(MATRIX.where(lambda product, region: product != '1' or region != '2641'))
+def shipping(self, product, region):
+    self.runs.append((product, region))
+
+
+class TestMatrix(unittest.TestCase):
+
+    def test_cells_are_filtered_combinations(self):
+        cells = MATRIX.where(lambda product, region: product == '2')
+        self.assertEqual([{'product': '2', 'region': '2632'}, {'product': '2', 'region': '2641'}], list(cells))
+
+    def test_cell_name(self):
+        self.assertEqual('product_1__region_26_32', scenarios.cell_name(dict(product=1, region='26 32')))
+
+
+class TestExpand(unittest.TestCase):
+
+    def setUp(self):
+        namespace = {'__module__': __name__, 'runs': [], 'test_shipping': shipping}
+        self.case_class = scenarios.expand(type('Case', (unittest.TestCase,), namespace))
+
+    def test_matrix_is_iterated_on_collection(self):
+        self.assertNotIn('test_shipping__product_2__region_2632', vars(self.case_class))
+        names = unittest.defaultTestLoader.getTestCaseNames(self.case_class)
+        self.assertEqual(['test_shipping__product_1__region_2632', 'test_shipping__product_2__region_2632',
+                          'test_shipping__product_2__region_2641'], list(names))
+        self.assertNotIn('test_shipping', names)
+
+    def test_cell_runs_with_its_values(self):
+        self.case_class('test_shipping__product_2__region_2641').run()
+        self.assertEqual([('2', '2641')], self.case_class.runs)
+
+    def test_cell_is_loaded_by_name(self):
+        case = getattr(self.case_class, 'test_shipping__product_1__region_2632')
+        self.assertIn('product=1, region=2632', case.__doc__)
+        with self.assertRaises(AttributeError):
+            getattr(self.case_class, 'test_shipping__product_1__region_2641')
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.function = shipping
+        self.cell = {'product': '2', 'region': '2632'}
+
+    def test_passed_cell_is_remembered(self):
+        scenarios.ResultCache(self.directory, [waits], 'http://127.0.0.1:8000/').put('case', self.function, self.cell)
+        cache = scenarios.ResultCache(self.directory, [waits], 'http://127.0.0.1:8001/')
+        self.assertIsNotNone(cache.get('case', self.function, self.cell))
+        self.assertIsNone(cache.get('case', self.function, {'product': '2', 'region': '2641'}))
+        self.assertIsNone(cache.get('other', self.function, self.cell))
+
+    def test_dependencies_and_shop_are_part_of_fingerprint(self):
+        cache = scenarios.ResultCache(self.directory, [waits], 'http://shop.test/')
+        self.assertNotEqual(cache.fingerprint(self.function, self.cell),
+                            scenarios.ResultCache(self.directory, [], 'http://shop.test/')
+                            .fingerprint(self.function, self.cell))
+        self.assertNotEqual(cache.fingerprint(self.function, self.cell),
+                            scenarios.ResultCache(self.directory, [waits], 'http://other.test/')
+                            .fingerprint(self.function, self.cell))
+
+    def test_normalize_target(self):
+        self.assertEqual('http://127.0.0.1/shop/', scenarios.normalize_target('http://127.0.0.1:43121/shop/'))
+        self.assertEqual('local', scenarios.normalize_target('local'))
+
+
+if __name__ == '__main__':
+    unittest.main()
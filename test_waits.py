@@ -0,0 +1,85 @@
+"""
+Test for wait conditions and price parsing helpers of page objects
+"""
+import unittest
+from unittest import mock
+
+from selenium.common.exceptions import StaleElementReferenceException
+
+import waits
+from locators import Id
+from pages import BasicPage
+
+
+class FakeElement:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeDriver:
+    def __init__(self, texts=(), script_results=()):
+        self.texts = list(texts)
+        self.script_results = list(script_results)
+        self.scripts = []
+
+    def find_element(self, by, value):
+        text = self.texts.pop(0)
+        if text is StaleElementReferenceException:
+            raise StaleElementReferenceException()
+        return FakeElement(text)
+
+    def execute_script(self, script, *args):
+        self.scripts.append((script, args))
+        return self.script_results.pop(0)
+
+
+class TestWaits(unittest.TestCase):
+
+    def test_text_to_change(self):
+        condition = waits.text_to_change(Id('cart-total'), '0 item(s) - $0.00')
+        driver = FakeDriver(['0 item(s) - $0.00', StaleElementReferenceException, '1 item(s) - $2.00'])
+        self.assertFalse(condition(driver))
+        self.assertFalse(condition(driver))
+        self.assertEqual('1 item(s) - $2.00', condition(driver))
+
+    def test_text_is_stable_after_quiet_period(self):
+        condition = waits.text_is_stable(Id('total'), quiet_period=0.3)
+        driver = FakeDriver(['$1.00', '$1.00', '$2.00', '$2.00'])
+        with mock.patch('waits.time.monotonic', side_effect=[0.0, 0.5, 0.6, 0.8]):
+            self.assertFalse(condition(driver))
+            self.assertEqual('$1.00', condition(driver))
+            self.assertFalse(condition(driver))
+            self.assertFalse(condition(driver))
+
+    def test_empty_text_is_never_stable(self):
+        condition = waits.text_is_stable(Id('total'), quiet_period=0)
+        driver = FakeDriver(['', ''])
+        self.assertFalse(condition(driver))
+        self.assertFalse(condition(driver))
+
+    def test_dom_is_stable(self):
+        condition = waits.dom_is_stable(quiet_period=0.3)
+        self.assertFalse(condition(FakeDriver(script_results=[299])))
+        self.assertTrue(condition(FakeDriver(script_results=[300])))
+
+    def test_all_elements_read_waits_for_every_element(self):
+        condition = waits.all_elements_read({'cart': Id('cart-total')}, ['value'])
+        driver = FakeDriver(script_results=[None, {'cart': {'text': '1 item(s) - $2.00', 'visible': True}}])
+        self.assertFalse(condition(driver))
+        self.assertEqual({'cart': {'text': '1 item(s) - $2.00', 'visible': True}}, condition(driver))
+        self.assertEqual(({'cart': ['id', 'cart-total']}, ['value']), driver.scripts[0][1])
+
+
+class TestPriceHelpers(unittest.TestCase):
+
+    def test_extract_price(self):
+        self.assertEqual('1,250.00', BasicPage._extract_price('Flat Shipping Rate - $1,250.00'))
+        self.assertEqual('122.00', BasicPage._extract_price('$122.00\nEx Tax: $100.00'))
+        self.assertEqual('-5.00', BasicPage._extract_price('Coupon (SAVE) -$5.00'))
+
+    def test_parse_cart_total(self):
+        self.assertEqual(('2', '244.00'), BasicPage._parse_cart_total('2 item(s) - $244.00'))
+
+
+if __name__ == '__main__':
+    unittest.main()
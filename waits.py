@@ -0,0 +1,122 @@
+"""
+Module represents wait conditions for pages updated by JavaScript, to be used with WebDriverWait
+"""
+import time
+
+from selenium.common.exceptions import StaleElementReferenceException
+
+_DOM_QUIET_FOR_MS_JS = """
+if (window.__lastDomMutation === undefined) {
+    window.__lastDomMutation = Date.now();
+    new MutationObserver(function () { window.__lastDomMutation = Date.now(); }).observe(
+        document.documentElement, {childList: true, subtree: true, attributes: true, characterData: true});
+}
+return Date.now() - window.__lastDomMutation;
+"""
+
+_NO_PENDING_AJAX_JS = """
+return document.readyState === 'complete' && (!window.jQuery || window.jQuery.active === 0);
+"""
+
+_READ_ELEMENTS_JS = """
+var locators = arguments[0], attributes = arguments[1], result = {};
+for (var name in locators) {
+    var by = locators[name][0], value = locators[name][1], elem;
+    if (by === 'xpath') {
+        elem = document.evaluate(value, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    } else if (by === 'id') {
+        elem = document.getElementById(value);
+    } else {
+        elem = document.querySelector(value);
+    }
+    if (!elem) {
+        return null;
+    }
+    var style = window.getComputedStyle(elem);
+    var visible = style.visibility !== 'hidden' && style.display !== 'none' && elem.getClientRects().length > 0;
+    var entry = {text: visible ? elem.innerText.trim() : '', visible: visible};
+    for (var i = 0; i < attributes.length; i++) {
+        var value = elem[attributes[i]];
+        entry[attributes[i]] = value === undefined || value === null ? elem.getAttribute(attributes[i]) : String(value);
+    }
+    result[name] = entry;
+}
+return result;
+"""
+
+
+class dom_is_stable:
+    """
+    Expect no DOM mutation for `quiet_period` seconds.
+    """
+
+    def __init__(self, quiet_period=0.3):
+        self.quiet_period = quiet_period
+
+    def __call__(self, driver):
+        return driver.execute_script(_DOM_QUIET_FOR_MS_JS) >= self.quiet_period * 1000
+
+
+class no_pending_ajax:
+    """
+    Expect page to be loaded and no jQuery AJAX request to be in flight.
+    """
+
+    def __call__(self, driver):
+        return driver.execute_script(_NO_PENDING_AJAX_JS)
+
+
+class text_is_stable:
+    """
+    Expect text of element to stay the same for `quiet_period` seconds. Returns the text.
+    Empty text is never considered stable.
+    """
+
+    def __init__(self, locator, quiet_period=0.3):
+        self.locator = locator
+        self.quiet_period = quiet_period
+        self._text = None
+        self._since = None
+
+    def __call__(self, driver):
+        try:
+            text = driver.find_element(*self.locator).text
+        except StaleElementReferenceException:
+            return False
+        now = time.monotonic()
+        if text != self._text:
+            self._text, self._since = text, now
+            return False
+        return text if text and now - self._since >= self.quiet_period else False
+
+
+class text_to_change:
+    """
+    Expect text of element to differ from `old_text`. Returns the new text.
+    """
+
+    def __init__(self, locator, old_text):
+        self.locator = locator
+        self.old_text = old_text
+
+    def __call__(self, driver):
+        try:
+            text = driver.find_element(*self.locator).text
+        except StaleElementReferenceException:
+            return False
+        return text if text != self.old_text else False
+
+
+class all_elements_read:
+    """
+    Expect every element to be present and read text, visibility and `attributes` of all of them
+    with a single script call. Returns dict name -> {'text': ..., 'visible': ..., <attribute>: ...}.
+    :param locators: type: dict, name -> (by, value) with by being xpath, id or css selector
+    """
+
+    def __init__(self, locators, attributes=()):
+        self.locators = {name: list(locator) for name, locator in locators.items()}
+        self.attributes = list(attributes)
+
+    def __call__(self, driver):
+        return driver.execute_script(_READ_ELEMENTS_JS, self.locators, self.attributes) or False